@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List
+
+from .correcao import ALTERNATIVAS, CODIGO_ANULADA, CODIGO_INVALIDO, CorrecaoTurma, MotorCorrecao, MARCAS_ANULADA
+
+# Fração da turma em cada grupo extremo (superior/inferior) do índice de discriminação
+FRACAO_GRUPOS_PADRAO = 0.27
+
+# Colunas da contagem de alternativas, na ordem dos códigos da matriz de respostas
+ROTULOS_CODIGOS = ['branco'] + ALTERNATIVAS + ['invalida']
+
+
+def estatisticas_disciplinas(turma: CorrecaoTurma) -> List[Dict[str, Any]]:
+    """Média e questões mais difícil/fácil por disciplina, direto das matrizes da correção"""
+
+    gabarito, correcao = turma.gabarito, turma.correcao
+    total_alunos, total_questoes = correcao.corretas.shape
+    total_disciplinas = len(gabarito.nomes_disciplinas)
+
+    # Acertos por (disciplina, questão): cada aluno conta na disciplina da sua trilha
+    disciplinas_aluno = gabarito.disciplinas[turma.trilhas]
+    grupos = disciplinas_aluno * total_questoes + np.arange(total_questoes)
+    acertos_questao = np.bincount(
+        grupos.ravel(), weights=correcao.corretas.ravel(), minlength=total_disciplinas * total_questoes
+    ).reshape(total_disciplinas, total_questoes)
+
+    cursou = correcao.total_disciplina > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percentuais = correcao.acertos_disciplina / correcao.total_disciplina * 100
+
+    estatisticas = []
+    for d, nome in enumerate(gabarito.nomes_disciplinas):
+        if not cursou[:, d].any():
+            continue
+
+        # Questões da disciplina na ordem da aba GABARITO (desempate: a primeira)
+        numeros = gabarito.linhas_numero[gabarito.linhas_disciplina == nome]
+        unicos = pd.unique(numeros)
+        acertos = acertos_questao[d, np.searchsorted(gabarito.numeros, unicos)]
+
+        estatisticas.append({
+            "nome": nome,
+            "media_percentual": float(np.mean(percentuais[cursou[:, d], d])),
+            "questoes_total": len(numeros),
+            "questao_mais_dificil": int(unicos[np.argmin(acertos)]),
+            "questao_mais_facil": int(unicos[np.argmax(acertos)]),
+            "acertos_media": float(np.mean(acertos))
+        })
+
+    return estatisticas
+
+
+def analisar_itens(turma: CorrecaoTurma, fracao_grupos: float = FRACAO_GRUPOS_PADRAO) -> List[Dict[str, Any]]:
+    """Análise de itens por linha do gabarito: dificuldade, discriminação e alternativas marcadas
+
+    Questões com versões por idioma viram um item por versão. Todas as métricas saem de
+    somas agrupadas (np.bincount) sobre a matriz alunos x questões, sem laço por aluno.
+    """
+
+    gabarito, correcao = turma.gabarito, turma.correcao
+    total_alunos, total_questoes = correcao.corretas.shape
+    total_linhas = len(gabarito.linhas_numero)
+
+    escolhidas = gabarito.linhas_escolhidas()
+    linhas = escolhidas[turma.trilhas].ravel()
+
+    def somar(pesos=None) -> np.ndarray:
+        return np.bincount(linhas, weights=pesos, minlength=total_linhas)
+
+    corretas = correcao.corretas.ravel().astype(np.float64)
+    respondentes = somar()
+    acertos = somar(corretas)
+
+    # Ponto-bisserial contra o escore restante (acertos do aluno sem o próprio item)
+    restante = (correcao.acertos[:, None] - correcao.corretas).ravel().astype(np.float64)
+    soma_x = somar(restante)
+    soma_xx = somar(restante * restante)
+    soma_xc = somar(restante * corretas)
+
+    # Grupos superior e inferior pelo total de acertos
+    tamanho_grupo = max(1, int(round(fracao_grupos * total_alunos)))
+    ordem = np.argsort(-correcao.acertos, kind='stable')
+    superior = np.zeros(total_alunos, dtype=np.float64)
+    inferior = np.zeros(total_alunos, dtype=np.float64)
+    superior[ordem[:tamanho_grupo]] = 1
+    inferior[ordem[-tamanho_grupo:]] = 1
+    superior = np.repeat(superior, total_questoes)
+    inferior = np.repeat(inferior, total_questoes)
+    n_superior, acertos_superior = somar(superior), somar(superior * corretas)
+    n_inferior, acertos_inferior = somar(inferior), somar(inferior * corretas)
+
+    # Alternativas marcadas (branco, A-E, inválida) por item
+    respostas = MotorCorrecao().alinhar_respostas(turma.alunos, gabarito.numeros).ravel()
+    total_codigos = CODIGO_INVALIDO + 1
+    marcadas = np.bincount(
+        linhas * total_codigos + respostas, minlength=total_linhas * total_codigos
+    ).reshape(total_linhas, total_codigos)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dificuldade = acertos / respondentes
+        media_x = soma_x / respondentes
+        variancia_x = soma_xx / respondentes - media_x ** 2
+        variancia_c = dificuldade * (1 - dificuldade)
+        covariancia = soma_xc / respondentes - media_x * dificuldade
+        bisserial = covariancia / np.sqrt(variancia_x * variancia_c)
+        indice = acertos_superior / n_superior - acertos_inferior / n_inferior
+
+    # Sem variação (item anulado, todos acertaram/erraram, escore constante) não há correlação
+    bisserial[~((variancia_x > 1e-12) & (variancia_c > 1e-12))] = np.nan
+
+    itens = []
+    for linha in np.unique(escolhidas):
+        chave = int(gabarito.linhas_chave[linha])
+        if chave == CODIGO_ANULADA:
+            resposta = MARCAS_ANULADA[0]
+        elif 1 <= chave <= len(ALTERNATIVAS):
+            resposta = ALTERNATIVAS[chave - 1]
+        else:
+            resposta = None
+
+        itens.append({
+            "questao": int(gabarito.linhas_numero[linha]),
+            "disciplina": str(gabarito.linhas_disciplina[linha]),
+            "resposta_correta": resposta,
+            "respondentes": int(respondentes[linha]),
+            "dificuldade": _valor(dificuldade[linha]),
+            "discriminacao_bisserial": _valor(bisserial[linha]),
+            "discriminacao_grupos": _valor(indice[linha]),
+            "alternativas": dict(zip(ROTULOS_CODIGOS, marcadas[linha].tolist()))
+        })
+
+    return itens
+
+
+def _valor(numero: float):
+    """float arredondado, ou None quando indefinido"""
+    return None if np.isnan(numero) else round(float(numero), 4)
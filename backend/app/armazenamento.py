@@ -0,0 +1,400 @@
+import io
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+
+from .correcao import CorrecaoTurma, EntradaCompilada
+from .models import StatusProcesso
+
+# Partes armazenadas por processo
+PARTE_ENTRADA = "entrada"            # planilha compilada no upload (EntradaCompilada)
+PARTE_RESULTADO = "resultado"        # arrays compactos da correção
+PARTE_ESTATISTICAS = "estatisticas"  # EstatisticasResponse em JSON
+PARTE_METADADOS = "metadados"        # metadados do processamento em JSON
+PARTE_PDFS = "pdfs"                  # lista de PDFInfo em JSON
+
+# Partes em arrays são arquivos .npz (zip)
+ASSINATURA_ZIP = b"PK"
+
+
+class ArmazenamentoProcessos(ABC):
+    """Registro de processos compartilhado entre workers"""
+
+    @abstractmethod
+    def criar(self, processo_id: str, entrada: EntradaCompilada,
+              lote_id: Optional[str] = None, arquivo: Optional[str] = None):
+        """Registra um processo validado com a entrada original (opcionalmente vinculado a um lote)"""
+
+    @abstractmethod
+    def obter(self, processo_id: str) -> Optional[Dict[str, Any]]:
+        """Linha de controle do processo (status, timestamp, versão) ou None"""
+
+    @abstractmethod
+    def listar_lote(self, lote_id: str) -> List[Dict[str, Any]]:
+        """Linhas de controle dos processos do lote, na ordem de criação"""
+
+    @abstractmethod
+    def atualizar_status(self, processo_id: str, status: str):
+        """Atualiza o status do processo"""
+
+    @abstractmethod
+    def iniciar_tarefa(self, processo_id: str, status: str, permitidos: Sequence[str]) -> bool:
+        """Troca o status para o da tarefa se o atual estiver entre os permitidos (atômico)"""
+
+    @abstractmethod
+    def atualizar_progresso(self, processo_id: str, progresso: int, etapa: Optional[str] = None):
+        """Registra o andamento da tarefa (também serve de batimento)"""
+
+    @abstractmethod
+    def registrar_batimento(self, processo_ids: Sequence[str]):
+        """Sinaliza que as tarefas destes processos continuam vivas (ex.: aguardando na fila)"""
+
+    @abstractmethod
+    def finalizar_tarefa(self, processo_id: str, status: str, erro: Optional[str] = None):
+        """Encerra a tarefa com o status final (e a mensagem de erro, se houver)"""
+
+    @abstractmethod
+    def salvar_partes(self, processo_id: str, partes: Dict[str, bytes], status: Optional[str] = None,
+                      nova_versao: bool = False, remover: Sequence[str] = ()):
+        """Grava partes do processo em uma única transação (opcionalmente publicando nova versão)"""
+
+    @abstractmethod
+    def carregar_parte(self, processo_id: str, nome: str) -> Optional[bytes]:
+        """Lê uma parte do processo"""
+
+    @abstractmethod
+    def possui_parte(self, processo_id: str, nome: str) -> bool:
+        """Indica se a parte existe, sem lê-la"""
+
+    @abstractmethod
+    def remover(self, processo_id: str) -> bool:
+        """Remove o processo e todas as suas partes"""
+
+    @abstractmethod
+    def contar(self) -> int:
+        """Total de processos registrados"""
+
+    @abstractmethod
+    def listar_uso(self) -> List[Dict[str, Any]]:
+        """Uso de cada processo (bytes por parte, último acesso), do menos recente ao mais recente"""
+
+    @abstractmethod
+    def incrementar_contador(self, nome: str, quantidade: int = 1):
+        """Incrementa um contador compartilhado (ex.: evicções)"""
+
+    @abstractmethod
+    def obter_contadores(self) -> Dict[str, int]:
+        """Todos os contadores compartilhados"""
+
+    def salvar_parte(self, processo_id: str, nome: str, conteudo: bytes):
+        self.salvar_partes(processo_id, {nome: conteudo})
+
+    def remover_partes(self, processo_id: str, nomes: Sequence[str]):
+        self.salvar_partes(processo_id, {}, remover=nomes)
+
+    # Partes com formato conhecido
+
+    def carregar_entrada(self, processo_id: str) -> Optional[EntradaCompilada]:
+        conteudo = self.carregar_parte(processo_id, PARTE_ENTRADA)
+        if conteudo is None:
+            return None
+        if not conteudo.startswith(ASSINATURA_ZIP):
+            # Formato desconhecido: tratada como descartada (o arquivo deve ser enviado de novo)
+            return None
+        with np.load(io.BytesIO(conteudo), allow_pickle=False) as arrays:
+            return EntradaCompilada.de_arrays(dict(arrays))
+
+    def salvar_resultado(self, processo_id: str, resultado: Dict[str, Any],
+                         entrada: Optional[EntradaCompilada] = None):
+        """Grava os arrays da correção, estatísticas e metadados e publica nova versão"""
+
+        partes = {
+            PARTE_RESULTADO: _npz(resultado["turma"].para_arrays()),
+            PARTE_ESTATISTICAS: _json(resultado["estatisticas"]),
+            PARTE_METADADOS: _json(resultado["metadados"])
+        }
+        if entrada is not None:
+            # Entrada emendada (ex.: gabarito corrigido) gravada junto com o resultado
+            partes[PARTE_ENTRADA] = _npz(entrada.para_arrays())
+        self.salvar_partes(
+            processo_id,
+            partes,
+            status=StatusProcesso.PROCESSADO.value,
+            nova_versao=True,
+            # PDFs de uma versão anterior deixam de valer
+            remover=[PARTE_PDFS]
+        )
+
+    def carregar_turma(self, processo_id: str) -> Optional[CorrecaoTurma]:
+        conteudo = self.carregar_parte(processo_id, PARTE_RESULTADO)
+        if conteudo is None:
+            return None
+        with np.load(io.BytesIO(conteudo), allow_pickle=False) as arrays:
+            return CorrecaoTurma.de_arrays(dict(arrays))
+
+    def carregar_estatisticas(self, processo_id: str) -> Optional[Dict[str, Any]]:
+        conteudo = self.carregar_parte(processo_id, PARTE_ESTATISTICAS)
+        return json.loads(conteudo) if conteudo is not None else None
+
+    def carregar_metadados(self, processo_id: str) -> Optional[Dict[str, Any]]:
+        conteudo = self.carregar_parte(processo_id, PARTE_METADADOS)
+        if conteudo is None:
+            return None
+        metadados = json.loads(conteudo)
+        metadados["timestamp"] = datetime.fromisoformat(metadados["timestamp"])
+        return metadados
+
+    def salvar_pdfs(self, processo_id: str, pdfs_info: List[Any]):
+        self.salvar_parte(processo_id, PARTE_PDFS, _json(pdfs_info))
+
+    def carregar_pdfs(self, processo_id: str) -> Optional[List[Dict[str, Any]]]:
+        conteudo = self.carregar_parte(processo_id, PARTE_PDFS)
+        return json.loads(conteudo) if conteudo is not None else None
+
+
+class ArmazenamentoSQLite(ArmazenamentoProcessos):
+    """Registro em SQLite (modo WAL): vários leitores e vários processos no mesmo arquivo"""
+
+    # Intervalo mínimo entre atualizações do último acesso (evita escrita a cada leitura)
+    INTERVALO_ACESSO = timedelta(seconds=30)
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._local = threading.local()
+        self._criar_tabelas()
+
+    def _conexao(self) -> sqlite3.Connection:
+        # Uma conexão por thread (o threadpool do FastAPI usa várias)
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+            conexao.row_factory = sqlite3.Row
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            conexao.execute("PRAGMA foreign_keys=ON")
+            self._local.conexao = conexao
+        return conexao
+
+    def _criar_tabelas(self):
+        self._conexao().executescript("""
+            CREATE TABLE IF NOT EXISTS processos (
+                processo_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                versao INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS partes (
+                processo_id TEXT NOT NULL REFERENCES processos(processo_id) ON DELETE CASCADE,
+                nome TEXT NOT NULL,
+                conteudo BLOB NOT NULL,
+                tamanho INTEGER NOT NULL,
+                PRIMARY KEY (processo_id, nome)
+            );
+            CREATE TABLE IF NOT EXISTS contadores (
+                nome TEXT PRIMARY KEY,
+                valor INTEGER NOT NULL DEFAULT 0
+            );
+        """)
+        self._adicionar_colunas("processos", {
+            "acessado_em": "TEXT",
+            "progresso": "INTEGER",
+            "etapa": "TEXT",
+            "erro": "TEXT",
+            "batimento_em": "TEXT",
+            "lote_id": "TEXT",
+            "arquivo": "TEXT"
+        })
+        self._conexao().execute("CREATE INDEX IF NOT EXISTS processos_lote ON processos (lote_id)")
+
+    def _adicionar_colunas(self, tabela: str, colunas: Dict[str, str]):
+        """Migração simples: cria colunas que ainda não existem no banco"""
+        conexao = self._conexao()
+        existentes = {linha["name"] for linha in conexao.execute(f"PRAGMA table_info({tabela})")}
+        for nome, definicao in colunas.items():
+            if nome not in existentes:
+                try:
+                    conexao.execute(f"ALTER TABLE {tabela} ADD COLUMN {nome} {definicao}")
+                except sqlite3.OperationalError:
+                    # Outro worker criou a coluna ao mesmo tempo
+                    pass
+
+    def criar(self, processo_id: str, entrada: EntradaCompilada,
+              lote_id: Optional[str] = None, arquivo: Optional[str] = None):
+        conteudo = _npz(entrada.para_arrays())
+        conexao = self._conexao()
+        with conexao:
+            conexao.execute("BEGIN IMMEDIATE")
+            agora = datetime.now().isoformat()
+            conexao.execute(
+                "INSERT INTO processos (processo_id, status, timestamp, acessado_em, lote_id, arquivo) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (processo_id, StatusProcesso.VALIDADO.value, agora, agora, lote_id, arquivo)
+            )
+            conexao.execute(
+                "INSERT INTO partes (processo_id, nome, conteudo, tamanho) VALUES (?, ?, ?, ?)",
+                (processo_id, PARTE_ENTRADA, conteudo, len(conteudo))
+            )
+
+    def obter(self, processo_id: str) -> Optional[Dict[str, Any]]:
+        linha = self._conexao().execute(
+            "SELECT processo_id, status, timestamp, versao, progresso, etapa, erro FROM processos WHERE processo_id = ?",
+            (processo_id,)
+        ).fetchone()
+        if linha is None:
+            return None
+        registro = dict(linha)
+        registro["timestamp"] = datetime.fromisoformat(registro["timestamp"])
+        self._tocar(processo_id)
+        return registro
+
+    def listar_lote(self, lote_id: str) -> List[Dict[str, Any]]:
+        registros = []
+        for linha in self._conexao().execute(
+            "SELECT processo_id, status, timestamp, versao, progresso, etapa, erro, arquivo "
+            "FROM processos WHERE lote_id = ? ORDER BY timestamp, rowid",
+            (lote_id,)
+        ):
+            registro = dict(linha)
+            registro["timestamp"] = datetime.fromisoformat(registro["timestamp"])
+            registros.append(registro)
+        return registros
+
+    def _tocar(self, processo_id: str):
+        """Registra o acesso ao processo (base do LRU)"""
+        agora = datetime.now()
+        self._conexao().execute(
+            "UPDATE processos SET acessado_em = ? WHERE processo_id = ? AND (acessado_em IS NULL OR acessado_em < ?)",
+            (agora.isoformat(), processo_id, (agora - self.INTERVALO_ACESSO).isoformat())
+        )
+
+    def atualizar_status(self, processo_id: str, status: str):
+        self._conexao().execute(
+            "UPDATE processos SET status = ? WHERE processo_id = ?", (status, processo_id)
+        )
+
+    def iniciar_tarefa(self, processo_id: str, status: str, permitidos: Sequence[str]) -> bool:
+        marcadores = ", ".join("?" * len(permitidos))
+        cursor = self._conexao().execute(
+            f"UPDATE processos SET status = ?, progresso = 0, etapa = 'na_fila', erro = NULL, batimento_em = ? "
+            f"WHERE processo_id = ? AND status IN ({marcadores})",
+            (status, datetime.now().isoformat(), processo_id, *permitidos)
+        )
+        return cursor.rowcount == 1
+
+    def atualizar_progresso(self, processo_id: str, progresso: int, etapa: Optional[str] = None):
+        self._conexao().execute(
+            "UPDATE processos SET progresso = ?, etapa = COALESCE(?, etapa), batimento_em = ? WHERE processo_id = ?",
+            (progresso, etapa, datetime.now().isoformat(), processo_id)
+        )
+
+    def registrar_batimento(self, processo_ids: Sequence[str]):
+        agora = datetime.now().isoformat()
+        self._conexao().executemany(
+            "UPDATE processos SET batimento_em = ? WHERE processo_id = ?",
+            [(agora, processo_id) for processo_id in processo_ids]
+        )
+
+    def finalizar_tarefa(self, processo_id: str, status: str, erro: Optional[str] = None):
+        self._conexao().execute(
+            "UPDATE processos SET status = ?, progresso = CASE WHEN ? IS NULL THEN 100 ELSE progresso END, "
+            "etapa = NULL, erro = ? WHERE processo_id = ?",
+            (status, erro, erro, processo_id)
+        )
+
+    def salvar_partes(self, processo_id: str, partes: Dict[str, bytes], status: Optional[str] = None,
+                      nova_versao: bool = False, remover: Sequence[str] = ()):
+        conexao = self._conexao()
+        with conexao:
+            conexao.execute("BEGIN IMMEDIATE")
+            for nome in remover:
+                conexao.execute(
+                    "DELETE FROM partes WHERE processo_id = ? AND nome = ?", (processo_id, nome)
+                )
+            for nome, conteudo in partes.items():
+                conexao.execute(
+                    "INSERT OR REPLACE INTO partes (processo_id, nome, conteudo, tamanho) VALUES (?, ?, ?, ?)",
+                    (processo_id, nome, conteudo, len(conteudo))
+                )
+            if status is not None:
+                conexao.execute(
+                    "UPDATE processos SET status = ? WHERE processo_id = ?", (status, processo_id)
+                )
+            if nova_versao:
+                conexao.execute(
+                    "UPDATE processos SET versao = versao + 1 WHERE processo_id = ?", (processo_id,)
+                )
+
+    def carregar_parte(self, processo_id: str, nome: str) -> Optional[bytes]:
+        linha = self._conexao().execute(
+            "SELECT conteudo FROM partes WHERE processo_id = ? AND nome = ?", (processo_id, nome)
+        ).fetchone()
+        return bytes(linha["conteudo"]) if linha is not None else None
+
+    def possui_parte(self, processo_id: str, nome: str) -> bool:
+        linha = self._conexao().execute(
+            "SELECT 1 FROM partes WHERE processo_id = ? AND nome = ?", (processo_id, nome)
+        ).fetchone()
+        return linha is not None
+
+    def remover(self, processo_id: str) -> bool:
+        cursor = self._conexao().execute(
+            "DELETE FROM processos WHERE processo_id = ?", (processo_id,)
+        )
+        return cursor.rowcount > 0
+
+    def contar(self) -> int:
+        return self._conexao().execute("SELECT COUNT(*) FROM processos").fetchone()[0]
+
+    def listar_uso(self) -> List[Dict[str, Any]]:
+        conexao = self._conexao()
+        uso = {}
+        for linha in conexao.execute(
+            "SELECT processo_id, status, timestamp, versao, acessado_em, batimento_em "
+            "FROM processos ORDER BY COALESCE(acessado_em, timestamp)"
+        ):
+            uso[linha["processo_id"]] = {
+                "processo_id": linha["processo_id"],
+                "status": linha["status"],
+                "versao": linha["versao"],
+                "acessado_em": datetime.fromisoformat(linha["acessado_em"] or linha["timestamp"]),
+                "batimento_em": datetime.fromisoformat(linha["batimento_em"] or linha["timestamp"]),
+                "partes": {}
+            }
+        for linha in conexao.execute("SELECT processo_id, nome, tamanho FROM partes"):
+            if linha["processo_id"] in uso:
+                uso[linha["processo_id"]]["partes"][linha["nome"]] = linha["tamanho"]
+        return list(uso.values())
+
+    def incrementar_contador(self, nome: str, quantidade: int = 1):
+        self._conexao().execute(
+            "INSERT INTO contadores (nome, valor) VALUES (?, ?) "
+            "ON CONFLICT(nome) DO UPDATE SET valor = valor + excluded.valor",
+            (nome, quantidade)
+        )
+
+    def obter_contadores(self) -> Dict[str, int]:
+        return {
+            linha["nome"]: linha["valor"]
+            for linha in self._conexao().execute("SELECT nome, valor FROM contadores")
+        }
+
+
+def criar_armazenamento(caminho: str) -> ArmazenamentoProcessos:
+    """Instancia o armazenamento configurado"""
+    return ArmazenamentoSQLite(caminho)
+
+
+def _npz(arrays: Dict[str, np.ndarray]) -> bytes:
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def _json(objeto: Any) -> bytes:
+    return json.dumps(jsonable_encoder(objeto)).encode("utf-8")
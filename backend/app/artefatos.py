@@ -0,0 +1,100 @@
+import os
+import hashlib
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Union
+
+
+class CacheArtefatos:
+    """Artefatos gerados (boletins) em disco, endereçados pelo hash das entradas que os produzem"""
+
+    # Entradas iguais geram o mesmo arquivo, então processos diferentes (ou o mesmo
+    # processo reprocessado) compartilham os arquivos. A data de modificação marca o
+    # último uso; o descarte dos que nenhum processo referencia fica com a evicção.
+    # Um artefato pode ter um anexo (ex.: índice de páginas), gravado antes e
+    # descartado junto com ele.
+
+    def __init__(self, diretorio: str, extensao: str = ".pdf", extensao_anexo: str = ".json"):
+        self.diretorio = diretorio
+        self.extensao = extensao
+        self.extensao_anexo = extensao_anexo
+        os.makedirs(diretorio, exist_ok=True)
+
+    def caminho(self, chave: str) -> str:
+        return os.path.join(self.diretorio, chave + self.extensao)
+
+    def caminho_anexo(self, caminho: str) -> str:
+        """Anexo do artefato no caminho dado"""
+        return caminho[:-len(self.extensao)] + self.extensao_anexo
+
+    def obter(self, chave: str) -> Optional[str]:
+        """Caminho do artefato, se já existir (registrando o uso)"""
+        caminho = self.caminho(chave)
+        try:
+            os.utime(caminho)
+        except FileNotFoundError:
+            return None
+        return caminho
+
+    def gravar(self, chave: str, conteudo: bytes, anexo: Optional[bytes] = None) -> str:
+        """Grava o artefato de forma atômica (leitores nunca veem um arquivo pela metade)"""
+        caminho = self.caminho(chave)
+        # Anexo primeiro: quem encontra o artefato encontra também o anexo
+        if anexo is not None:
+            self._gravar_atomico(self.caminho_anexo(caminho), anexo)
+        self._gravar_atomico(caminho, conteudo)
+        return caminho
+
+    def _gravar_atomico(self, caminho: str, conteudo: bytes):
+        descritor, temporario = tempfile.mkstemp(dir=self.diretorio, suffix=".tmp")
+        try:
+            with os.fdopen(descritor, "wb") as arquivo:
+                arquivo.write(conteudo)
+            os.replace(temporario, caminho)
+        except BaseException:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+
+    def listar(self) -> List[Dict[str, Any]]:
+        """Artefatos em disco, do uso mais antigo ao mais recente (tamanho inclui o anexo)"""
+        artefatos = []
+        anexos: Dict[str, int] = {}
+        with os.scandir(self.diretorio) as entradas:
+            for entrada in entradas:
+                anexo = entrada.name.endswith(self.extensao_anexo)
+                if not (anexo or entrada.name.endswith(self.extensao)):
+                    continue
+                try:
+                    info = entrada.stat()
+                except FileNotFoundError:
+                    continue
+                if anexo:
+                    anexos[entrada.path] = info.st_size
+                    continue
+                artefatos.append({
+                    "caminho": entrada.path,
+                    "tamanho": info.st_size,
+                    "usado_em": datetime.fromtimestamp(info.st_mtime)
+                })
+        for artefato in artefatos:
+            artefato["tamanho"] += anexos.get(self.caminho_anexo(artefato["caminho"]), 0)
+        artefatos.sort(key=lambda a: a["usado_em"])
+        return artefatos
+
+    def remover(self, caminho: str):
+        for alvo in (caminho, self.caminho_anexo(caminho)):
+            try:
+                os.remove(alvo)
+            except FileNotFoundError:
+                pass
+
+
+def chave_conteudo(*partes: Union[str, bytes]) -> str:
+    """Hash SHA-256 das partes, na ordem dada"""
+    h = hashlib.sha256()
+    for parte in partes:
+        dados = parte.encode("utf-8") if isinstance(parte, str) else parte
+        h.update(len(dados).to_bytes(8, "little"))
+        h.update(dados)
+    return h.hexdigest()
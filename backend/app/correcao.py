@@ -0,0 +1,554 @@
+import hashlib
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Códigos das respostas na matriz (alunos x questões)
+ALTERNATIVAS = ['A', 'B', 'C', 'D', 'E']
+CODIGO_BRANCO = 0
+CODIGO_INVALIDO = 6
+CODIGO_ANULADA = 7          # só no gabarito: questão anulada conta como acerto para todos
+MARCAS_ANULADA = ('ANULADA', 'ANULADO')
+
+# Trilhas de idioma (Inglês/Espanhol)
+TRILHA_PADRAO = 0
+TRILHA_INGLES = 1
+TRILHA_ESPANHOL = 2
+TOTAL_TRILHAS = 3
+
+
+@dataclass
+class RespostasColunares:
+    """Aba RESPOSTAS já normalizada em colunas"""
+
+    ids: np.ndarray                # (S,) str
+    nomes: np.ndarray              # (S,) str
+    sedes: np.ndarray              # (S,) str ou None
+    idiomas: np.ndarray            # (S,) str ou None
+    numeros: np.ndarray            # (Q,) números das colunas de questão
+    respostas: np.ndarray          # (S, Q) uint8 - códigos de resposta
+
+    @property
+    def total_alunos(self) -> int:
+        return len(self.ids)
+
+
+@dataclass
+class GabaritoCompilado:
+    """Gabarito em forma vetorial, com uma chave por trilha de idioma"""
+
+    numeros: np.ndarray            # (Q,) números das questões em ordem crescente
+    chaves: np.ndarray             # (T, Q) uint8 - código da resposta correta
+    disciplinas: np.ndarray        # (T, Q) índice em nomes_disciplinas
+    nomes_disciplinas: List[str]
+    linhas_numero: np.ndarray      # linhas originais da aba GABARITO
+    linhas_disciplina: np.ndarray
+    linhas_chave: np.ndarray
+
+    @property
+    def total_questoes(self) -> int:
+        return len(self.numeros)
+
+    def equivalente(self, outro: "GabaritoCompilado") -> bool:
+        """Mesmas linhas de origem (e, portanto, mesma compilação)"""
+        return (
+            np.array_equal(self.linhas_numero, outro.linhas_numero)
+            and np.array_equal(self.linhas_disciplina, outro.linhas_disciplina)
+            and np.array_equal(self.linhas_chave, outro.linhas_chave)
+        )
+
+    def linhas_escolhidas(self) -> np.ndarray:
+        """(T, Q) linha de origem usada por trilha e questão"""
+        posicao = {nome: d for d, nome in enumerate(self.nomes_disciplinas)}
+        linhas_indice = np.array([posicao[nome] for nome in self.linhas_disciplina], dtype=np.int64)
+        return _escolher_linhas(self.linhas_numero, linhas_indice, self.nomes_disciplinas)
+
+
+@dataclass
+class AlteracaoQuestao:
+    """Emenda do gabarito para uma questão (em todas as trilhas ou só em uma)"""
+
+    numero: int
+    resposta: Optional[str] = None
+    anulada: bool = False
+    disciplina: Optional[str] = None
+    trilha: Optional[int] = None       # None = todas as versões da questão
+
+
+@dataclass
+class CorrecaoMatricial:
+    """Resultado da correção de uma turma inteira"""
+
+    corretas: np.ndarray               # (S, Q) bool
+    respondidas: np.ndarray            # (S, Q) bool
+    acertos: np.ndarray                # (S,)
+    erros: np.ndarray                  # (S,)
+    nota_percentual: np.ndarray        # (S,) float64
+    acertos_disciplina: np.ndarray     # (S, D)
+    total_disciplina: np.ndarray       # (S, D) questões respondidas por disciplina
+
+
+@dataclass
+class CorrecaoTurma:
+    """Entrada normalizada e resultado da correção de uma turma, apenas em arrays"""
+
+    alunos: RespostasColunares
+    gabarito: GabaritoCompilado
+    trilhas: np.ndarray                # (S,) trilha de idioma de cada aluno
+    correcao: CorrecaoMatricial
+
+    def para_arrays(self) -> Dict[str, np.ndarray]:
+        """Arrays sem objetos Python, prontos para np.savez"""
+
+        arrays = {}
+        for prefixo, origem in (('alunos', self.alunos), ('gabarito', self.gabarito), ('correcao', self.correcao)):
+            _campos_para_arrays(prefixo, origem, arrays)
+        arrays['trilhas'] = self.trilhas
+        return arrays
+
+    @classmethod
+    def unir(cls, turmas: Sequence['CorrecaoTurma']) -> 'CorrecaoTurma':
+        """Uma única turma a partir de turmas corrigidas com o mesmo gabarito
+
+        As respostas passam a ser alinhadas às questões do gabarito (colunas extras
+        de cada planilha são descartadas).
+        """
+
+        gabarito = turmas[0].gabarito
+        motor = MotorCorrecao()
+
+        def concatenar(campo: str, origens: Sequence[Any]) -> np.ndarray:
+            return np.concatenate([getattr(origem, campo) for origem in origens])
+
+        alunos = [turma.alunos for turma in turmas]
+        return cls(
+            alunos=RespostasColunares(
+                ids=concatenar('ids', alunos),
+                nomes=concatenar('nomes', alunos),
+                sedes=concatenar('sedes', alunos),
+                idiomas=concatenar('idiomas', alunos),
+                numeros=gabarito.numeros,
+                respostas=np.concatenate([motor.alinhar_respostas(a, gabarito.numeros) for a in alunos])
+            ),
+            gabarito=gabarito,
+            trilhas=np.concatenate([turma.trilhas for turma in turmas]),
+            correcao=CorrecaoMatricial(**{
+                campo: concatenar(campo, [turma.correcao for turma in turmas])
+                for campo in vars(turmas[0].correcao)
+            })
+        )
+
+    @classmethod
+    def de_arrays(cls, arrays: Dict[str, np.ndarray]) -> 'CorrecaoTurma':
+        """Reconstrói a turma a partir de para_arrays()"""
+
+        return cls(
+            alunos=RespostasColunares(**_campos_de_arrays('alunos', arrays)),
+            gabarito=_gabarito_de_arrays(arrays),
+            trilhas=arrays['trilhas'],
+            correcao=CorrecaoMatricial(**_campos_de_arrays('correcao', arrays))
+        )
+
+
+@dataclass
+class EntradaCompilada:
+    """Planilha interpretada uma única vez, no upload: é o que fica armazenado e o que a correção consome"""
+
+    alunos: RespostasColunares         # respostas já alinhadas às questões do gabarito
+    gabarito: GabaritoCompilado
+    trilhas: np.ndarray                # (S,) trilha de idioma de cada aluno
+    impressao: str                     # impressão digital da estrutura (questões e gabarito)
+
+    def com_gabarito(self, gabarito: GabaritoCompilado) -> 'EntradaCompilada':
+        """Mesma turma com o gabarito emendado (mesmas questões)"""
+        return replace(self, gabarito=gabarito, impressao=impressao_estrutura(self.alunos, gabarito))
+
+    def para_arrays(self) -> Dict[str, np.ndarray]:
+        arrays = {}
+        _campos_para_arrays('alunos', self.alunos, arrays)
+        _campos_para_arrays('gabarito', self.gabarito, arrays)
+        arrays['trilhas'] = self.trilhas
+        arrays['impressao'] = np.array(self.impressao)
+        return arrays
+
+    @classmethod
+    def de_arrays(cls, arrays: Dict[str, np.ndarray]) -> 'EntradaCompilada':
+        return cls(
+            alunos=RespostasColunares(**_campos_de_arrays('alunos', arrays)),
+            gabarito=_gabarito_de_arrays(arrays),
+            trilhas=arrays['trilhas'],
+            impressao=str(arrays['impressao'])
+        )
+
+
+def impressao_estrutura(alunos: RespostasColunares, gabarito: GabaritoCompilado) -> str:
+    """Hash das questões e das linhas do gabarito: mesma impressão, mesma estrutura de correção"""
+
+    resumo = hashlib.sha256()
+    resumo.update(np.asarray(alunos.numeros, dtype=np.int64).tobytes())
+    resumo.update(np.asarray(gabarito.linhas_numero, dtype=np.int64).tobytes())
+    resumo.update("\0".join(map(str, gabarito.linhas_disciplina)).encode("utf-8"))
+    resumo.update(np.asarray(gabarito.linhas_chave, dtype=np.uint8).tobytes())
+    return resumo.hexdigest()[:32]
+
+
+def _campos_para_arrays(prefixo: str, origem: Any, arrays: Dict[str, np.ndarray]):
+    """Campos de um dataclass como arrays `prefixo.campo` sem objetos Python"""
+
+    for campo, valor in vars(origem).items():
+        valor = np.asarray(valor)
+        if valor.dtype == object:
+            # Textos opcionais: vazio + máscara de nulos
+            nulos = np.array([v is None for v in valor], dtype=bool)
+            arrays[f'{prefixo}.{campo}.nulos'] = nulos
+            valor = np.where(nulos, '', valor).astype(str)
+        elif valor.dtype == bool and valor.ndim == 2:
+            # Matrizes alunos x questões como bitsets (1 bit por célula)
+            arrays[f'{prefixo}.{campo}.forma'] = np.array(valor.shape, dtype=np.int64)
+            arrays[f'{prefixo}.{campo}.bits'] = np.packbits(valor, axis=1)
+            continue
+        arrays[f'{prefixo}.{campo}'] = valor
+
+
+def _campos_de_arrays(prefixo: str, arrays: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """Inverso de _campos_para_arrays"""
+
+    valores = {}
+    for chave, valor in arrays.items():
+        partes = chave.split('.')
+        if partes[0] != prefixo:
+            continue
+        if partes[2:] == ['bits']:
+            forma = arrays[f'{prefixo}.{partes[1]}.forma']
+            valores[partes[1]] = np.unpackbits(valor, axis=1, count=int(forma[1])).astype(bool).reshape(forma)
+            continue
+        if len(partes) != 2:
+            continue
+        if valor.dtype.kind == 'U':
+            valor = valor.astype(object)
+            nulos = arrays.get(f'{chave}.nulos')
+            if nulos is not None:
+                valor[nulos] = None
+        valores[partes[1]] = valor
+    return valores
+
+
+def _gabarito_de_arrays(arrays: Dict[str, np.ndarray]) -> GabaritoCompilado:
+    gabarito = _campos_de_arrays('gabarito', arrays)
+    gabarito['nomes_disciplinas'] = [str(nome) for nome in gabarito['nomes_disciplinas']]
+    return GabaritoCompilado(**gabarito)
+
+
+class MotorCorrecao:
+    """Correção vetorizada: respostas como matriz uint8 e gabarito como chaves por trilha"""
+
+    def preparar_respostas(self, respostas_df: pd.DataFrame) -> RespostasColunares:
+        """Normaliza a aba RESPOSTAS em colunas e matriz de códigos"""
+
+        # Cabeçalhos das questões são interpretados uma única vez
+        colunas = []
+        numeros = []
+        for col in respostas_df.columns:
+            if not col.startswith('Questão'):
+                continue
+            try:
+                numeros.append(int(col.split()[-1]))
+                colunas.append(col)
+            except (ValueError, IndexError):
+                continue
+
+        codigos = codificar_alternativas(respostas_df[colunas].to_numpy(dtype=object))
+
+        # Colunas repetidas para a mesma questão: vale a última resposta válida
+        numeros_unicos = np.array(sorted(set(numeros)), dtype=np.int64)
+        posicao = {n: j for j, n in enumerate(numeros_unicos)}
+        respostas = np.zeros((len(respostas_df), len(numeros_unicos)), dtype=np.uint8)
+        for origem, numero in enumerate(numeros):
+            destino = posicao[numero]
+            coluna = codigos[:, origem]
+            respostas[:, destino] = np.where(alternativa_valida(coluna), coluna, respostas[:, destino])
+
+        return RespostasColunares(
+            ids=respostas_df['ID'].astype(str).to_numpy(),
+            nomes=respostas_df['Nome'].astype(str).to_numpy(),
+            sedes=_coluna_opcional(respostas_df, 'Sede'),
+            idiomas=_coluna_opcional(respostas_df, 'Idioma escolhido'),
+            numeros=numeros_unicos,
+            respostas=respostas
+        )
+
+    def compilar_entrada(self, alunos: RespostasColunares, gabarito: GabaritoCompilado) -> EntradaCompilada:
+        """Forma canônica: respostas alinhadas ao gabarito, trilhas de idioma e impressão da estrutura"""
+
+        alinhados = replace(alunos, numeros=gabarito.numeros, respostas=self.alinhar_respostas(alunos, gabarito.numeros))
+        return EntradaCompilada(
+            alunos=alinhados,
+            gabarito=gabarito,
+            trilhas=self.classificar_idiomas(alunos.idiomas),
+            impressao=impressao_estrutura(alinhados, gabarito)
+        )
+
+    def preparar_gabarito(self, gabarito_df: pd.DataFrame) -> GabaritoCompilado:
+        """Compila a aba GABARITO em vetores de chave e disciplina por trilha"""
+
+        linhas_numero = gabarito_df['Questão'].astype(int).to_numpy()
+        linhas_disciplina = gabarito_df['Disciplina'].astype(str).str.strip().to_numpy()
+        linhas_resposta = gabarito_df['Resposta'].astype(str).str.strip().str.upper().to_numpy(dtype=object)
+        linhas_chave = codificar_alternativas(linhas_resposta)
+        linhas_chave[np.isin(linhas_resposta, MARCAS_ANULADA)] = CODIGO_ANULADA
+
+        return self.compilar_gabarito(linhas_numero, linhas_disciplina, linhas_chave)
+
+    def compilar_gabarito(self, linhas_numero: np.ndarray, linhas_disciplina: np.ndarray,
+                          linhas_chave: np.ndarray) -> GabaritoCompilado:
+        """Escolhe, por questão e trilha, a linha do gabarito que vale"""
+
+        nomes_disciplinas, linhas_indice = _fatorar(linhas_disciplina)
+        escolhidas = _escolher_linhas(linhas_numero, linhas_indice, nomes_disciplinas)
+
+        return GabaritoCompilado(
+            numeros=np.unique(linhas_numero),
+            chaves=linhas_chave[escolhidas],
+            disciplinas=linhas_indice[escolhidas],
+            nomes_disciplinas=nomes_disciplinas,
+            linhas_numero=linhas_numero,
+            linhas_disciplina=linhas_disciplina,
+            linhas_chave=linhas_chave
+        )
+
+    def classificar_idiomas(self, idiomas: np.ndarray) -> np.ndarray:
+        """Converte o idioma escolhido de cada aluno em índice de trilha"""
+
+        def trilha(idioma) -> int:
+            idioma_lower = idioma.lower()
+            if 'inglês' in idioma_lower:
+                return TRILHA_INGLES
+            if 'espanhol' in idioma_lower:
+                return TRILHA_ESPANHOL
+            return TRILHA_PADRAO
+
+        return _mapear_valores(idiomas, trilha, TRILHA_PADRAO).astype(np.uint8)
+
+    def alinhar_respostas(self, respostas: RespostasColunares, numeros: np.ndarray) -> np.ndarray:
+        """Reordena a matriz de respostas para as questões do gabarito"""
+
+        alinhada = np.zeros((respostas.total_alunos, len(numeros)), dtype=np.uint8)
+        destino = np.isin(numeros, respostas.numeros)
+        origem = np.searchsorted(respostas.numeros, numeros[destino])
+        alinhada[:, destino] = respostas.respostas[:, origem]
+        return alinhada
+
+    def corrigir(self, respostas: np.ndarray, trilhas: np.ndarray, gabarito: GabaritoCompilado) -> CorrecaoMatricial:
+        """Corrige a turma inteira em uma passada"""
+
+        total_alunos, total_questoes = respostas.shape
+        total_disciplinas = len(gabarito.nomes_disciplinas)
+
+        # Chave de cada aluno conforme sua trilha de idioma
+        respondidas, corretas = _corrigir_colunas(respostas, gabarito.chaves[trilhas])
+
+        acertos = corretas.sum(axis=1)
+        erros = total_questoes - acertos
+        if total_questoes > 0:
+            nota_percentual = (acertos / total_questoes) * 100
+        else:
+            nota_percentual = np.zeros(total_alunos)
+
+        # Somas agrupadas por disciplina (uma matriz indicadora por trilha)
+        acertos_disciplina = np.zeros((total_alunos, total_disciplinas), dtype=np.int64)
+        total_disciplina = np.zeros((total_alunos, total_disciplinas), dtype=np.int64)
+        for trilha in np.unique(trilhas):
+            alunos_trilha = trilhas == trilha
+            indicadora = np.zeros((total_questoes, total_disciplinas), dtype=np.int64)
+            indicadora[np.arange(total_questoes), gabarito.disciplinas[trilha]] = 1
+            acertos_disciplina[alunos_trilha] = corretas[alunos_trilha].astype(np.int64) @ indicadora
+            total_disciplina[alunos_trilha] = respondidas[alunos_trilha].astype(np.int64) @ indicadora
+
+        return CorrecaoMatricial(
+            corretas=corretas,
+            respondidas=respondidas,
+            acertos=acertos,
+            erros=erros,
+            nota_percentual=nota_percentual,
+            acertos_disciplina=acertos_disciplina,
+            total_disciplina=total_disciplina
+        )
+
+    def recorrigir(self, turma: CorrecaoTurma,
+                   alteracoes: Sequence[AlteracaoQuestao]) -> Tuple[CorrecaoTurma, np.ndarray, List[np.ndarray]]:
+        """Aplica emendas ao gabarito e recorrige só as colunas afetadas
+
+        Devolve a turma atualizada, os números das questões recorrigidas e, para cada
+        alteração, a máscara das linhas da aba GABARITO que ela atinge.
+        """
+
+        gabarito = turma.gabarito
+        linhas_disciplina = gabarito.linhas_disciplina.astype(object)
+        linhas_chave = gabarito.linhas_chave.copy()
+
+        # As emendas valem para as linhas da planilha; o gabarito é recompilado delas
+        linhas_alteradas = []
+        for alteracao in alteracoes:
+            j = int(np.searchsorted(gabarito.numeros, alteracao.numero))
+            if j >= gabarito.total_questoes or gabarito.numeros[j] != alteracao.numero:
+                raise ValueError(f"Questão {alteracao.numero} não existe no gabarito")
+
+            if alteracao.trilha is None:
+                linhas = gabarito.linhas_numero == alteracao.numero
+            else:
+                # Só a linha que a trilha usa para esta questão
+                nomes, linhas_indice = _fatorar(linhas_disciplina)
+                escolhidas = _escolher_linhas(gabarito.linhas_numero, linhas_indice, nomes)
+                linhas = np.zeros(len(gabarito.linhas_numero), dtype=bool)
+                linhas[escolhidas[alteracao.trilha, j]] = True
+            linhas_alteradas.append(linhas)
+
+            if alteracao.anulada:
+                linhas_chave[linhas] = CODIGO_ANULADA
+            elif alteracao.resposta is not None:
+                codigo = codificar_alternativas(np.array([alteracao.resposta], dtype=object))[0]
+                if not alternativa_valida(codigo):
+                    raise ValueError(f"Resposta inválida para a questão {alteracao.numero}: {alteracao.resposta}")
+                linhas_chave[linhas] = codigo
+            elif alteracao.disciplina is None:
+                raise ValueError(f"Nenhuma alteração informada para a questão {alteracao.numero}")
+
+            if alteracao.disciplina is not None:
+                linhas_disciplina[linhas] = alteracao.disciplina.strip()
+
+        novo = self.compilar_gabarito(gabarito.linhas_numero, linhas_disciplina, linhas_chave)
+
+        # Colunas cuja chave ou disciplina mudou em alguma trilha
+        nomes_antes = np.asarray(gabarito.nomes_disciplinas, dtype=object)
+        nomes_depois = np.asarray(novo.nomes_disciplinas, dtype=object)
+        mudou = (novo.chaves != gabarito.chaves) | (nomes_depois[novo.disciplinas] != nomes_antes[gabarito.disciplinas])
+        colunas = np.flatnonzero(mudou.any(axis=0))
+
+        # Correção apenas das colunas alteradas
+        trilhas = turma.trilhas
+        respostas = self.alinhar_respostas(turma.alunos, gabarito.numeros[colunas])
+        respondidas, corretas = _corrigir_colunas(respostas, novo.chaves[:, colunas][trilhas])
+
+        anterior = turma.correcao
+        respondidas_antes = anterior.respondidas[:, colunas]
+        corretas_antes = anterior.corretas[:, colunas]
+
+        acertos = anterior.acertos + corretas.sum(axis=1) - corretas_antes.sum(axis=1)
+        total_questoes = gabarito.total_questoes
+        nota_percentual = (acertos / total_questoes) * 100 if total_questoes > 0 else np.zeros(len(acertos))
+
+        # Somas por disciplina: retira a contribuição antiga das colunas, passa para a
+        # nova numeração de disciplinas e soma a contribuição nova
+        alunos = np.arange(turma.alunos.total_alunos)[:, None]
+        acertos_disciplina = anterior.acertos_disciplina.astype(np.int64)
+        total_disciplina = anterior.total_disciplina.astype(np.int64)
+        disciplinas_antes = gabarito.disciplinas[:, colunas][trilhas]
+        np.subtract.at(acertos_disciplina, (alunos, disciplinas_antes), corretas_antes.astype(np.int64))
+        np.subtract.at(total_disciplina, (alunos, disciplinas_antes), respondidas_antes.astype(np.int64))
+
+        acertos_disciplina = _renumerar_disciplinas(acertos_disciplina, gabarito.nomes_disciplinas, novo.nomes_disciplinas)
+        total_disciplina = _renumerar_disciplinas(total_disciplina, gabarito.nomes_disciplinas, novo.nomes_disciplinas)
+        disciplinas_depois = novo.disciplinas[:, colunas][trilhas]
+        np.add.at(acertos_disciplina, (alunos, disciplinas_depois), corretas.astype(np.int64))
+        np.add.at(total_disciplina, (alunos, disciplinas_depois), respondidas.astype(np.int64))
+
+        matriz_corretas = anterior.corretas.copy()
+        matriz_respondidas = anterior.respondidas.copy()
+        matriz_corretas[:, colunas] = corretas
+        matriz_respondidas[:, colunas] = respondidas
+
+        correcao = CorrecaoMatricial(
+            corretas=matriz_corretas,
+            respondidas=matriz_respondidas,
+            acertos=acertos,
+            erros=total_questoes - acertos,
+            nota_percentual=nota_percentual,
+            acertos_disciplina=acertos_disciplina,
+            total_disciplina=total_disciplina
+        )
+
+        turma_atualizada = CorrecaoTurma(alunos=turma.alunos, gabarito=novo, trilhas=trilhas, correcao=correcao)
+        return turma_atualizada, gabarito.numeros[colunas], linhas_alteradas
+
+
+def _corrigir_colunas(respostas: np.ndarray, chaves_alunos: np.ndarray):
+    """Respondidas e corretas de cada aluno; questão anulada conta como respondida e correta"""
+    anuladas = chaves_alunos == CODIGO_ANULADA
+    validas = alternativa_valida(respostas)
+    return validas | anuladas, (validas & (respostas == chaves_alunos)) | anuladas
+
+
+def _renumerar_disciplinas(matriz: np.ndarray, nomes_antes: List[str], nomes_depois: List[str]) -> np.ndarray:
+    """Reordena as colunas (alunos x disciplinas) para outra lista de disciplinas"""
+    renumerada = np.zeros((matriz.shape[0], len(nomes_depois)), dtype=np.int64)
+    posicao = {nome: d for d, nome in enumerate(nomes_depois)}
+    for d, nome in enumerate(nomes_antes):
+        if nome in posicao:
+            renumerada[:, posicao[nome]] = matriz[:, d]
+    return renumerada
+
+
+def _escolher_linhas(linhas_numero: np.ndarray, linhas_indice: np.ndarray, nomes_disciplinas: List[str]) -> np.ndarray:
+    """Índice da linha do gabarito usada por (trilha, questão)"""
+
+    disciplinas_lower = np.char.lower(np.asarray(nomes_disciplinas, dtype=str))
+    eh_ingles = (np.char.find(disciplinas_lower, 'inglês') >= 0) | (np.char.find(disciplinas_lower, 'ingles') >= 0)
+    eh_espanhol = (np.char.find(disciplinas_lower, 'espanhol') >= 0) | (np.char.find(disciplinas_lower, 'espanol') >= 0)
+
+    prioridades = {
+        TRILHA_PADRAO: np.zeros(len(linhas_numero), dtype=bool),
+        TRILHA_INGLES: eh_ingles[linhas_indice] if len(nomes_disciplinas) else np.zeros(0, dtype=bool),
+        TRILHA_ESPANHOL: eh_espanhol[linhas_indice] if len(nomes_disciplinas) else np.zeros(0, dtype=bool)
+    }
+
+    escolhidas = np.zeros((TOTAL_TRILHAS, len(np.unique(linhas_numero))), dtype=np.int64)
+    ordem_original = np.arange(len(linhas_numero))
+    for trilha, preferida in prioridades.items():
+        # Por questão: primeira linha da trilha; sem versão da trilha, a primeira linha
+        ordem = np.lexsort((ordem_original, ~preferida, linhas_numero))
+        _, primeiras = np.unique(linhas_numero[ordem], return_index=True)
+        escolhidas[trilha] = ordem[primeiras]
+    return escolhidas
+
+
+def alternativa_valida(codigos: np.ndarray) -> np.ndarray:
+    """Máscara das respostas entre A e E"""
+    return (codigos != CODIGO_BRANCO) & (codigos != CODIGO_INVALIDO)
+
+
+def codificar_alternativas(valores: np.ndarray) -> np.ndarray:
+    """Converte células de resposta em códigos (A=1 ... E=5, branco=0, inválida=6)"""
+
+    def codigo(valor) -> int:
+        resposta = str(valor).strip().upper()
+        if resposta in ALTERNATIVAS:
+            return ALTERNATIVAS.index(resposta) + 1
+        return CODIGO_INVALIDO
+
+    return _mapear_valores(valores, codigo, CODIGO_BRANCO).astype(np.uint8)
+
+
+def _mapear_valores(valores: np.ndarray, funcao: Callable[[Any], int], padrao_nulo: int) -> np.ndarray:
+    """Aplica `funcao` apenas aos valores distintos e espalha o resultado via tabela"""
+
+    valores = np.asarray(valores, dtype=object)
+    codigos, unicos = pd.factorize(valores.ravel(), use_na_sentinel=True)
+    tabela = np.array([funcao(valor) for valor in unicos] + [padrao_nulo], dtype=np.int64)
+    # Sentinela -1 (nulo) cai na última posição da tabela
+    return tabela[codigos].reshape(valores.shape)
+
+
+def _fatorar(valores: np.ndarray):
+    """Nomes distintos em ordem de aparição e índice de cada valor"""
+    codigos, unicos = pd.factorize(valores)
+    return [str(u) for u in unicos], codigos.astype(np.int64)
+
+
+def _coluna_opcional(df: pd.DataFrame, coluna: str) -> np.ndarray:
+    """Coluna como texto, com None nas células vazias ou quando a coluna não existe"""
+    if coluna not in df.columns:
+        return np.full(len(df), None, dtype=object)
+    serie = df[coluna]
+    # np.where em vez de Series.where(..., None): este, em colunas object, pode manter o texto 'None'
+    return np.where(serie.notna().to_numpy(), serie.astype(str).to_numpy(dtype=object), None)
@@ -0,0 +1,136 @@
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+from .armazenamento import ArmazenamentoProcessos, PARTE_ENTRADA, PARTE_PDFS
+from .artefatos import CacheArtefatos
+from .models import StatusProcesso
+
+logger = logging.getLogger(__name__)
+
+# Processos com trabalho em andamento nunca são descartados
+STATUS_PROTEGIDOS = (StatusProcesso.PROCESSANDO.value, StatusProcesso.GERANDO_PDFS.value)
+
+
+class PoliticaEviccao:
+    """Expiração por TTL e descarte LRU sob um orçamento de bytes"""
+
+    # Ordem de descarte sob pressão, do mais barato de perder ao mais caro:
+    #   1. boletins em cache que nenhum processo referencia
+    #   2. entrada original de processos já corrigidos (só é usada para reprocessar)
+    #   3. PDFs gerados (podem ser gerados de novo a partir do resultado)
+    #   4. o processo inteiro
+
+    def __init__(self, armazenamento: ArmazenamentoProcessos, cache: CacheArtefatos, ttl_segundos: float,
+                 orcamento_bytes: int, timeout_tarefa_segundos: float = 900):
+        self.armazenamento = armazenamento
+        self.cache = cache
+        self.ttl = timedelta(seconds=ttl_segundos)
+        self.orcamento_bytes = orcamento_bytes
+        self.timeout_tarefa = timedelta(seconds=timeout_tarefa_segundos)
+        # Bytes ocupados ao fim da última rodada (None antes da primeira), lido pelo /health
+        self.uso_bytes: Optional[int] = None
+
+    def aplicar(self) -> Dict[str, int]:
+        """Executa uma rodada de evicção e devolve o que foi descartado"""
+
+        agora = datetime.now()
+        eventos: Counter = Counter()
+
+        # Do menos recente ao mais recente
+        processos = []
+        for uso in self.armazenamento.listar_uso():
+            if uso["status"] in STATUS_PROTEGIDOS and agora - uso["batimento_em"] > self.timeout_tarefa:
+                # Worker que executava a tarefa morreu: libera o processo
+                self._interromper_tarefa(uso)
+                eventos["tarefas_interrompidas"] += 1
+            if uso["status"] not in STATUS_PROTEGIDOS and agora - uso["acessado_em"] > self.ttl:
+                self.armazenamento.remover(uso["processo_id"])
+                eventos["expirados"] += 1
+            else:
+                processos.append(uso)
+
+        # Boletins referenciados por processo (um arquivo pode servir a vários)
+        referencias: Dict[str, Set[str]] = {}
+        for uso in processos:
+            if PARTE_PDFS in uso["partes"]:
+                for pdf_info in self.armazenamento.carregar_pdfs(uso["processo_id"]) or []:
+                    referencias.setdefault(pdf_info["caminho"], set()).add(uso["processo_id"])
+
+        artefatos = {a["caminho"]: a for a in self.cache.listar()}
+        total = sum(_bytes_processo(uso) for uso in processos) + sum(a["tamanho"] for a in artefatos.values())
+
+        # Boletins recém-gerados por uma tarefa em andamento ainda não estão referenciados
+        gerando = any(uso["status"] == StatusProcesso.GERANDO_PDFS.value for uso in processos)
+
+        for caminho, artefato in list(artefatos.items()):
+            idade = agora - artefato["usado_em"]
+            if caminho in referencias or (gerando and idade < self.timeout_tarefa):
+                continue
+            if total > self.orcamento_bytes or idade > self.ttl:
+                total -= self._remover_artefatos(artefatos, [caminho])
+                eventos["boletins_descartados"] += 1
+
+        for uso in processos:
+            if total <= self.orcamento_bytes:
+                break
+            if uso["versao"] > 0 and uso["status"] not in STATUS_PROTEGIDOS and PARTE_ENTRADA in uso["partes"]:
+                self.armazenamento.remover_partes(uso["processo_id"], [PARTE_ENTRADA])
+                total -= uso["partes"].pop(PARTE_ENTRADA)
+                eventos["entradas_descartadas"] += 1
+
+        for uso in processos:
+            if total <= self.orcamento_bytes:
+                break
+            if uso["status"] not in STATUS_PROTEGIDOS and PARTE_PDFS in uso["partes"]:
+                self.armazenamento.remover_partes(uso["processo_id"], [PARTE_PDFS])
+                total -= uso["partes"].pop(PARTE_PDFS)
+                total -= self._remover_artefatos(artefatos, _liberar_referencias(referencias, uso["processo_id"]))
+                eventos["pdfs_descartados"] += 1
+
+        for uso in processos:
+            if total <= self.orcamento_bytes:
+                break
+            if uso["status"] not in STATUS_PROTEGIDOS:
+                self.armazenamento.remover(uso["processo_id"])
+                total -= _bytes_processo(uso)
+                total -= self._remover_artefatos(artefatos, _liberar_referencias(referencias, uso["processo_id"]))
+                eventos["processos_removidos"] += 1
+
+        for nome, quantidade in eventos.items():
+            self.armazenamento.incrementar_contador(f"eviccao_{nome}", quantidade)
+        if eventos:
+            logger.info(f"Evicção: {dict(eventos)} (restam {total / (1024 * 1024):.1f}MB)")
+        self.uso_bytes = total
+        return dict(eventos)
+
+    def _interromper_tarefa(self, uso: Dict[str, Any]):
+        status = StatusProcesso.PROCESSADO.value if uso["versao"] > 0 else StatusProcesso.ERRO.value
+        self.armazenamento.finalizar_tarefa(uso["processo_id"], status, erro="Tarefa interrompida")
+        uso["status"] = status
+
+    def _remover_artefatos(self, artefatos: Dict[str, Dict[str, Any]], caminhos: List[str]) -> int:
+        liberados = 0
+        for caminho in caminhos:
+            artefato = artefatos.pop(caminho, None)
+            if artefato is not None:
+                self.cache.remover(caminho)
+                liberados += artefato["tamanho"]
+        return liberados
+
+
+def _liberar_referencias(referencias: Dict[str, Set[str]], processo_id: str) -> List[str]:
+    """Remove as referências do processo e devolve os boletins que ficaram sem nenhuma"""
+
+    orfaos = []
+    for caminho, processos in list(referencias.items()):
+        processos.discard(processo_id)
+        if not processos:
+            del referencias[caminho]
+            orfaos.append(caminho)
+    return orfaos
+
+
+def _bytes_processo(uso: Dict[str, Any]) -> int:
+    return sum(uso["partes"].values())
@@ -0,0 +1,255 @@
+import io
+import os
+import tempfile
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .correcao import ALTERNATIVAS, CorrecaoTurma
+from .metricas import cronometrar
+from .ranking import IndiceRanking
+
+# Formatos de exportação e respectivos Content-Type
+TIPOS_CONTEUDO = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+}
+
+# Alunos convertidos por vez: a memória da exportação não cresce com a turma
+ALUNOS_POR_BLOCO = 2000
+
+# Marcação do aluno por código da matriz de respostas (branco, A-E, inválida)
+MARCACOES = np.array([''] + ALTERNATIVAS + ['*'], dtype=object)
+
+# Cores da formatação condicional (escala vermelho-amarelo-verde do Excel)
+COR_ERRO = 'F8696B'
+COR_MEIO = 'FFEB84'
+COR_ACERTO = '63BE7B'
+
+COLUNAS_ALUNO = ['Posição', 'ID', 'Nome', 'Sede', 'Idioma', 'Nota (%)', 'Acertos', 'Erros', 'Status']
+
+
+class ExportadorResultados:
+    """Planilha de resultados (um aluno por linha, na ordem do ranking) gerada em blocos direto das matrizes"""
+
+    # Colunas: dados do aluno, acertos/total/percentual por disciplina, marcação de
+    # cada questão ('' em branco, '*' inválida) e acerto de cada questão (1/0).
+
+    def __init__(self, turma: CorrecaoTurma, ranking: IndiceRanking, status: np.ndarray,
+                 alunos_por_bloco: int = ALUNOS_POR_BLOCO):
+        self.turma = turma
+        self.ranking = ranking
+        self.status = status
+        self.alunos_por_bloco = alunos_por_bloco
+
+    @property
+    def total_alunos(self) -> int:
+        return len(self.ranking)
+
+    def colunas_disciplinas(self) -> List[str]:
+        return [
+            f"{nome} {sufixo}"
+            for nome in self.turma.gabarito.nomes_disciplinas
+            for sufixo in ('- acertos', '- total', '(%)')
+        ]
+
+    def colunas_questoes(self) -> List[str]:
+        return [f"Q{int(numero):02d}" for numero in self.turma.gabarito.numeros]
+
+    def colunas(self) -> List[str]:
+        questoes = self.colunas_questoes()
+        return COLUNAS_ALUNO + self.colunas_disciplinas() + questoes + [f"{q} acerto" for q in questoes]
+
+    def blocos(self) -> Iterator[pd.DataFrame]:
+        """DataFrames de até `alunos_por_bloco` linhas, na ordem do ranking"""
+
+        ordem = self.ranking.ordem
+        for inicio in range(0, len(ordem), self.alunos_por_bloco):
+            yield self._bloco(ordem[inicio:inicio + self.alunos_por_bloco])
+
+    def gerar(self, formato: str) -> Iterator[bytes]:
+        """Bytes do arquivo no formato pedido, em pedaços"""
+        return EXPORTADORES[formato](self)
+
+    def csv(self) -> Iterator[bytes]:
+        """CSV para o Excel em português: UTF-8 com BOM, ';' e vírgula decimal"""
+
+        yield '\ufeff'.encode('utf-8')
+        for i, bloco in enumerate(self.blocos()):
+            saida = io.StringIO()
+            bloco.to_csv(saida, sep=';', decimal=',', float_format='%.2f', index=False, header=i == 0)
+            yield saida.getvalue().encode('utf-8')
+
+    def parquet(self) -> Iterator[bytes]:
+        """Parquet com um row group por bloco (requer pyarrow)"""
+
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        def escrever(caminho: str):
+            escritor = None
+            try:
+                for bloco in self.blocos():
+                    if escritor is None:
+                        # Tipos fixados pelo primeiro bloco (texto mesmo se o bloco só tiver nulos)
+                        esquema = pa.schema([
+                            (coluna, pa.string() if tipo == object else pa.from_numpy_dtype(tipo))
+                            for coluna, tipo in bloco.dtypes.items()
+                        ])
+                        escritor = pq.ParquetWriter(caminho, esquema)
+                    escritor.write_table(pa.Table.from_pandas(bloco, schema=esquema, preserve_index=False))
+            finally:
+                if escritor is not None:
+                    escritor.close()
+
+        return _gerar_em_arquivo('.parquet', escrever)
+
+    def xlsx(self) -> Iterator[bytes]:
+        """XLSX em modo write-only (linhas vão direto para disco) com formatação condicional"""
+
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font
+
+        def escrever(caminho: str):
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet("RESULTADOS")
+            ws.freeze_panes = 'D2'
+            self._formatar_xlsx(ws)
+
+            negrito = Font(bold=True)
+            cabecalho = []
+            for nome in self.colunas():
+                celula = WriteOnlyCell(ws, value=nome)
+                celula.font = negrito
+                cabecalho.append(celula)
+            ws.append(cabecalho)
+
+            for bloco in self.blocos():
+                # Nulos (sede, percentual de disciplina não cursada) viram células vazias
+                valores = bloco.astype(object).where(bloco.notna(), None)
+                for linha in valores.itertuples(index=False, name=None):
+                    ws.append(linha)
+            wb.save(caminho)
+
+        return _gerar_em_arquivo('.xlsx', escrever)
+
+    def _formatar_xlsx(self, ws):
+        from openpyxl.formatting.rule import ColorScaleRule, FormulaRule
+        from openpyxl.styles import PatternFill
+        from openpyxl.utils import get_column_letter
+
+        ultima = self.total_alunos + 1
+        if ultima < 2:
+            return
+
+        def intervalo(primeira: int, ultima_coluna: int) -> str:
+            return f"{get_column_letter(primeira)}2:{get_column_letter(ultima_coluna)}{ultima}"
+
+        escala = ColorScaleRule(
+            start_type='num', start_value=0, start_color=COR_ERRO,
+            mid_type='num', mid_value=50, mid_color=COR_MEIO,
+            end_type='num', end_value=100, end_color=COR_ACERTO
+        )
+
+        # Nota e percentuais por disciplina: escala de cor de 0 a 100
+        coluna_nota = COLUNAS_ALUNO.index('Nota (%)') + 1
+        ws.conditional_formatting.add(intervalo(coluna_nota, coluna_nota), escala)
+        primeira_disciplina = len(COLUNAS_ALUNO) + 1
+        for d in range(len(self.turma.gabarito.nomes_disciplinas)):
+            coluna = primeira_disciplina + 3 * d + 2
+            ws.conditional_formatting.add(intervalo(coluna, coluna), escala)
+
+        # Questões: acerto em verde, erro em vermelho; a marcação herda a cor do acerto
+        total_questoes = self.turma.gabarito.total_questoes
+        if total_questoes == 0:
+            return
+        primeira_marcacao = primeira_disciplina + 3 * len(self.turma.gabarito.nomes_disciplinas)
+        primeiro_acerto = primeira_marcacao + total_questoes
+        verde = PatternFill(start_color=COR_ACERTO, end_color=COR_ACERTO, fill_type='solid')
+        vermelho = PatternFill(start_color=COR_ERRO, end_color=COR_ERRO, fill_type='solid')
+
+        acerto = f"{get_column_letter(primeiro_acerto)}2"
+        marcacoes = intervalo(primeira_marcacao, primeiro_acerto - 1)
+        ws.conditional_formatting.add(marcacoes, FormulaRule(formula=[f"{acerto}=1"], fill=verde))
+        ws.conditional_formatting.add(
+            marcacoes, FormulaRule(formula=[f'AND({get_column_letter(primeira_marcacao)}2<>"",{acerto}=0)'], fill=vermelho)
+        )
+
+        acertos = intervalo(primeiro_acerto, primeiro_acerto + total_questoes - 1)
+        ws.conditional_formatting.add(acertos, FormulaRule(formula=[f"{acerto}=1"], fill=verde))
+        ws.conditional_formatting.add(acertos, FormulaRule(formula=[f"{acerto}=0"], fill=vermelho))
+
+    def _bloco(self, indices: np.ndarray) -> pd.DataFrame:
+        alunos, gabarito, correcao = self.turma.alunos, self.turma.gabarito, self.turma.correcao
+
+        colunas: Dict[str, np.ndarray] = {
+            'Posição': self.ranking.posicoes[indices],
+            'ID': alunos.ids[indices],
+            'Nome': alunos.nomes[indices],
+            'Sede': alunos.sedes[indices],
+            'Idioma': alunos.idiomas[indices],
+            'Nota (%)': correcao.nota_percentual[indices],
+            'Acertos': correcao.acertos[indices],
+            'Erros': correcao.erros[indices],
+            'Status': self.status[indices]
+        }
+
+        acertos_disciplina = correcao.acertos_disciplina[indices]
+        total_disciplina = correcao.total_disciplina[indices]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percentuais = np.where(total_disciplina > 0, acertos_disciplina / total_disciplina * 100, np.nan)
+        nomes_disciplinas = iter(self.colunas_disciplinas())
+        for d in range(len(gabarito.nomes_disciplinas)):
+            colunas[next(nomes_disciplinas)] = acertos_disciplina[:, d]
+            colunas[next(nomes_disciplinas)] = total_disciplina[:, d]
+            colunas[next(nomes_disciplinas)] = percentuais[:, d]
+
+        questoes = self.colunas_questoes()
+        marcacoes = MARCACOES[np.minimum(alunos.respostas[indices], len(MARCACOES) - 1)]
+        corretas = correcao.corretas[indices].astype(np.uint8)
+        for j, questao in enumerate(questoes):
+            colunas[questao] = marcacoes[:, j]
+        for j, questao in enumerate(questoes):
+            colunas[f"{questao} acerto"] = corretas[:, j]
+
+        return pd.DataFrame(colunas)
+
+
+def _gerar_em_arquivo(sufixo: str, escrever: Callable[[str], None],
+                      tamanho_bloco: int = 1024 * 1024) -> Iterator[bytes]:
+    """Escreve o arquivo inteiro em disco (formatos que só fecham no fim) e o transmite em pedaços"""
+
+    descritor, caminho = tempfile.mkstemp(suffix=sufixo, prefix='exportacao_')
+    os.close(descritor)
+    try:
+        with cronometrar("exportacao"):
+            escrever(caminho)
+        with open(caminho, 'rb') as arquivo:
+            while True:
+                bloco = arquivo.read(tamanho_bloco)
+                if not bloco:
+                    break
+                yield bloco
+    finally:
+        os.remove(caminho)
+
+
+EXPORTADORES: Dict[str, Callable[[ExportadorResultados], Iterator[bytes]]] = {
+    "csv": ExportadorResultados.csv,
+    "parquet": ExportadorResultados.parquet,
+    "xlsx": ExportadorResultados.xlsx,
+}
+
+
+def formato_disponivel(formato: str) -> Optional[str]:
+    """Mensagem de erro se o formato depende de um pacote ausente, senão None"""
+
+    if formato == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            return "Exportação em Parquet requer o pacote pyarrow"
+    return None
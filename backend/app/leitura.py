@@ -0,0 +1,366 @@
+import io
+import os
+import re
+import time
+import codecs
+import logging
+import zipfile
+from typing import BinaryIO, Callable, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from .metricas import cronometrar
+
+logger = logging.getLogger(__name__)
+
+# Abas consumidas pelo corretor; as demais (INSTRUÇÕES etc.) nunca são lidas
+ABAS_SIMULADO = ('RESPOSTAS', 'GABARITO')
+
+# Ordem de preferência, do motor mais rápido para o mais lento (ver benchmarks)
+MOTORES_PREFERENCIA = ['calamine', 'openpyxl']
+
+# Formatos tabulares: uma aba por arquivo, com o nome da aba (RESPOSTAS.csv, GABARITO.parquet)
+EXTENSOES_TABELA = ('.csv', '.parquet', '.arrow', '.feather', '.ipc')
+
+# Tudo que o upload aceita: planilha Excel, CSV com as abas em seções ou .zip com um arquivo por aba
+EXTENSOES_ACEITAS = ('.xlsx', '.xls', '.csv', '.zip')
+
+# Linha que abre uma aba dentro de um CSV único: [RESPOSTAS] ... [GABARITO] ...
+SECAO_CSV = re.compile(rb'^(?:\xef\xbb\xbf)?\[([A-Za-z]+)\][;,\t]*\r?$', re.MULTILINE)
+
+# Colunas sempre lidas como texto (sem inferência numérica: IDs com zeros à esquerda)
+COLUNAS_TEXTO = ('ID', 'Nome', 'Sede', 'Idioma escolhido', 'Resposta', 'Disciplina')
+
+
+class ErroLeitura(Exception):
+    """Falha ao ler a planilha enviada"""
+
+
+class LeitorPlanilha:
+    """Lê apenas as abas necessárias de uma planilha, em modo streaming"""
+
+    def __init__(self, motor: Optional[str] = None):
+        # Motor explícito (parâmetro ou CORRETOR_MOTOR_EXCEL) ou escolha automática
+        motor = motor or os.getenv('CORRETOR_MOTOR_EXCEL')
+        if motor:
+            if motor not in LEITORES:
+                raise ValueError(f"Motor de leitura desconhecido: {motor}")
+            self.motores = [motor]
+        else:
+            self.motores = motores_disponiveis()
+
+    @cronometrar("leitura")
+    def ler(self, arquivo: BinaryIO, nome_arquivo: str, abas: Sequence[str] = ABAS_SIMULADO) -> Dict[str, pd.DataFrame]:
+        """Lê as abas pedidas; no Excel, cai para o próximo motor em caso de falha
+
+        Além de .xlsx/.xls: CSV único com as abas em seções ou .zip com um arquivo
+        por aba (CSV, Parquet ou Arrow IPC), lidos pelos parsers nativos do pyarrow.
+        """
+
+        nome = nome_arquivo.lower()
+        if nome.endswith('.xls'):
+            # Formato binário antigo: apenas o leitor do pandas (xlrd) entende
+            return _ler_xls(arquivo, abas)
+        if nome.endswith('.zip'):
+            return _ler_pacote(arquivo, nome_arquivo, abas)
+        if nome.endswith('.csv'):
+            return _ler_csv_secoes(arquivo, nome_arquivo, abas)
+        if nome.endswith(EXTENSOES_TABELA):
+            raise ErroLeitura(
+                f"{nome_arquivo}: o arquivo contém uma única aba; envie um .zip com um arquivo "
+                f"por aba ({', '.join(abas)})"
+            )
+
+        falhas = []
+        for motor in self.motores:
+            arquivo.seek(0)
+            inicio = time.perf_counter()
+            try:
+                dados = LEITORES[motor](arquivo, abas)
+            except Exception as e:
+                logger.warning(f"Motor '{motor}' falhou ao ler {nome_arquivo}: {e}")
+                falhas.append(f"{motor}: {e}")
+                continue
+
+            logger.info(f"{nome_arquivo} lido com '{motor}' em {time.perf_counter() - inicio:.2f}s")
+            return dados
+
+        raise ErroLeitura("; ".join(falhas) or "Nenhum motor de leitura disponível")
+
+
+def motores_disponiveis() -> List[str]:
+    """Motores instalados, na ordem de preferência"""
+
+    disponiveis = []
+    for motor in MOTORES_PREFERENCIA:
+        try:
+            __import__(MODULOS_MOTORES[motor])
+            disponiveis.append(motor)
+        except ImportError:
+            continue
+    return disponiveis
+
+
+def _ler_openpyxl(arquivo: BinaryIO, abas: Sequence[str]) -> Dict[str, pd.DataFrame]:
+    """Leitura em modo read-only do openpyxl (linhas sob demanda, sem modelo de células)"""
+
+    import openpyxl
+
+    wb = openpyxl.load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        return {
+            aba: _montar_dataframe(wb[aba].iter_rows(values_only=True))
+            for aba in abas if aba in wb.sheetnames
+        }
+    finally:
+        wb.close()
+
+
+def _ler_calamine(arquivo: BinaryIO, abas: Sequence[str]) -> Dict[str, pd.DataFrame]:
+    """Leitura com o parser nativo (Rust) do python-calamine"""
+
+    from python_calamine import CalamineWorkbook
+
+    wb = CalamineWorkbook.from_filelike(arquivo)
+    return {
+        aba: _montar_dataframe(wb.get_sheet_by_name(aba).to_python(skip_empty_area=False), vazio='')
+        for aba in abas if aba in wb.sheet_names
+    }
+
+
+def ler_tabela(arquivo: BinaryIO, nome_arquivo: str) -> pd.DataFrame:
+    """Uma aba em CSV, Parquet ou Arrow IPC, com a mesma semântica da leitura do Excel"""
+
+    extensao = os.path.splitext(nome_arquivo.lower())[1]
+    if extensao == '.csv':
+        return _ler_csv(arquivo.read())
+
+    pa = _importar_pyarrow(nome_arquivo)
+    arquivo.seek(0)
+    try:
+        if extensao == '.parquet':
+            import pyarrow.parquet as pq
+            tabela = pq.read_table(arquivo)
+        else:
+            tabela = _ler_ipc(pa, arquivo)
+    except pa.ArrowException as e:
+        raise ErroLeitura(f"{nome_arquivo}: {e}")
+    return _normalizar_tabela(_anular_textos_vazios(pa, tabela).to_pandas())
+
+
+def _ler_pacote(arquivo: BinaryIO, nome_arquivo: str, abas: Sequence[str]) -> Dict[str, pd.DataFrame]:
+    """.zip com um arquivo tabular por aba, nomeado pela aba (RESPOSTAS.parquet, GABARITO.csv)"""
+
+    try:
+        zf = zipfile.ZipFile(arquivo)
+    except zipfile.BadZipFile:
+        raise ErroLeitura(f"{nome_arquivo}: arquivo .zip inválido")
+
+    with zf:
+        membros = {}
+        for info in zf.infolist():
+            aba = aba_do_arquivo(info.filename, abas)
+            if info.is_dir() or aba is None:
+                continue
+            if aba in membros:
+                raise ErroLeitura(f"{nome_arquivo}: mais de um arquivo para a aba {aba}")
+            membros[aba] = info
+        if not membros:
+            raise ErroLeitura(
+                f"{nome_arquivo}: nenhum arquivo de aba ({', '.join(abas)}) em "
+                f"{', '.join(EXTENSOES_TABELA)}"
+            )
+        return {aba: ler_tabela(io.BytesIO(zf.read(info)), info.filename) for aba, info in membros.items()}
+
+
+def aba_do_arquivo(caminho: str, abas: Sequence[str] = ABAS_SIMULADO) -> Optional[str]:
+    """Aba representada por um arquivo tabular (pelo nome, sem diferenciar maiúsculas) ou None"""
+
+    base = os.path.basename(caminho)
+    raiz, extensao = os.path.splitext(base)
+    if base.startswith(('.', '~$')) or extensao.lower() not in EXTENSOES_TABELA:
+        return None
+    return next((aba for aba in abas if aba.upper() == raiz.upper()), None)
+
+
+def _ler_csv_secoes(arquivo: BinaryIO, nome_arquivo: str, abas: Sequence[str]) -> Dict[str, pd.DataFrame]:
+    """CSV único com as abas em seções, cada uma aberta por uma linha [NOME DA ABA]"""
+
+    conteudo = arquivo.read()
+    secoes = list(SECAO_CSV.finditer(conteudo))
+    if not secoes:
+        raise ErroLeitura(
+            f"{nome_arquivo}: CSV sem as seções {' e '.join(f'[{aba}]' for aba in abas)}; "
+            f"separe as abas com essas linhas ou envie um .zip com um arquivo por aba"
+        )
+
+    visao = memoryview(conteudo)
+    dados = {}
+    for i, secao in enumerate(secoes):
+        aba = secao.group(1).decode('ascii').upper()
+        if aba not in abas:
+            continue
+        fim = secoes[i + 1].start() if i + 1 < len(secoes) else len(conteudo)
+        dados[aba] = _ler_csv(visao[secao.end():fim])
+    return dados
+
+
+def _ler_csv(conteudo) -> pd.DataFrame:
+    """CSV exportado por leitora óptica ou Excel: separador e codificação detectados"""
+
+    amostra = bytes(conteudo[:65536]).lstrip(b'\r\n')
+    primeira_linha = amostra.split(b'\n', 1)[0]
+    separador = max((';', ',', '\t'), key=lambda s: primeira_linha.count(s.encode()))
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(amostra)
+        codificacao = 'utf-8'
+    except UnicodeDecodeError:
+        # Excel no Windows exporta CSV em cp1252
+        codificacao = 'cp1252'
+
+    try:
+        import pyarrow
+    except ImportError:
+        # Sem pyarrow: parser C do pandas
+        df = pd.read_csv(
+            io.BytesIO(conteudo), sep=separador, encoding='utf-8-sig' if codificacao == 'utf-8' else codificacao,
+            dtype={coluna: str for coluna in COLUNAS_TEXTO}, keep_default_na=False, na_values=['']
+        )
+        return _normalizar_tabela(df)
+
+    from pyarrow import csv
+    try:
+        tabela = csv.read_csv(
+            pyarrow.py_buffer(conteudo),
+            read_options=csv.ReadOptions(encoding=codificacao),
+            parse_options=csv.ParseOptions(delimiter=separador),
+            convert_options=csv.ConvertOptions(
+                column_types={coluna: pyarrow.string() for coluna in COLUNAS_TEXTO},
+                null_values=[''], strings_can_be_null=True, quoted_strings_can_be_null=True
+            )
+        )
+    except pyarrow.ArrowException as e:
+        raise ErroLeitura(f"CSV inválido: {e}")
+    return _normalizar_tabela(tabela.to_pandas())
+
+
+def _ler_ipc(pa, arquivo: BinaryIO):
+    """Arrow IPC nos dois formatos: arquivo (Feather v2) ou stream"""
+
+    try:
+        return pa.ipc.open_file(arquivo).read_all()
+    except pa.ArrowInvalid:
+        arquivo.seek(0)
+        return pa.ipc.open_stream(arquivo).read_all()
+
+
+def _importar_pyarrow(nome_arquivo: str):
+    try:
+        import pyarrow
+        import pyarrow.ipc
+    except ImportError:
+        raise ErroLeitura(f"{nome_arquivo}: leitura de Parquet/Arrow requer o pacote pyarrow")
+    return pyarrow
+
+
+def _anular_textos_vazios(pa, tabela):
+    """Textos vazios viram nulos, como as células vazias do Excel (no CSV o leitor já faz isso)"""
+
+    import pyarrow.compute as pc
+
+    for i, campo in enumerate(tabela.schema):
+        if pa.types.is_string(campo.type) or pa.types.is_large_string(campo.type):
+            coluna = tabela.column(i)
+            vazios = pc.equal(coluna, '')
+            if pc.any(vazios).as_py():
+                tabela = tabela.set_column(i, campo, pc.if_else(vazios, pa.scalar(None, campo.type), coluna))
+    return tabela
+
+
+def _normalizar_tabela(df: pd.DataFrame) -> pd.DataFrame:
+    """Mesma semântica do _montar_dataframe: cabeçalhos como no pandas, sem linhas e colunas finais vazias"""
+
+    df.columns = _nomear_colunas([None if str(c).strip() == '' else c for c in df.columns])
+
+    # Colunas finais sem cabeçalho nem dados (separadores sobrando no fim das linhas)
+    largura = len(df.columns)
+    while largura > 0 and str(df.columns[largura - 1]).startswith('Unnamed: ') and df.iloc[:, largura - 1].isna().all():
+        largura -= 1
+    if largura < len(df.columns):
+        df = df.iloc[:, :largura]
+
+    preenchidas = df.notna().any(axis=1)
+    if not preenchidas.all():
+        df = df[preenchidas].reset_index(drop=True)
+    return df
+
+
+def _ler_xls(arquivo: BinaryIO, abas: Sequence[str]) -> Dict[str, pd.DataFrame]:
+    """Planilhas .xls legadas"""
+
+    arquivo.seek(0)
+    planilha = pd.ExcelFile(arquivo)
+    return {aba: planilha.parse(aba) for aba in abas if aba in planilha.sheet_names}
+
+
+def _montar_dataframe(linhas, vazio=None) -> pd.DataFrame:
+    """Monta o DataFrame a partir das linhas cruas, com a mesma semântica do pd.read_excel"""
+
+    linhas = iter(linhas)
+    cabecalho = [_converter_celula(v, vazio) for v in next(linhas, ())]
+
+    dados = []
+    for linha in linhas:
+        valores = [_converter_celula(v, vazio) for v in linha]
+        # Linhas totalmente vazias são ignoradas
+        if any(v is not None for v in valores):
+            dados.append(valores)
+
+    # Colunas finais sem cabeçalho nem dados são descartadas
+    largura = len(cabecalho)
+    while largura > 0 and cabecalho[largura - 1] is None and all(
+        len(linha) < largura or linha[largura - 1] is None for linha in dados
+    ):
+        largura -= 1
+
+    colunas = _nomear_colunas(cabecalho[:largura])
+    dados = [(linha + [None] * (largura - len(linha)))[:largura] for linha in dados]
+    return pd.DataFrame(dados, columns=colunas)
+
+
+def _converter_celula(valor, vazio=None):
+    """Normaliza o valor de uma célula (vazio -> None, float inteiro -> int)"""
+
+    if valor is None or (vazio is not None and valor == vazio):
+        return None
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    return valor
+
+
+def _nomear_colunas(cabecalho: List) -> List:
+    """Cabeçalhos vazios viram 'Unnamed: n' e repetidos recebem sufixo, como no pandas"""
+
+    colunas = []
+    vistos: Dict = {}
+    for i, nome in enumerate(cabecalho):
+        if nome is None:
+            nome = f"Unnamed: {i}"
+        if nome in vistos:
+            vistos[nome] += 1
+            nome = f"{nome}.{vistos[nome]}"
+        else:
+            vistos[nome] = 0
+        colunas.append(nome)
+    return colunas
+
+
+LEITORES: Dict[str, Callable[[BinaryIO, Sequence[str]], Dict[str, pd.DataFrame]]] = {
+    'calamine': _ler_calamine,
+    'openpyxl': _ler_openpyxl,
+}
+
+MODULOS_MOTORES = {
+    'calamine': 'python_calamine',
+    'openpyxl': 'openpyxl',
+}
@@ -0,0 +1,179 @@
+import io
+import os
+import asyncio
+import zipfile
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Dict, List, Sequence, Tuple, Union
+
+import pandas as pd
+from fastapi.concurrency import run_in_threadpool
+
+from .leitura import LeitorPlanilha, aba_do_arquivo
+from .services import ProcessadorSimulado
+
+# Extensões aceitas como planilha (enviadas diretamente ou dentro de um .zip); um .zip
+# com um arquivo por aba (RESPOSTAS.parquet, GABARITO.csv...) também conta como planilha
+EXTENSOES_PLANILHA = ('.xlsx', '.xls', '.csv')
+
+
+class ErroLote(Exception):
+    """Lote de planilhas rejeitado (uma mensagem por problema encontrado)"""
+
+    def __init__(self, erros: List[str], status_code: int = 400):
+        super().__init__("; ".join(erros))
+        self.erros = erros
+        self.status_code = status_code
+
+
+@dataclass
+class PlanilhaLote:
+    nome: str
+    arquivo: BinaryIO
+
+
+def expandir_arquivos(arquivos: Sequence[Tuple[str, BinaryIO]], limite_bytes: int,
+                      max_planilhas: int) -> Tuple[List[PlanilhaLote], List[str]]:
+    """Planilhas enviadas diretamente ou dentro de arquivos .zip, e avisos sobre o que foi ignorado"""
+
+    planilhas = []
+    avisos = []
+    for nome, arquivo in arquivos:
+        nome = nome or ""
+        if nome.lower().endswith('.zip') and not _eh_pacote(arquivo):
+            planilhas.extend(_extrair_zip(nome, arquivo, limite_bytes, avisos))
+        elif nome.lower().endswith(EXTENSOES_PLANILHA + ('.zip',)):
+            # Tamanho medido no arquivo temporário do upload, sem carregá-lo em memória
+            arquivo.seek(0, os.SEEK_END)
+            tamanho = arquivo.tell()
+            arquivo.seek(0)
+            if tamanho > limite_bytes:
+                raise ErroLote([f"{nome}: arquivo maior que {limite_bytes // (1024 * 1024)}MB"], status_code=413)
+            planilhas.append(PlanilhaLote(nome, arquivo))
+        else:
+            raise ErroLote([f"{nome}: arquivo deve ser Excel (.xlsx ou .xls), CSV ou .zip"])
+
+    if not planilhas:
+        raise ErroLote(["Nenhuma planilha encontrada no envio"])
+    if len(planilhas) > max_planilhas:
+        raise ErroLote([f"Lote com {len(planilhas)} planilhas; o máximo é {max_planilhas}"])
+
+    return planilhas, avisos
+
+
+def _extrair_zip(nome: str, arquivo: BinaryIO, limite_bytes: int, avisos: List[str]) -> List[PlanilhaLote]:
+    try:
+        zf = zipfile.ZipFile(arquivo)
+    except zipfile.BadZipFile:
+        raise ErroLote([f"{nome}: arquivo .zip inválido"])
+
+    planilhas = []
+    with zf:
+        for info in zf.infolist():
+            base = os.path.basename(info.filename)
+            if info.is_dir() or info.filename.startswith('__MACOSX/') or base.startswith(('.', '~$')):
+                continue
+            if not base.lower().endswith(EXTENSOES_PLANILHA + ('.zip',)):
+                avisos.append(f"{nome}: '{info.filename}' ignorado (formato não suportado)")
+                continue
+            # Tamanho declarado conferido antes de descompactar
+            if info.file_size > limite_bytes:
+                raise ErroLote([f"{nome}/{base}: arquivo maior que {limite_bytes // (1024 * 1024)}MB"], status_code=413)
+            planilhas.append(PlanilhaLote(base, io.BytesIO(zf.read(info))))
+    return planilhas
+
+
+def _eh_pacote(arquivo: BinaryIO) -> bool:
+    """.zip com os arquivos das abas (uma planilha) em vez de várias planilhas"""
+
+    try:
+        with zipfile.ZipFile(arquivo) as zf:
+            return any(aba_do_arquivo(nome) is not None for nome in zf.namelist())
+    except zipfile.BadZipFile:
+        return False
+    finally:
+        arquivo.seek(0)
+
+
+async def ler_planilhas(planilhas: Sequence[PlanilhaLote],
+                        leitor: LeitorPlanilha) -> List[Union[Dict[str, pd.DataFrame], BaseException]]:
+    """Lê as planilhas em paralelo no threadpool; a falha de uma não interrompe as demais"""
+
+    return await asyncio.gather(
+        *(run_in_threadpool(leitor.ler, planilha.arquivo, planilha.nome) for planilha in planilhas),
+        return_exceptions=True
+    )
+
+
+def validar_lote(planilhas: Sequence[PlanilhaLote],
+                 lidas: Sequence[Union[Dict[str, pd.DataFrame], BaseException]]) -> List[Dict[str, Any]]:
+    """Valida cada planilha e exige o mesmo gabarito em todas (compilado uma única vez na correção)"""
+
+    processador = ProcessadorSimulado()
+    erros = []
+    validacoes = []
+    referencia = None
+
+    for planilha, dados in zip(planilhas, lidas):
+        if isinstance(dados, BaseException):
+            erros.append(f"{planilha.nome}: erro ao ler a planilha ({dados})")
+            continue
+
+        validacao = processador.validar_estrutura(dados)
+        validacoes.append({"arquivo": planilha.nome, "validacao": validacao})
+        if not validacao["valido"]:
+            erros.extend(f"{planilha.nome}: {erro}" for erro in validacao["erros"])
+            continue
+
+        try:
+            assinatura = assinatura_gabarito(dados['GABARITO'])
+        except (TypeError, ValueError) as e:
+            erros.append(f"{planilha.nome}: aba GABARITO inválida ({e})")
+            continue
+
+        if referencia is None:
+            referencia = (planilha.nome, assinatura)
+        elif assinatura != referencia[1]:
+            erros.append(f"{planilha.nome}: gabarito diferente do de {referencia[0]}")
+
+    if erros:
+        raise ErroLote(erros)
+    return validacoes
+
+
+def assinatura_gabarito(gabarito_df: pd.DataFrame) -> Tuple[tuple, tuple, tuple]:
+    """Linhas do gabarito normalizadas como na compilação (mesma assinatura, mesmo gabarito compilado)"""
+
+    return (
+        tuple(gabarito_df['Questão'].astype(int)),
+        tuple(gabarito_df['Disciplina'].astype(str).str.strip()),
+        tuple(gabarito_df['Resposta'].astype(str).str.strip().str.upper())
+    )
+
+
+def unificar_planilhas(planilhas: Sequence[PlanilhaLote],
+                       lidas: Sequence[Dict[str, pd.DataFrame]]) -> Tuple[Dict[str, pd.DataFrame], List[str]]:
+    """Concatena as respostas de todas as planilhas em uma única turma
+
+    Alunos sem sede recebem o nome do arquivo de origem, para que a turma unificada
+    continue separável por escola.
+    """
+
+    respostas = []
+    for planilha, dados in zip(planilhas, lidas):
+        df = dados['RESPOSTAS']
+        sede = os.path.splitext(planilha.nome)[0]
+        if 'Sede' in df.columns:
+            vazia = df['Sede'].isna() | (df['Sede'].astype(str).str.strip() == '')
+            df = df.assign(Sede=df['Sede'].where(~vazia, sede))
+        else:
+            df = df.assign(Sede=sede)
+        respostas.append(df)
+
+    unificadas = pd.concat(respostas, ignore_index=True, sort=False)
+
+    avisos = []
+    repetidos = unificadas['ID'].astype(str).duplicated(keep=False)
+    if repetidos.any():
+        avisos.append(f"{int(repetidos.sum())} aluno(s) com ID repetido na turma unificada")
+
+    return {'RESPOSTAS': unificadas, 'GABARITO': lidas[0]['GABARITO']}, avisos
@@ -1,18 +1,40 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, Query, Request, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
 import pandas as pd
 import numpy as np
 import io
 import os
+import time
+import logging
+import sys
 import uuid
-from typing import List, Dict, Any
+import zipfile
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
 import asyncio
 from datetime import datetime
 
-from .services import ProcessadorSimulado
-from .models import EstudanteResponse, EstatisticasResponse
-from .utils import GeradorPDF
+from .services import ProcessadorSimulado, CAMPOS_ESTUDANTE
+from .models import (
+    EstudanteResponse, EstatisticasResponse, ConfiguracaoSistema, PDFInfo, ProcessoStatus, StatusProcesso,
+    EmendaGabarito, ModoLote, AnaliseItensResponse, FormatoExportacao, OrdemBoletins, IndiceBoletinsResponse
+)
+from .armazenamento import criar_armazenamento, PARTE_ENTRADA
+from .correcao import EntradaCompilada
+from .artefatos import CacheArtefatos
+from .eviccao import PoliticaEviccao, STATUS_PROTEGIDOS
+from .tarefas import FilaTarefas
+from .leitura import EXTENSOES_ACEITAS, ErroLeitura, LeitorPlanilha
+from .respostas import CacheRespostas
+from .exportacao import TIPOS_CONTEUDO, formato_disponivel
+from .metricas import BYTES_ENVIADOS, DURACAO_REQUISICOES, TIPO_CONTEUDO, registro as registro_metricas
+from .lote import ErroLote, expandir_arquivos, ler_planilhas, validar_lote, unificar_planilhas
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="Corretor ACAFE Fleming",
@@ -29,8 +51,215 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Armazenamento temporário em memória
-processamentos = {}
+# Rotas de download entregam PDF/ZIP, que não ganham nada com gzip
+ROTAS_SEM_COMPRESSAO = ("/api/download-", "/api/template-excel")
+
+class CompressaoRespostas:
+    """GZip nas respostas da API (JSON), exceto nos downloads de arquivos"""
+    
+    def __init__(self, app, minimum_size: int = 1024):
+        self.app = app
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size)
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not scope["path"].startswith(ROTAS_SEM_COMPRESSAO):
+            await self.gzip(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+app.add_middleware(CompressaoRespostas, minimum_size=1024)
+
+class MedicaoRespostas:
+    """Duração e bytes enviados (já comprimidos) de cada requisição, por endpoint"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        inicio = time.perf_counter()
+        enviados = 0
+        
+        async def enviar(mensagem):
+            nonlocal enviados
+            if mensagem["type"] == "http.response.body":
+                enviados += len(mensagem.get("body", b""))
+            await send(mensagem)
+        
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            # O roteador grava o endpoint no scope; rótulo de baixa cardinalidade
+            endpoint = getattr(scope.get("endpoint"), "__name__", "desconhecido")
+            DURACAO_REQUISICOES.observar(time.perf_counter() - inicio, endpoint=endpoint)
+            BYTES_ENVIADOS.incrementar(enviados, endpoint=endpoint)
+
+# Por último: mede o que de fato sai pela rede
+app.add_middleware(MedicaoRespostas)
+
+config = ConfiguracaoSistema()
+
+# Registro de processos compartilhado entre workers (SQLite)
+armazenamento = criar_armazenamento(config.caminho_banco)
+
+# Boletins gerados, compartilhados entre processos com o mesmo conteúdo
+cache_boletins = CacheArtefatos(config.diretorio_artefatos)
+
+# Expiração e descarte LRU dos processos armazenados
+politica_eviccao = PoliticaEviccao(
+    armazenamento,
+    cache_boletins,
+    ttl_segundos=config.ttl_processo_minutos * 60,
+    orcamento_bytes=config.orcamento_armazenamento_mb * 1024 * 1024,
+    timeout_tarefa_segundos=config.timeout_processamento
+)
+
+# Correção e geração de PDFs em segundo plano
+fila_tarefas = FilaTarefas(armazenamento, config.max_tarefas_simultaneas, apos_tarefa=politica_eviccao.aplicar)
+
+# Valores instantâneos, lidos a cada coleta do /metrics
+registro_metricas.medidor(
+    "corretor_processos_ativos", "Processos no registro compartilhado",
+    lambda: {(): armazenamento.contar()}
+)
+registro_metricas.medidor(
+    "corretor_tarefas", "Tarefas em segundo plano deste worker, por estado",
+    lambda: {(estado,): total for estado, total in fila_tarefas.ocupacao().items()},
+    ("estado",)
+)
+
+# Resultados já reconstruídos neste worker, por processo e versão (LRU)
+# Respostas já serializadas, com ETag pela versão do processo
+cache_respostas = CacheRespostas(config.max_respostas_cache_mb * 1024 * 1024, minimo_compressao=1024)
+
+_resultados_cache: "OrderedDict[str, Tuple[int, Dict[str, Any]]]" = OrderedDict()
+
+async def _obter_registro(processo_id: str) -> Dict[str, Any]:
+    # Consultas ao SQLite rodam fora do event loop
+    registro = await run_in_threadpool(armazenamento.obter, processo_id)
+    if registro is None:
+        raise HTTPException(status_code=404, detail="Processo não encontrado")
+    return registro
+
+def _exigir_processado(registro: Dict[str, Any]):
+    # Uma correção gravada continua valendo enquanto outra tarefa roda sobre o processo
+    if registro["versao"] == 0:
+        raise HTTPException(status_code=400, detail="Processo ainda não foi processado")
+
+def _tarefa_em_andamento():
+    return HTTPException(status_code=409, detail="Processo já possui uma tarefa em andamento")
+
+def _carregar_resultado(registro: Dict[str, Any]) -> Dict[str, Any]:
+    """Resultado completo do processo, reconstruído dos arrays armazenados"""
+    
+    processo_id = registro["processo_id"]
+    em_cache = _resultados_cache.get(processo_id)
+    if em_cache is not None and em_cache[0] == registro["versao"]:
+        _resultados_cache.move_to_end(processo_id)
+        return em_cache[1]
+    
+    resultado = ProcessadorSimulado().restaurar_resultado(
+        armazenamento.carregar_turma(processo_id),
+        EstatisticasResponse(**armazenamento.carregar_estatisticas(processo_id)),
+        armazenamento.carregar_metadados(processo_id)
+    )
+    _resultados_cache[processo_id] = (registro["versao"], resultado)
+    _resultados_cache.move_to_end(processo_id)
+    while len(_resultados_cache) > config.max_resultados_cache:
+        _resultados_cache.popitem(last=False)
+    return resultado
+
+def _preview_entrada(entrada: EntradaCompilada) -> Dict[str, Any]:
+    gabarito = entrada.gabarito
+    return {
+        "total_alunos": entrada.alunos.total_alunos,
+        "total_questoes": len(gabarito.linhas_numero),
+        "disciplinas": pd.unique(gabarito.linhas_disciplina).tolist(),
+        "impressao_estrutura": entrada.impressao
+    }
+
+async def _carregar_pdfs(processo_id: str) -> List[Dict[str, Any]]:
+    pdfs_info = await run_in_threadpool(armazenamento.carregar_pdfs, processo_id)
+    if pdfs_info is None:
+        raise HTTPException(status_code=400, detail="PDFs ainda não foram gerados")
+    return pdfs_info
+
+async def _boletins_consolidados(processo_id: str, sede: Optional[str],
+                                 ordem: OrdemBoletins) -> Tuple[str, Dict[str, Any]]:
+    """PDF consolidado (caminho) e índice de páginas, gerados na primeira vez que são pedidos"""
+    
+    registro = await _obter_registro(processo_id)
+    _exigir_processado(registro)
+    
+    def selecionar():
+        resultado = _carregar_resultado(registro)
+        indices = ProcessadorSimulado().ordenar_boletins(resultado["turma"], resultado["ranking"], sede, ordem.value)
+        return resultado, indices
+    
+    resultado, indices = await run_in_threadpool(selecionar)
+    if len(indices) == 0:
+        raise HTTPException(status_code=404, detail="Nenhum aluno encontrado na sede informada")
+    if len(indices) > config.max_alunos_consolidado:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Mais de {config.max_alunos_consolidado} alunos em um único PDF; gere um documento por sede"
+        )
+    
+    # Mesma data de rodapé dos boletins individuais
+    data_emissao = registro["timestamp"] if config.boletim_deterministico else None
+    titulo = f"Boletins - Simulado ACAFE - {sede or 'Todas as sedes'}"
+    from .utils import GeradorPDF
+    return await GeradorPDF().gerar_consolidado(resultado, indices, titulo, data_emissao)
+
+async def _aplicar_eviccao():
+    try:
+        await run_in_threadpool(politica_eviccao.aplicar)
+    except Exception as e:
+        logger.exception(f"Erro na evicção de processos: {e}")
+
+async def _eviccao_periodica():
+    while True:
+        await asyncio.sleep(config.intervalo_eviccao_segundos)
+        # Tarefas deste worker ainda na fila não podem parecer abandonadas
+        await run_in_threadpool(armazenamento.registrar_batimento, fila_tarefas.pendentes())
+        await _aplicar_eviccao()
+
+def _carregar_relatorios():
+    """Importa fpdf (boletins) e openpyxl (exportação XLSX) e carrega as logos"""
+    inicio = time.perf_counter()
+    try:
+        import openpyxl  # noqa: F401
+        from .recursos import obter_recursos
+        from . import utils  # noqa: F401
+        obter_recursos()
+    except Exception as e:
+        logger.warning(f"Erro ao pré-carregar os relatórios: {e}")
+        return
+    logger.info(f"Relatórios pré-carregados em {time.perf_counter() - inicio:.2f}s")
+
+@app.on_event("startup")
+async def iniciar_eviccao():
+    app.state.tarefa_eviccao = asyncio.create_task(_eviccao_periodica())
+
+@app.on_event("startup")
+async def aquecer_relatorios():
+    # Cold start: o servidor já atende enquanto os relatórios são importados em segundo plano
+    if config.aquecer_relatorios:
+        app.state.tarefa_aquecimento = asyncio.create_task(run_in_threadpool(_carregar_relatorios))
+
+@app.on_event("shutdown")
+async def encerrar_workers():
+    tarefa = getattr(app.state, "tarefa_eviccao", None)
+    if tarefa is not None:
+        tarefa.cancel()
+    await fila_tarefas.encerrar()
+    # Sem nenhum boletim pedido, o subsistema de relatórios nem foi importado
+    relatorios = sys.modules.get(f"{__package__}.utils")
+    if relatorios is not None:
+        relatorios.encerrar_executor_pdf()
 
 @app.get("/")
 async def root():
@@ -42,15 +271,25 @@ async def root():
 
 @app.post("/upload")
 async def upload_arquivo(file: UploadFile = File(...)):
-    """Upload e validação inicial do arquivo Excel"""
+    """Upload e validação inicial da planilha (Excel, CSV com seções ou .zip com um arquivo por aba)"""
     
-    if not file.filename.endswith(('.xlsx', '.xls')):
-        raise HTTPException(status_code=400, detail="Arquivo deve ser Excel (.xlsx ou .xls)")
+    if not file.filename.lower().endswith(EXTENSOES_ACEITAS):
+        raise HTTPException(
+            status_code=400,
+            detail="Arquivo deve ser Excel (.xlsx ou .xls), CSV ou .zip com um arquivo por aba (CSV, Parquet ou Arrow)"
+        )
+    
+    # Tamanho medido no arquivo temporário do upload, sem carregá-lo em memória
+    file.file.seek(0, os.SEEK_END)
+    tamanho_mb = file.file.tell() / (1024 * 1024)
+    file.file.seek(0)
+    if tamanho_mb > config.max_file_size_mb:
+        raise HTTPException(status_code=413, detail=f"Arquivo maior que {config.max_file_size_mb}MB")
     
     try:
-        # Ler arquivo Excel
-        contents = await file.read()
-        dados = pd.read_excel(io.BytesIO(contents), sheet_name=None)
+        # Ler apenas as abas RESPOSTAS e GABARITO, fora do event loop
+        leitor = LeitorPlanilha()
+        dados = await run_in_threadpool(leitor.ler, file.file, file.filename)
         
         # Validar estrutura
         processador = ProcessadorSimulado()
@@ -62,124 +301,315 @@ async def upload_arquivo(file: UploadFile = File(...)):
                 content={"erro": validacao["erros"]}
             )
         
+        # Planilha interpretada uma única vez; os DataFrames não são mais necessários
+        entrada = await run_in_threadpool(processador.compilar_entrada, dados)
+        del dados
+        
         # Gerar ID único para este processamento
         processo_id = str(uuid.uuid4())
         
-        # Armazenar dados temporariamente
-        processamentos[processo_id] = {
-            "dados": dados,
-            "timestamp": datetime.now(),
-            "status": "validado"
-        }
+        # Registrar processo com a entrada compilada
+        await run_in_threadpool(armazenamento.criar, processo_id, entrada, None, file.filename)
+        await _aplicar_eviccao()
         
         return {
             "processo_id": processo_id,
             "validacao": validacao,
-            "preview": {
-                "total_alunos": len(dados["RESPOSTAS"]),
-                "total_questoes": len(dados["GABARITO"]),
-                "disciplinas": dados["GABARITO"]["Disciplina"].unique().tolist()
-            }
+            "preview": _preview_entrada(entrada)
         }
         
+    except ErroLeitura as e:
+        raise HTTPException(status_code=400, detail=f"Erro ao ler arquivo: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao processar arquivo: {str(e)}")
 
-@app.post("/api/processar/{processo_id}")
-async def processar_simulado(processo_id: str):
-    """Processar correção do simulado"""
+@app.post("/upload-lote")
+async def upload_lote(files: List[UploadFile] = File(...), modo: ModoLote = ModoLote.UNIFICADO,
+                      processar: bool = True):
+    """Upload de várias planilhas (ou .zip) do mesmo simulado, lidas em paralelo e corrigidas juntas"""
     
-    if processo_id not in processamentos:
-        raise HTTPException(status_code=404, detail="Processo não encontrado")
+    try:
+        planilhas, avisos = expandir_arquivos(
+            [(f.filename, f.file) for f in files],
+            config.max_file_size_mb * 1024 * 1024,
+            config.max_planilhas_lote
+        )
+        lidas = await ler_planilhas(planilhas, LeitorPlanilha())
+        validacoes = await run_in_threadpool(validar_lote, planilhas, lidas)
+    except ErroLote as e:
+        return JSONResponse(status_code=e.status_code, content={"erro": e.erros})
     
+    lote_id = str(uuid.uuid4())
+    processos = []
     try:
-        dados = processamentos[processo_id]["dados"]
-        processador = ProcessadorSimulado()
-        
-        # Processar correção
-        resultado = await processador.processar_async(dados)
+        if modo == ModoLote.UNIFICADO:
+            dados, avisos_unificacao = await run_in_threadpool(unificar_planilhas, planilhas, lidas)
+            avisos.extend(avisos_unificacao)
+            grupos = [("; ".join(p.nome for p in planilhas), dados)]
+        else:
+            grupos = [(p.nome, dados) for p, dados in zip(planilhas, lidas)]
         
-        # Atualizar status
-        processamentos[processo_id].update({
-            "status": "processado",
-            "resultado": resultado
-        })
-        
-        return {
-            "processo_id": processo_id,
-            "status": "concluido",
-            "estatisticas": resultado["estatisticas"],
-            "ranking": resultado["ranking"][:10]  # Top 10
+        # Lote validado com o mesmo gabarito: o primeiro compilado serve para todos
+        processador = ProcessadorSimulado()
+        gabarito = None
+        for arquivo, dados in grupos:
+            entrada = await run_in_threadpool(processador.compilar_entrada, dados, gabarito)
+            gabarito = entrada.gabarito
+            processo_id = str(uuid.uuid4())
+            await run_in_threadpool(armazenamento.criar, processo_id, entrada, lote_id, arquivo)
+            processos.append({"processo_id": processo_id, "arquivo": arquivo, "total_alunos": entrada.alunos.total_alunos})
+    except Exception as e:
+        for processo in processos:
+            await run_in_threadpool(armazenamento.remover, processo["processo_id"])
+        raise HTTPException(status_code=500, detail=f"Erro ao registrar o lote: {str(e)}")
+    
+    # Uma única tarefa corrige o lote inteiro
+    agendados = set(fila_tarefas.agendar_lote([p["processo_id"] for p in processos])) if processar else set()
+    for processo in processos:
+        processo["status"] = (StatusProcesso.PROCESSANDO if processo["processo_id"] in agendados else StatusProcesso.VALIDADO).value
+    
+    await _aplicar_eviccao()
+    
+    return JSONResponse(
+        status_code=202 if agendados else 200,
+        content={
+            "lote_id": lote_id,
+            "modo": modo.value,
+            "processos": processos,
+            "validacoes": jsonable_encoder(validacoes),
+            "avisos": avisos,
+            "preview": {
+                **_preview_entrada(entrada),
+                "total_planilhas": len(planilhas),
+                "total_alunos": sum(p["total_alunos"] for p in processos)
+            }
         }
-        
+    )
+
+@app.get("/api/lote/{lote_id}")
+async def obter_lote(request: Request, lote_id: str, limite_ranking: int = 10):
+    """Andamento dos processos do lote e, quando todos estiverem corrigidos, estatísticas e ranking consolidados"""
+    
+    registros = await run_in_threadpool(armazenamento.listar_lote, lote_id)
+    if not registros:
+        raise HTTPException(status_code=404, detail="Lote não encontrado")
+    
+    resposta = {
+        "lote_id": lote_id,
+        "processos": [
+            {campo: registro[campo] for campo in ("processo_id", "arquivo", "status", "progresso", "etapa", "erro")}
+            for registro in registros
+        ],
+        "estatisticas": None,
+        "ranking": None
+    }
+    
+    # Consolidado só com todos corrigidos e sem tarefa em andamento
+    if any(r["versao"] == 0 or r["status"] in STATUS_PROTEGIDOS for r in registros):
+        return resposta
+    
+    def consolidar():
+        processador = ProcessadorSimulado()
+        try:
+            consolidado = processador.consolidar([_carregar_resultado(r) for r in registros])
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        resposta["estatisticas"] = consolidado["estatisticas"]
+        resposta["ranking"] = processador.listar_ranking(
+            consolidado["turma"], consolidado["ranking"], 0, max(limite_ranking, 0)
+        )
+        return resposta
+    
+    # Consolidado muda só quando muda a versão de algum membro
+    versoes = ";".join(f"{r['processo_id']}:{r['versao']}" for r in registros)
+    return await cache_respostas.responder(request, lote_id, versoes, f"lote:{limite_ranking}", consolidar)
+
+@app.post("/api/processar/{processo_id}")
+async def processar_simulado(processo_id: str):
+    """Enfileirar a correção do simulado (acompanhar em /api/status)"""
+    
+    await _obter_registro(processo_id)
+    
+    if not await run_in_threadpool(armazenamento.possui_parte, processo_id, PARTE_ENTRADA):
+        raise HTTPException(status_code=410, detail="Planilha original descartada por inatividade; envie o arquivo novamente")
+    
+    if not fila_tarefas.agendar_correcao(processo_id):
+        raise _tarefa_em_andamento()
+    
+    return JSONResponse(
+        status_code=202,
+        content={"processo_id": processo_id, "status": StatusProcesso.PROCESSANDO.value, "progresso": 0}
+    )
+
+@app.patch("/api/gabarito/{processo_id}")
+async def emendar_gabarito(processo_id: str, emenda: EmendaGabarito):
+    """Emendar o gabarito (resposta, anulação, disciplina) e recorrigir só as questões afetadas"""
+    
+    registro = await _obter_registro(processo_id)
+    _exigir_processado(registro)
+    
+    if not emenda.alteracoes:
+        raise HTTPException(status_code=400, detail="Nenhuma alteração informada")
+    
+    try:
+        resultado = await fila_tarefas.recorrigir(processo_id, emenda.alteracoes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao processar: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao recorrigir: {str(e)}")
+    
+    if resultado is None:
+        raise _tarefa_em_andamento()
+    
+    processador = ProcessadorSimulado()
+    return {
+        "processo_id": processo_id,
+        "status": StatusProcesso.PROCESSADO.value,
+        "questoes_recorrigidas": resultado["questoes_recorrigidas"],
+        "estatisticas": resultado["estatisticas"],
+        "ranking": processador.listar_ranking(resultado["turma"], resultado["ranking"], 0, 10)  # Top 10
+    }
+
+@app.get("/api/status/{processo_id}", response_model=ProcessoStatus)
+async def obter_status(processo_id: str):
+    """Status e andamento da tarefa do processo"""
+    
+    registro = await _obter_registro(processo_id)
+    return ProcessoStatus(
+        processo_id=processo_id,
+        status=registro["status"],
+        timestamp=registro["timestamp"],
+        progresso=registro["progresso"],
+        etapa=registro["etapa"],
+        erro=registro["erro"]
+    )
 
 @app.get("/api/estatisticas/{processo_id}")
-async def obter_estatisticas(processo_id: str):
+async def obter_estatisticas(request: Request, processo_id: str):
     """Obter estatísticas detalhadas"""
     
-    if processo_id not in processamentos:
-        raise HTTPException(status_code=404, detail="Processo não encontrado")
+    registro = await _obter_registro(processo_id)
+    _exigir_processado(registro)
     
-    if processamentos[processo_id]["status"] != "processado":
-        raise HTTPException(status_code=400, detail="Processo ainda não foi processado")
+    return await cache_respostas.responder(
+        request, processo_id, registro["versao"], "estatisticas",
+        lambda: armazenamento.carregar_estatisticas(processo_id)
+    )
+
+@app.get("/api/analise-itens/{processo_id}", response_model=AnaliseItensResponse)
+async def obter_analise_itens(request: Request, processo_id: str, fracao_grupos: Optional[float] = None):
+    """Análise de itens: dificuldade, discriminação (ponto-bisserial e grupos extremos) e alternativas marcadas"""
+    
+    registro = await _obter_registro(processo_id)
+    _exigir_processado(registro)
     
-    resultado = processamentos[processo_id]["resultado"]
-    return resultado["estatisticas"]
+    if fracao_grupos is not None and not 0 < fracao_grupos <= 0.5:
+        raise HTTPException(status_code=400, detail="fracao_grupos deve estar entre 0 e 0.5")
+    fracao = fracao_grupos if fracao_grupos is not None else config.fracao_grupos_discriminacao
+    
+    def analisar():
+        turma = armazenamento.carregar_turma(processo_id)
+        return AnaliseItensResponse(
+            processo_id=processo_id,
+            total_alunos=turma.alunos.total_alunos,
+            fracao_grupos=fracao,
+            itens=ProcessadorSimulado().analisar_itens(turma, fracao)
+        )
+    
+    return await cache_respostas.responder(request, processo_id, registro["versao"], f"itens:{fracao}", analisar)
 
 @app.get("/api/ranking/{processo_id}")
-async def obter_ranking(processo_id: str):
-    """Obter ranking completo"""
+async def obter_ranking(request: Request, processo_id: str, offset: int = 0, limit: Optional[int] = None,
+                        campos: Optional[str] = None,
+                        sede: Optional[List[str]] = Query(None),
+                        status_performance: Optional[List[str]] = Query(None)):
+    """Obter ranking (paginado, filtrável por sede/status e com projeção de campos, ex.: campos=posicao,nome)"""
     
-    if processo_id not in processamentos:
-        raise HTTPException(status_code=404, detail="Processo não encontrado")
+    if offset < 0 or (limit is not None and limit < 0):
+        raise HTTPException(status_code=400, detail="offset e limit não podem ser negativos")
     
-    if processamentos[processo_id]["status"] != "processado":
-        raise HTTPException(status_code=400, detail="Processo ainda não foi processado")
+    lista_campos = None
+    if campos:
+        lista_campos = list(dict.fromkeys(c.strip() for c in campos.split(",") if c.strip()))
+        desconhecidos = [c for c in lista_campos if c not in CAMPOS_ESTUDANTE]
+        if desconhecidos:
+            raise HTTPException(status_code=400, detail=f"Campos desconhecidos: {', '.join(desconhecidos)}")
+    
+    registro = await _obter_registro(processo_id)
+    _exigir_processado(registro)
+    
+    def listar():
+        resultado = _carregar_resultado(registro)
+        processador = ProcessadorSimulado()
+        mascara = processador.filtrar_ranking(resultado["turma"], sede, status_performance)
+        total = int(mascara.sum()) if mascara is not None else len(resultado["ranking"])
+        fim = offset + limit if limit is not None else None
+        estudantes = processador.listar_ranking(
+            resultado["turma"], resultado["ranking"], offset, fim, mascara, lista_campos
+        )
+        return {"ranking": estudantes, "total": total, "offset": offset, "limit": limit}
+    
+    # Uma visão por combinação de parâmetros (normalizada)
+    visao = "ranking:{}:{}:{}:{}:{}".format(
+        offset, limit, ",".join(lista_campos or ()),
+        ",".join(sorted(set(sede or ()))), ",".join(sorted(set(status_performance or ())))
+    )
+    return await cache_respostas.responder(request, processo_id, registro["versao"], visao, listar)
+
+@app.get("/api/exportar/{processo_id}")
+async def exportar_resultados(processo_id: str, formato: FormatoExportacao = FormatoExportacao.XLSX):
+    """Planilha completa de resultados (marcações, acerto por questão, disciplinas e posição) em streaming"""
+    
+    registro = await _obter_registro(processo_id)
+    _exigir_processado(registro)
     
-    resultado = processamentos[processo_id]["resultado"]
-    return {"ranking": resultado["ranking"]}
+    erro = formato_disponivel(formato.value)
+    if erro:
+        raise HTTPException(status_code=501, detail=erro)
+    
+    # Gerada em blocos a partir das matrizes; o iterador síncrono roda no threadpool
+    resultado = await run_in_threadpool(_carregar_resultado, registro)
+    conteudo = ProcessadorSimulado().exportar_resultados(resultado["turma"], resultado["ranking"], formato.value)
+    
+    return StreamingResponse(
+        conteudo,
+        media_type=TIPOS_CONTEUDO[formato.value],
+        headers={"Content-Disposition": f'attachment; filename="resultados_simulado_{processo_id[:8]}.{formato.value}"'}
+    )
 
 @app.post("/api/gerar-pdfs/{processo_id}")
 async def gerar_pdfs(processo_id: str):
-    """Gerar PDFs individuais para todos os alunos"""
+    """Enfileirar a geração dos PDFs individuais (acompanhar em /api/status)"""
     
-    if processo_id not in processamentos:
-        raise HTTPException(status_code=404, detail="Processo não encontrado")
+    registro = await _obter_registro(processo_id)
+    _exigir_processado(registro)
     
-    if processamentos[processo_id]["status"] != "processado":
-        raise HTTPException(status_code=400, detail="Processo ainda não foi processado")
+    # O registro é relido na tarefa: pode haver nova versão até ela começar
+    if not fila_tarefas.agendar_pdfs(processo_id, _carregar_resultado):
+        raise _tarefa_em_andamento()
     
-    try:
-        resultado = processamentos[processo_id]["resultado"]
-        gerador = GeradorPDF()
-        
-        # Gerar PDFs
-        pdfs_info = await gerador.gerar_todos_pdfs_async(resultado)
-        
-        # Atualizar com informações dos PDFs
-        processamentos[processo_id]["pdfs"] = pdfs_info
-        
-        return {
-            "total_pdfs": len(pdfs_info),
-            "pdfs": pdfs_info
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao gerar PDFs: {str(e)}")
+    return JSONResponse(
+        status_code=202,
+        content={"processo_id": processo_id, "status": StatusProcesso.GERANDO_PDFS.value, "progresso": 0}
+    )
+
+@app.get("/api/pdfs/{processo_id}")
+async def listar_pdfs(processo_id: str):
+    """PDFs gerados para o processo"""
+    
+    await _obter_registro(processo_id)
+    pdfs_info = await _carregar_pdfs(processo_id)
+    return {
+        "total_pdfs": len(pdfs_info),
+        "pdfs": pdfs_info
+    }
 
 @app.get("/api/download-pdf/{processo_id}/{aluno_id}")
 async def download_pdf(processo_id: str, aluno_id: str):
     """Download de PDF individual"""
     
-    if processo_id not in processamentos:
-        raise HTTPException(status_code=404, detail="Processo não encontrado")
-    
-    if "pdfs" not in processamentos[processo_id]:
-        raise HTTPException(status_code=400, detail="PDFs ainda não foram gerados")
-    
-    pdfs_info = processamentos[processo_id]["pdfs"]
+    await _obter_registro(processo_id)
+    pdfs_info = await _carregar_pdfs(processo_id)
     pdf_info = next((p for p in pdfs_info if p["aluno_id"] == aluno_id), None)
     
     if not pdf_info:
@@ -195,27 +625,47 @@ async def download_pdf(processo_id: str, aluno_id: str):
     )
 
 @app.get("/api/download-todos-pdfs/{processo_id}")
-async def download_todos_pdfs(processo_id: str):
-    """Download de todos os PDFs em ZIP"""
+async def download_todos_pdfs(processo_id: str, comprimir: bool = False):
+    """Download de todos os PDFs em ZIP (montado em streaming)"""
     
-    if processo_id not in processamentos:
-        raise HTTPException(status_code=404, detail="Processo não encontrado")
+    await _obter_registro(processo_id)
+    pdfs_info = [PDFInfo(**p) for p in await _carregar_pdfs(processo_id)]
     
-    if "pdfs" not in processamentos[processo_id]:
-        raise HTTPException(status_code=400, detail="PDFs ainda não foram gerados")
+    from .utils import GeradorPDF
+    gerador = GeradorPDF()
+    compressao = zipfile.ZIP_DEFLATED if comprimir else zipfile.ZIP_STORED
     
-    try:
-        gerador = GeradorPDF()
-        zip_path = await gerador.criar_zip_pdfs(processamentos[processo_id]["pdfs"])
-        
-        return FileResponse(
-            zip_path,
-            media_type="application/zip",
-            filename=f"boletins_simulado_{processo_id[:8]}.zip"
-        )
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao criar ZIP: {str(e)}")
+    return StreamingResponse(
+        gerador.stream_zip_pdfs(pdfs_info, compressao),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="boletins_simulado_{processo_id[:8]}.zip"'}
+    )
+
+@app.get("/api/download-boletins/{processo_id}")
+async def download_boletins_consolidados(processo_id: str, sede: Optional[str] = None,
+                                         ordem: OrdemBoletins = OrdemBoletins.NOME):
+    """Boletins de uma sede (ou de todas) em um único PDF para impressão, com um marcador por aluno"""
+    
+    caminho, _ = await _boletins_consolidados(processo_id, sede, ordem)
+    nome_arquivo = f"Boletins_{(sede or 'todas_as_sedes').replace(' ', '_')}_{processo_id[:8]}.pdf"
+    
+    return FileResponse(caminho, media_type="application/pdf", filename=nome_arquivo)
+
+@app.get("/api/indice-boletins/{processo_id}", response_model=IndiceBoletinsResponse)
+async def indice_boletins_consolidados(processo_id: str, sede: Optional[str] = None,
+                                       ordem: OrdemBoletins = OrdemBoletins.NOME):
+    """Páginas de cada aluno no PDF consolidado (para imprimir ou extrair o boletim de um aluno)"""
+    
+    caminho, indice = await _boletins_consolidados(processo_id, sede, ordem)
+    return IndiceBoletinsResponse(
+        processo_id=processo_id,
+        sede=sede,
+        ordem=ordem.value,
+        total_alunos=len(indice["alunos"]),
+        total_paginas=indice["total_paginas"],
+        tamanho_bytes=os.path.getsize(caminho),
+        alunos=indice["alunos"]
+    )
 
 @app.get("/api/template-excel")
 async def download_template():
@@ -237,24 +687,32 @@ async def download_template():
 async def limpar_processo(processo_id: str):
     """Limpar dados do processo da memória"""
     
-    if processo_id in processamentos:
-        # Limpar arquivos temporários se existirem
-        if "pdfs" in processamentos[processo_id]:
-            gerador = GeradorPDF()
-            await gerador.limpar_arquivos_temporarios(processamentos[processo_id]["pdfs"])
-        
-        del processamentos[processo_id]
-        return {"message": "Processo limpo com sucesso"}
+    if (await _obter_registro(processo_id))["status"] in STATUS_PROTEGIDOS:
+        raise _tarefa_em_andamento()
     
-    raise HTTPException(status_code=404, detail="Processo não encontrado")
+    # Boletins sem outras referências ficam no cache até expirar ou faltar espaço
+    await run_in_threadpool(armazenamento.remover, processo_id)
+    _resultados_cache.pop(processo_id, None)
+    cache_respostas.invalidar(processo_id)
+    return {"message": "Processo limpo com sucesso"}
+
+@app.get("/metrics")
+async def metricas():
+    """Métricas deste worker no formato texto do Prometheus"""
+    conteudo = await run_in_threadpool(registro_metricas.exportar)
+    return Response(content=conteudo, media_type=TIPO_CONTEUDO)
 
 @app.get("/health")
 async def health_check():
     """Health check para monitoramento"""
+    uso = politica_eviccao.uso_bytes
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "processos_ativos": len(processamentos)
+        "processos_ativos": await run_in_threadpool(armazenamento.contar),
+        # Total da última rodada de evicção: o health check não varre o registro nem o cache
+        "armazenamento_mb": round(uso / (1024 * 1024), 2) if uso is not None else None,
+        "eviccoes": await run_in_threadpool(armazenamento.obter_contadores)
     }
 
 if __name__ == "__main__":
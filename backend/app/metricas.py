@@ -0,0 +1,217 @@
+import time
+import threading
+from contextlib import ContextDecorator
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Limites (segundos) dos histogramas de duração: de uma etapa vetorizada a um lote de PDFs
+LIMITES_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Content-Type do formato texto do Prometheus (o charset é acrescentado pela resposta)
+TIPO_CONTEUDO = "text/plain; version=0.0.4"
+
+Rotulos = Tuple[str, ...]
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str] = ()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._trava = threading.Lock()
+
+    def _chave(self, rotulos: Dict[str, Any]) -> Rotulos:
+        return tuple(str(rotulos.get(nome, "")) for nome in self.rotulos)
+
+    def _formatar(self, chave: Rotulos, extras: Sequence[Tuple[str, str]] = ()) -> str:
+        pares = list(zip(self.rotulos, chave)) + list(extras)
+        if not pares:
+            return ""
+        return "{" + ",".join(f'{nome}="{_escapar(valor)}"' for nome, valor in pares) + "}"
+
+    def exportar(self) -> List[str]:
+        return [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"] + self._amostras()
+
+    def _amostras(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Contador(_Metrica):
+    """Total que só cresce (alunos corrigidos, PDFs, bytes)"""
+
+    tipo = "counter"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str] = ()):
+        super().__init__(nome, ajuda, rotulos)
+        self._valores: Dict[Rotulos, float] = {}
+
+    def incrementar(self, valor: float = 1, **rotulos):
+        chave = self._chave(rotulos)
+        with self._trava:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def drenar(self) -> Dict[Rotulos, float]:
+        with self._trava:
+            valores, self._valores = self._valores, {}
+        return valores
+
+    def incorporar(self, valores: Dict[Rotulos, float]):
+        with self._trava:
+            for chave, valor in valores.items():
+                self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def _amostras(self) -> List[str]:
+        with self._trava:
+            valores = dict(self._valores)
+        return [f"{self.nome}{self._formatar(chave)} {_numero(valor)}" for chave, valor in sorted(valores.items())]
+
+
+class Histograma(_Metrica):
+    """Distribuição de durações em faixas cumulativas, com soma e contagem"""
+
+    tipo = "histogram"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str] = (), limites: Sequence[float] = LIMITES_SEGUNDOS):
+        super().__init__(nome, ajuda, rotulos)
+        self.limites = tuple(limites)
+        # Por combinação de rótulos: contagem por faixa (não cumulativa), soma
+        self._series: Dict[Rotulos, Tuple[List[int], float]] = {}
+
+    def observar(self, valor: float, **rotulos):
+        chave = self._chave(rotulos)
+        faixa = next((i for i, limite in enumerate(self.limites) if valor <= limite), len(self.limites))
+        with self._trava:
+            contagens, soma = self._series.get(chave) or ([0] * (len(self.limites) + 1), 0.0)
+            contagens[faixa] += 1
+            self._series[chave] = (contagens, soma + valor)
+
+    def drenar(self) -> Dict[Rotulos, Tuple[List[int], float]]:
+        with self._trava:
+            series, self._series = self._series, {}
+        return series
+
+    def incorporar(self, series: Dict[Rotulos, Tuple[List[int], float]]):
+        with self._trava:
+            for chave, (contagens, soma) in series.items():
+                atuais, soma_atual = self._series.get(chave) or ([0] * (len(self.limites) + 1), 0.0)
+                self._series[chave] = ([a + b for a, b in zip(atuais, contagens)], soma_atual + soma)
+
+    def _amostras(self) -> List[str]:
+        with self._trava:
+            series = {chave: (list(contagens), soma) for chave, (contagens, soma) in self._series.items()}
+
+        linhas = []
+        for chave, (contagens, soma) in sorted(series.items()):
+            acumulado = 0
+            for limite, contagem in zip(self.limites + (float("inf"),), contagens):
+                acumulado += contagem
+                le = "+Inf" if limite == float("inf") else _numero(limite)
+                linhas.append(f"{self.nome}_bucket{self._formatar(chave, [('le', le)])} {acumulado}")
+            linhas.append(f"{self.nome}_sum{self._formatar(chave)} {_numero(soma)}")
+            linhas.append(f"{self.nome}_count{self._formatar(chave)} {acumulado}")
+        return linhas
+
+
+class Medidor(_Metrica):
+    """Valor instantâneo, lido no momento da coleta (processos ativos, fila)"""
+
+    tipo = "gauge"
+
+    def __init__(self, nome: str, ajuda: str, coletar: Callable[[], Dict[Rotulos, float]], rotulos: Sequence[str] = ()):
+        super().__init__(nome, ajuda, rotulos)
+        self.coletar = coletar
+
+    def _amostras(self) -> List[str]:
+        return [f"{self.nome}{self._formatar(chave)} {_numero(valor)}" for chave, valor in sorted(self.coletar().items())]
+
+
+class RegistroMetricas:
+    """Métricas do processo, exportadas no formato texto do Prometheus"""
+
+    # Workers de PDF (processos separados) acumulam no próprio registro e devolvem o
+    # acumulado com cada lote (`drenar`); o processo principal soma (`incorporar`).
+
+    def __init__(self):
+        self._metricas: Dict[str, _Metrica] = {}
+
+    def contador(self, nome: str, ajuda: str, rotulos: Sequence[str] = ()) -> Contador:
+        return self._registrar(Contador(nome, ajuda, rotulos))
+
+    def histograma(self, nome: str, ajuda: str, rotulos: Sequence[str] = (),
+                   limites: Sequence[float] = LIMITES_SEGUNDOS) -> Histograma:
+        return self._registrar(Histograma(nome, ajuda, rotulos, limites))
+
+    def medidor(self, nome: str, ajuda: str, coletar: Callable[[], Dict[Rotulos, float]],
+                rotulos: Sequence[str] = ()) -> Medidor:
+        return self._registrar(Medidor(nome, ajuda, coletar, rotulos))
+
+    def exportar(self) -> str:
+        linhas = []
+        for metrica in self._metricas.values():
+            linhas.extend(metrica.exportar())
+        return "\n".join(linhas) + "\n"
+
+    def drenar(self) -> Dict[str, Any]:
+        """Zera e devolve contadores e histogramas (para serem somados em outro processo)"""
+        return {
+            nome: metrica.drenar() for nome, metrica in self._metricas.items()
+            if isinstance(metrica, (Contador, Histograma))
+        }
+
+    def incorporar(self, valores: Optional[Dict[str, Any]]):
+        for nome, valor in (valores or {}).items():
+            metrica = self._metricas.get(nome)
+            if metrica is not None:
+                metrica.incorporar(valor)
+
+    def _registrar(self, metrica):
+        # Registrar de novo (ex.: módulo recarregado) devolve a métrica existente
+        return self._metricas.setdefault(metrica.nome, metrica)
+
+
+class cronometrar(ContextDecorator):
+    """Observa a duração de uma etapa do pipeline (bloco `with` ou decorador)"""
+
+    def __init__(self, etapa: str):
+        self.etapa = etapa
+        self._inicio = 0.0
+
+    def _recreate_cm(self):
+        # Instância nova por chamada: o decorador pode rodar em várias threads ao mesmo tempo
+        return cronometrar(self.etapa)
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        DURACAO_ETAPAS.observar(time.perf_counter() - self._inicio, etapa=self.etapa)
+        return False
+
+
+def _numero(valor: float) -> str:
+    return repr(float(valor)) if valor != int(valor) else str(int(valor))
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+registro = RegistroMetricas()
+
+DURACAO_ETAPAS = registro.histograma(
+    "corretor_etapa_duracao_segundos",
+    "Duração de cada etapa do pipeline (leitura, validação, preparação, gabarito, correção, ranking, estatísticas, gráfico, pdf, consolidado, zip, exportação)",
+    ("etapa",)
+)
+DURACAO_REQUISICOES = registro.histograma(
+    "corretor_requisicao_duracao_segundos", "Duração das requisições HTTP por endpoint", ("endpoint",)
+)
+ALUNOS_CORRIGIDOS = registro.contador("corretor_alunos_corrigidos_total", "Alunos corrigidos (correções e recorreções)")
+PDFS_GERADOS = registro.contador(
+    "corretor_pdfs_gerados_total", "Boletins entregues, renderizados ou reaproveitados do cache", ("origem",)
+)
+BYTES_ENVIADOS = registro.contador(
+    "corretor_bytes_enviados_total", "Bytes enviados no corpo das respostas HTTP, por endpoint", ("endpoint",)
+)
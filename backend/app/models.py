@@ -1,3 +1,5 @@
+import os
+import tempfile
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 from datetime import datetime
@@ -37,11 +39,29 @@ class EstatisticasResponse(BaseModel):
     distribuicao_notas: Dict[str, int]  # Faixas de notas
     top_3: List[EstudanteResponse]
 
+class EstatisticaItem(BaseModel):
+    questao: int
+    disciplina: str
+    resposta_correta: Optional[str] = None  # "A"-"E" ou "ANULADA"
+    respondentes: int
+    dificuldade: Optional[float] = None  # proporção de acertos (p-valor)
+    discriminacao_bisserial: Optional[float] = None  # ponto-bisserial com o escore restante
+    discriminacao_grupos: Optional[float] = None  # acertos do grupo superior - do inferior
+    alternativas: Dict[str, int]  # marcações por alternativa (A-E, branco, invalida)
+
+class AnaliseItensResponse(BaseModel):
+    processo_id: str
+    total_alunos: int
+    fracao_grupos: float
+    itens: List[EstatisticaItem]
+
 class ProcessoStatus(BaseModel):
     processo_id: str
-    status: str  # "validado", "processando", "processado", "erro"
+    status: str  # "validado", "processando", "processado", "gerando_pdfs", "concluido", "erro"
     timestamp: datetime
     progresso: Optional[int] = None  # 0-100
+    etapa: Optional[str] = None  # etapa da tarefa em andamento ("na_fila", "corrigindo", ...)
+    erro: Optional[str] = None  # mensagem da última tarefa que falhou
 
 class ValidacaoResponse(BaseModel):
     valido: bool
@@ -60,6 +80,16 @@ class ProcessamentoResponse(BaseModel):
     estatisticas: EstatisticasResponse
     ranking: List[EstudanteResponse]
 
+class AlteracaoGabarito(BaseModel):
+    questao: int
+    resposta: Optional[str] = None  # nova resposta correta (A-E)
+    anulada: bool = False  # questão anulada conta como acerto para todos
+    disciplina: Optional[str] = None
+    idioma: Optional[str] = None  # "Inglês"/"Espanhol": altera só essa versão da questão
+
+class EmendaGabarito(BaseModel):
+    alteracoes: List[AlteracaoGabarito]
+
 class PDFInfo(BaseModel):
     aluno_id: str
     nome_aluno: str
@@ -72,6 +102,23 @@ class PDFsResponse(BaseModel):
     pdfs: List[PDFInfo]
     zip_disponivel: bool = False
 
+class PaginasBoletim(BaseModel):
+    aluno_id: str
+    nome_aluno: str
+    sede: Optional[str] = None
+    posicao: int
+    pagina_inicial: int  # 1 = primeira página do PDF consolidado
+    paginas: int
+
+class IndiceBoletinsResponse(BaseModel):
+    processo_id: str
+    sede: Optional[str] = None  # None = todas as sedes
+    ordem: str
+    total_alunos: int
+    total_paginas: int
+    tamanho_bytes: int
+    alunos: List[PaginasBoletim]
+
 class TemplateExcelResponse(BaseModel):
     nome_arquivo: str
     descricao: str
@@ -116,6 +163,19 @@ class StatusProcesso(str, Enum):
     CONCLUIDO = "concluido"
     ERRO = "erro"
 
+class ModoLote(str, Enum):
+    UNIFICADO = "unificado"  # todas as planilhas viram uma única turma
+    VINCULADO = "vinculado"  # um processo por planilha, consolidados pelo lote
+
+class FormatoExportacao(str, Enum):
+    XLSX = "xlsx"
+    CSV = "csv"
+    PARQUET = "parquet"
+
+class OrdemBoletins(str, Enum):
+    NOME = "nome"        # ordem alfabética
+    RANKING = "ranking"  # ordem de classificação
+
 class StatusPerformance(str, Enum):
     EXCELENTE = "Excelente"  # >= 85%
     BOM = "Bom"              # >= 70%
@@ -130,9 +190,40 @@ class TipoValidacao(str, Enum):
 # Configurações e constantes
 class ConfiguracaoSistema(BaseModel):
     max_file_size_mb: int = 200
-    formatos_aceitos: List[str] = ['.xlsx', '.xls']
+    formatos_aceitos: List[str] = ['.xlsx', '.xls', '.csv', '.zip']
     timeout_processamento: int = 900  # 15 minutos
     max_alunos_por_lote: int = 100
+    max_planilhas_lote: int = 50
+    fracao_grupos_discriminacao: float = 0.27  # grupos superior/inferior da análise de itens
+    
+    # Renderização dos boletins (0 workers = renderizar em thread, sem processos extras)
+    workers_pdf: int = int(os.getenv("CORRETOR_WORKERS_PDF", os.cpu_count() or 1))
+    lote_pdfs: int = 25
+    
+    # Importar fpdf/openpyxl em segundo plano logo após o startup (senão, no primeiro uso)
+    aquecer_relatorios: bool = os.getenv("CORRETOR_AQUECER_RELATORIOS", "1") != "0"
+    
+    # PDF consolidado: o documento inteiro fica em memória até ser gravado (~20KB por aluno)
+    max_alunos_consolidado: int = int(os.getenv("CORRETOR_MAX_CONSOLIDADO", 5000))
+    
+    # Cache dos boletins gerados (endereçado pelo conteúdo) e data fixa no rodapé
+    diretorio_artefatos: str = os.getenv("CORRETOR_ARTEFATOS", os.path.join(tempfile.gettempdir(), "corretor_acafe_boletins"))
+    boletim_deterministico: bool = os.getenv("CORRETOR_BOLETIM_DETERMINISTICO", "1") != "0"
+    
+    # Registro de processos (SQLite compartilhado entre workers)
+    caminho_banco: str = os.getenv("CORRETOR_BANCO", os.path.join(tempfile.gettempdir(), "corretor_acafe.db"))
+    
+    # Evicção: processos sem acesso expiram após o TTL; acima do orçamento, descarte LRU
+    ttl_processo_minutos: int = int(os.getenv("CORRETOR_TTL_MINUTOS", 240))
+    orcamento_armazenamento_mb: int = int(os.getenv("CORRETOR_ORCAMENTO_MB", 1024))
+    intervalo_eviccao_segundos: int = 60
+    max_resultados_cache: int = 8
+    
+    # Respostas JSON já serializadas (estatísticas, ranking...), por worker
+    max_respostas_cache_mb: int = int(os.getenv("CORRETOR_RESPOSTAS_CACHE_MB", 64))
+    
+    # Tarefas em segundo plano (correção e PDFs) executando ao mesmo tempo, por worker
+    max_tarefas_simultaneas: int = int(os.getenv("CORRETOR_MAX_TAREFAS", 2))
     
     # Configurações de performance
     faixas_performance: Dict[str, tuple] = {
@@ -0,0 +1,61 @@
+import numpy as np
+from typing import Dict, Optional, Sequence
+
+
+class IndiceRanking:
+    """Índice do ranking de um processo, construído uma vez por processamento"""
+
+    # Ordem de exibição: nota decrescente, depois nome crescente.
+    # Posição no critério de competição: empatados na nota dividem a posição (1, 2, 2, 4).
+
+    def __init__(self, ids: Sequence[str], nomes: Sequence[str], notas: Sequence[float]):
+        self.ids = np.asarray(ids, dtype=object)
+        self.nomes = np.asarray(nomes, dtype=object)
+        self.notas = np.asarray(notas, dtype=np.float64)
+        self._ordem: Optional[np.ndarray] = None
+        self._indice_id: Optional[Dict[str, int]] = None
+
+        # Posição = 1 + alunos com nota estritamente maior (sem ordenar os nomes)
+        _, inverso, contagens = np.unique(-self.notas, return_inverse=True, return_counts=True)
+        inicio_grupo = np.cumsum(contagens) - contagens
+        self.posicoes = inicio_grupo[inverso] + 1
+
+    def __len__(self) -> int:
+        return len(self.notas)
+
+    @property
+    def ordem(self) -> np.ndarray:
+        """Índices dos alunos na ordem do ranking (ordenação completa, sob demanda)"""
+        if self._ordem is None:
+            self._ordem = np.lexsort((self.nomes, -self.notas))
+        return self._ordem
+
+    def posicao(self, aluno_id: str) -> int:
+        """Posição de um aluno pelo ID (0 se não encontrado)"""
+        if self._indice_id is None:
+            self._indice_id = {}
+            for i, id_aluno in enumerate(self.ids):
+                self._indice_id.setdefault(id_aluno, i)
+        i = self._indice_id.get(aluno_id)
+        return int(self.posicoes[i]) if i is not None else 0
+
+    def top(self, k: int) -> np.ndarray:
+        """Índices dos k primeiros, ordenando apenas os candidatos"""
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64)
+        if self._ordem is not None or k >= len(self):
+            return self.ordem[:k]
+
+        # Todos com posição <= k (inclui empatados na fronteira)
+        candidatos = np.flatnonzero(self.posicoes <= k)
+        ordem_candidatos = np.lexsort((self.nomes[candidatos], -self.notas[candidatos]))
+        return candidatos[ordem_candidatos][:k]
+
+    def fatia(self, inicio: int = 0, fim: Optional[int] = None,
+              mascara: Optional[np.ndarray] = None) -> np.ndarray:
+        """Índices dos alunos entre as posições de exibição [inicio, fim), opcionalmente só os da máscara"""
+        if mascara is not None:
+            return self.ordem[mascara[self.ordem]][inicio:fim]
+        if inicio == 0 and fim is not None:
+            return self.top(fim)
+        return self.ordem[inicio:fim]
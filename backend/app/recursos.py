@@ -0,0 +1,97 @@
+import os
+import hashlib
+import logging
+from typing import Dict, Optional
+
+from fpdf import FPDF
+from fpdf.fpdf import ImageInfo
+from fpdf.image_parsing import get_img_info
+
+logger = logging.getLogger(__name__)
+
+# Logos do cabeçalho, empacotadas com a aplicação (nenhum acesso à rede na renderização)
+DIRETORIO_RECURSOS = os.getenv(
+    "CORRETOR_RECURSOS",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "static", "boletim")
+)
+LOGOS = {
+    "acafe": "logo_acafe.png",
+    "fleming": "logo_fleming.png",
+}
+
+# Fontes core do PDF usadas no boletim (não precisam de arquivo, só de métricas em memória)
+FONTES_CORE = ("helvetica",)
+ESTILOS_FONTE = ("", "B", "I")
+
+
+class RecursosBoletim:
+    """Logos decodificadas e fontes aquecidas uma única vez por processo, compartilhadas pelos boletins"""
+
+    # O fpdf decodifica (e recomprime) cada imagem na primeira vez que ela aparece em
+    # um documento. Aqui a decodificação acontece uma vez: cada boletim recebe uma
+    # cópia rasa da informação já pronta (os bytes da imagem não são copiados).
+
+    def __init__(self, diretorio: str = DIRETORIO_RECURSOS):
+        self.diretorio = diretorio
+        self._imagens: Dict[str, ImageInfo] = {}
+        resumo = hashlib.sha256()
+
+        for nome, arquivo in LOGOS.items():
+            caminho = os.path.join(diretorio, arquivo)
+            if not os.path.exists(caminho):
+                logger.info(f"Logo '{nome}' não encontrada em {caminho}; boletins sem essa logo")
+                continue
+            try:
+                with open(caminho, "rb") as f:
+                    conteudo = f.read()
+                info = ImageInfo(get_img_info(caminho, conteudo))
+            except Exception as e:
+                logger.warning(f"Logo '{nome}' inválida ({caminho}): {e}")
+                continue
+            # Perfil de cor descartado: seria registrado por documento
+            info["iccp"] = None
+            self._imagens[nome] = info
+            resumo.update(nome.encode("utf-8") + b"\0" + conteudo)
+
+        # Entra na chave do cache de boletins: trocar uma logo gera boletins novos
+        self.impressao = resumo.hexdigest()[:16] if self._imagens else ""
+
+        _aquecer_fontes()
+
+    def possui(self, nome: str) -> bool:
+        return nome in self._imagens
+
+    def imagem(self, pdf: FPDF, nome: str, x: float, y: float, w: float = 0, h: float = 0) -> bool:
+        """Desenha a logo já decodificada; False se ela não estiver disponível"""
+
+        info = self._imagens.get(nome)
+        if info is None:
+            return False
+
+        chave = f"recurso:{nome}"
+        if chave not in pdf.images:
+            pdf.images[chave] = ImageInfo(info, i=len(pdf.images) + 1, usages=0, iccp_i=None)
+        pdf.image(chave, x=x, y=y, w=w, h=h, keep_aspect_ratio=True)
+        return True
+
+
+def _aquecer_fontes():
+    # Métricas das fontes core carregadas e em cache no fpdf
+    pdf = FPDF()
+    pdf.add_page()
+    for fonte in FONTES_CORE:
+        for estilo in ESTILOS_FONTE:
+            pdf.set_font(fonte, estilo, 12)
+            pdf.get_string_width("Aquecimento")
+
+
+_recursos: Optional[RecursosBoletim] = None
+
+
+def obter_recursos() -> RecursosBoletim:
+    """Recursos do processo, carregados na primeira chamada (no início de cada worker de PDF)"""
+    global _recursos
+
+    if _recursos is None:
+        _recursos = RecursosBoletim()
+    return _recursos
@@ -0,0 +1,118 @@
+import gzip
+import json
+import hashlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Tuple
+
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+
+
+class CacheRespostas:
+    """Respostas JSON serializadas uma única vez por recurso, versão e visão, com ETag forte"""
+
+    # A ETag depende só do recurso, da versão e da visão (parâmetros da consulta), então
+    # é a mesma em qualquer worker: um If-None-Match é respondido com 304 sem carregar
+    # nem serializar nada. Nova versão (reprocessamento, emenda) muda a ETag e descarta
+    # as entradas antigas do recurso.
+
+    def __init__(self, max_bytes: int, minimo_compressao: int = 1024):
+        self.max_bytes = max_bytes
+        self.minimo_compressao = minimo_compressao
+        self._entradas: "OrderedDict[Tuple[str, str], Tuple[str, bytes, bytes]]" = OrderedDict()
+        self._versoes: Dict[str, str] = {}
+        self._bytes = 0
+
+    def etag(self, recurso: str, versao: Any, visao: str) -> str:
+        resumo = hashlib.sha256(f"{recurso}\0{versao}\0{visao}".encode("utf-8")).hexdigest()[:32]
+        return f'"{resumo}"'
+
+    async def responder(self, request: Request, recurso: str, versao: Any, visao: str,
+                        produzir: Callable[[], Any]) -> Response:
+        """304 se o cliente já tem a versão; senão os bytes em cache (ou produzidos agora)"""
+
+        etag = self.etag(recurso, versao, visao)
+        aceita_gzip = "gzip" in request.headers.get("accept-encoding", "").lower()
+        etag_gzip = etag[:-1] + '-gz"'
+
+        if _corresponde(request.headers.get("if-none-match"), (etag, etag_gzip)):
+            return Response(status_code=304, headers=self._cabecalhos(etag_gzip if aceita_gzip else etag))
+
+        entrada = self._obter(recurso, str(versao), visao)
+        if entrada is None:
+            conteudo = await run_in_threadpool(produzir)
+            entrada = await run_in_threadpool(self._serializar, conteudo)
+            self._guardar(recurso, str(versao), visao, entrada)
+
+        bruto, comprimido = entrada
+        if aceita_gzip and comprimido is not None:
+            # Já comprimido: o middleware de gzip não recomprime (Content-Encoding presente)
+            cabecalhos = self._cabecalhos(etag_gzip)
+            cabecalhos["Content-Encoding"] = "gzip"
+            return Response(content=comprimido, media_type="application/json", headers=cabecalhos)
+        return Response(content=bruto, media_type="application/json", headers=self._cabecalhos(etag))
+
+    def invalidar(self, recurso: str):
+        """Descarta todas as visões do recurso"""
+        for chave in [chave for chave in self._entradas if chave[0] == recurso]:
+            self._remover(chave)
+        self._versoes.pop(recurso, None)
+
+    def _cabecalhos(self, etag: str) -> Dict[str, str]:
+        # no-cache: o navegador guarda, mas revalida (If-None-Match) a cada uso
+        return {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+
+    def _serializar(self, conteudo: Any) -> Tuple[bytes, Any]:
+        # Mesmo formato do JSONResponse do FastAPI
+        bruto = json.dumps(
+            jsonable_encoder(conteudo), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+        ).encode("utf-8")
+        comprimido = gzip.compress(bruto, compresslevel=9) if len(bruto) >= self.minimo_compressao else None
+        return bruto, comprimido
+
+    def _obter(self, recurso: str, versao: str, visao: str):
+        chave = (recurso, visao)
+        entrada = self._entradas.get(chave)
+        if entrada is None or entrada[0] != versao:
+            return None
+        self._entradas.move_to_end(chave)
+        return entrada[1], entrada[2]
+
+    def _guardar(self, recurso: str, versao: str, visao: str, entrada: Tuple[bytes, Any]):
+        if self._versoes.get(recurso) != versao:
+            # Nova versão do recurso: as visões da anterior não servem mais
+            self.invalidar(recurso)
+            self._versoes[recurso] = versao
+
+        bruto, comprimido = entrada
+        tamanho = len(bruto) + len(comprimido or b"")
+        if tamanho > self.max_bytes:
+            return
+
+        chave = (recurso, visao)
+        self._remover(chave)
+        self._entradas[chave] = (versao, bruto, comprimido)
+        self._bytes += tamanho
+        while self._bytes > self.max_bytes:
+            self._remover(next(iter(self._entradas)))
+
+    def _remover(self, chave: Tuple[str, str]):
+        entrada = self._entradas.pop(chave, None)
+        if entrada is not None:
+            self._bytes -= len(entrada[1]) + len(entrada[2] or b"")
+
+
+def _corresponde(if_none_match: str, etags: Tuple[str, ...]) -> bool:
+    """Comparação fraca do If-None-Match (lista de ETags ou *)"""
+    if not if_none_match:
+        return False
+    for candidata in if_none_match.split(","):
+        candidata = candidata.strip()
+        if candidata == "*":
+            return True
+        if candidata.startswith("W/"):
+            candidata = candidata[2:]
+        if candidata in etags:
+            return True
+    return False
@@ -1,25 +1,41 @@
 import pandas as pd
 import numpy as np
-import asyncio
-from typing import Dict, List, Any, Tuple, Optional
+from typing import Callable, Dict, Iterator, List, Any, Sequence, Tuple, Optional
 import logging
+import unicodedata
 from datetime import datetime
 
 from .models import (
-    DadosAluno, QuestaoGabarito, ResultadoCorrecao, 
+    DadosAluno, ResultadoCorrecao, 
     EstudanteResponse, EstatisticasGerais, DisciplinaEstatistica,
     EstatisticasResponse, ValidacaoResponse, StatusPerformance,
-    ConfiguracaoSistema
+    ConfiguracaoSistema, AlteracaoGabarito, EstatisticaItem, OrdemBoletins
+)
+from .ranking import IndiceRanking
+from .metricas import ALUNOS_CORRIGIDOS, cronometrar
+from .analise import analisar_itens, estatisticas_disciplinas
+from .exportacao import ExportadorResultados
+from .correcao import (
+    MotorCorrecao, RespostasColunares, GabaritoCompilado, CorrecaoTurma, AlteracaoQuestao, EntradaCompilada,
+    ALTERNATIVAS, TRILHA_PADRAO, alternativa_valida
 )
 
 logger = logging.getLogger(__name__)
 
+# Campos de EstudanteResponse aceitos na projeção do ranking
+CAMPOS_ESTUDANTE = (
+    "id", "nome", "sede", "posicao", "nota_percentual", "acertos",
+    "total_questoes", "desempenho_disciplinas", "status_performance"
+)
+
 class ProcessadorSimulado:
     """Classe principal para processamento de simulados ACAFE"""
     
     def __init__(self):
         self.config = ConfiguracaoSistema()
+        self.motor = MotorCorrecao()
     
+    @cronometrar("validacao")
     def validar_estrutura(self, dados: Dict[str, pd.DataFrame]) -> Dict[str, Any]:
         """Valida a estrutura do arquivo Excel"""
         
@@ -121,193 +137,213 @@ class ProcessadorSimulado:
     async def processar_async(self, dados: Dict[str, pd.DataFrame]) -> Dict[str, Any]:
         """Processa o simulado de forma assíncrona"""
         
-        logger.info("Iniciando processamento do simulado")
+        return self.processar(self.compilar_entrada(dados))
+    
+    @cronometrar("preparacao")
+    def compilar_entrada(self, dados: Dict[str, pd.DataFrame],
+                         gabarito: Optional[GabaritoCompilado] = None) -> EntradaCompilada:
+        """Interpreta a planilha uma única vez (no upload); os DataFrames podem ser descartados em seguida
+        
+        Um `gabarito` já compilado (ex.: compartilhado entre as planilhas de um lote)
+        substitui a aba GABARITO de `dados`.
+        """
         
-        # Preparar dados
         alunos = self._preparar_dados_alunos(dados['RESPOSTAS'])
-        gabarito = self._preparar_gabarito(dados['GABARITO'])
+        if gabarito is None:
+            # Medido à parte (também entra em "preparacao"); num lote só a primeira planilha compila
+            with cronometrar("gabarito"):
+                gabarito = self._preparar_gabarito(dados['GABARITO'])
+        return self.motor.compilar_entrada(alunos, gabarito)
+    
+    def processar(self, entrada: EntradaCompilada,
+                  progresso: Optional[Callable[[int, str], None]] = None) -> Dict[str, Any]:
+        """Corrige a entrada compilada, informando o andamento (percentual, etapa) a cada etapa"""
+        
+        def informar(percentual: int, etapa: str):
+            if progresso is not None:
+                progresso(percentual, etapa)
+        
+        logger.info("Iniciando processamento do simulado")
         
         # Processar correção
-        resultados = await self._processar_correcao_async(alunos, gabarito)
+        informar(30, "corrigindo")
+        turma = self._processar_correcao(entrada)
+        
+        # Gerar índice do ranking (uma vez por processo)
+        informar(70, "ranking")
+        ranking = self._gerar_ranking(turma)
         
         # Calcular estatísticas
-        estatisticas = self._calcular_estatisticas(resultados, gabarito)
+        informar(80, "estatisticas")
+        estatisticas = self._calcular_estatisticas(turma, ranking)
         
-        # Gerar ranking
-        ranking = self._gerar_ranking(resultados)
+        logger.info(f"Processamento concluído: {turma.alunos.total_alunos} alunos processados")
         
-        logger.info(f"Processamento concluído: {len(alunos)} alunos processados")
+        return {
+            "turma": turma,
+            "estatisticas": estatisticas,
+            "ranking": ranking,
+            "metadados": {
+                "timestamp": datetime.now(),
+                "total_alunos": turma.alunos.total_alunos,
+                "total_questoes": len(turma.gabarito.linhas_numero)
+            }
+        }
+    
+    def recorrigir(self, turma: CorrecaoTurma, alteracoes: List[AlteracaoGabarito],
+                   entrada: Optional[EntradaCompilada] = None) -> Dict[str, Any]:
+        """Aplica emendas ao gabarito sem reler nem recorrigir a turma inteira
+        
+        Se a `entrada` armazenada for informada, o resultado traz também a entrada com o
+        gabarito emendado, para que um reprocessamento completo mantenha as emendas.
+        """
+        
+        with cronometrar("recorrecao"):
+            turma, questoes, _ = self.motor.recorrigir(turma, [self._converter_alteracao(a) for a in alteracoes])
+        ALUNOS_CORRIGIDOS.incrementar(turma.alunos.total_alunos)
+        
+        ranking = self._gerar_ranking(turma)
+        estatisticas = self._calcular_estatisticas(turma, ranking)
+        
+        logger.info(f"Gabarito emendado: questões {questoes.tolist()} recorrigidas")
         
         return {
-            "resultados": resultados,
+            "turma": turma,
             "estatisticas": estatisticas,
             "ranking": ranking,
+            "questoes_recorrigidas": questoes.tolist(),
+            "entrada": entrada.com_gabarito(turma.gabarito) if entrada is not None else None,
             "metadados": {
                 "timestamp": datetime.now(),
-                "total_alunos": len(alunos),
-                "total_questoes": len(gabarito)
+                "total_alunos": turma.alunos.total_alunos,
+                "total_questoes": len(turma.gabarito.linhas_numero)
             }
         }
     
-    def _preparar_dados_alunos(self, respostas_df: pd.DataFrame) -> List[DadosAluno]:
-        """Prepara dados dos alunos"""
-        alunos = []
+    def consolidar(self, resultados: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Une os resultados de processos com o mesmo gabarito em uma única turma (ranking e estatísticas)"""
         
-        # Identificar colunas de questões
-        colunas_questoes = [col for col in respostas_df.columns if col.startswith('Questão')]
+        gabarito = resultados[0]["turma"].gabarito
+        if any(not r["turma"].gabarito.equivalente(gabarito) for r in resultados[1:]):
+            raise ValueError("Os processos não têm mais o mesmo gabarito (houve emenda em apenas parte deles)")
         
-        for _, row in respostas_df.iterrows():
-            # Extrair respostas
-            respostas = {}
-            for col in colunas_questoes:
-                # Extrair número da questão
-                try:
-                    num_questao = int(col.split()[-1])
-                    resposta = str(row[col]).strip().upper() if pd.notna(row[col]) else None
-                    if resposta and resposta in ['A', 'B', 'C', 'D', 'E']:
-                        respostas[num_questao] = resposta
-                except (ValueError, IndexError):
-                    continue
-            
-            aluno = DadosAluno(
-                id=str(row['ID']),
-                nome=str(row['Nome']),
-                sede=str(row.get('Sede', '')) if pd.notna(row.get('Sede')) else None,
-                respostas=respostas,
-                idioma_escolhido=str(row.get('Idioma escolhido', '')) if pd.notna(row.get('Idioma escolhido')) else None
-            )
-            alunos.append(aluno)
+        turma = CorrecaoTurma.unir([resultado["turma"] for resultado in resultados])
+        ranking = self._gerar_ranking(turma)
         
-        return alunos
+        return {
+            "turma": turma,
+            "ranking": ranking,
+            "estatisticas": self._calcular_estatisticas(turma, ranking)
+        }
     
-    def _preparar_gabarito(self, gabarito_df: pd.DataFrame) -> List[QuestaoGabarito]:
-        """Prepara gabarito"""
-        gabarito = []
-        
-        for _, row in gabarito_df.iterrows():
-            questao = QuestaoGabarito(
-                numero=int(row['Questão']),
-                disciplina=str(row['Disciplina']).strip(),
-                resposta_correta=str(row['Resposta']).strip().upper()
-            )
-            gabarito.append(questao)
+    def analisar_itens(self, turma: CorrecaoTurma, fracao_grupos: Optional[float] = None) -> List[EstatisticaItem]:
+        """Dificuldade, discriminação e distratores de cada item do gabarito"""
         
-        return gabarito
+        if fracao_grupos is None:
+            fracao_grupos = self.config.fracao_grupos_discriminacao
+        return [EstatisticaItem(**item) for item in analisar_itens(turma, fracao_grupos)]
     
-    async def _processar_correcao_async(self, alunos: List[DadosAluno], gabarito: List[QuestaoGabarito]) -> List[ResultadoCorrecao]:
-        """Processa correção de forma assíncrona"""
-        
-        # Criar dicionário de gabarito para acesso rápido
-        gabarito_dict = {}
-        for q in gabarito:
-            if q.numero not in gabarito_dict:
-                gabarito_dict[q.numero] = []
-            gabarito_dict[q.numero].append(q)
-        
-        # Processar alunos em lotes
-        lote_size = self.config.max_alunos_por_lote
-        resultados = []
-        
-        for i in range(0, len(alunos), lote_size):
-            lote = alunos[i:i + lote_size]
-            lote_resultados = await asyncio.gather(*[
-                self._corrigir_aluno_async(aluno, gabarito_dict) 
-                for aluno in lote
-            ])
-            resultados.extend(lote_resultados)
-        
-        return resultados
+    def _converter_alteracao(self, alteracao: AlteracaoGabarito) -> AlteracaoQuestao:
+        """Alteração da API para o motor (idioma vira trilha)"""
+        
+        trilha = None
+        if alteracao.idioma:
+            trilha = int(self.motor.classificar_idiomas(np.array([alteracao.idioma], dtype=object))[0])
+            if trilha == TRILHA_PADRAO:
+                raise ValueError(f"Idioma desconhecido: {alteracao.idioma}")
+        
+        return AlteracaoQuestao(
+            numero=alteracao.questao,
+            resposta=alteracao.resposta,
+            anulada=alteracao.anulada,
+            disciplina=alteracao.disciplina,
+            trilha=trilha
+        )
     
-    async def _corrigir_aluno_async(self, aluno: DadosAluno, gabarito_dict: Dict[int, List[QuestaoGabarito]]) -> ResultadoCorrecao:
-        """Corrige um aluno específico"""
+    def restaurar_resultado(self, turma: CorrecaoTurma, estatisticas: EstatisticasResponse,
+                            metadados: Dict[str, Any]) -> Dict[str, Any]:
+        """Reconstrói o resultado de processar_async a partir dos arrays armazenados"""
         
-        acertos = 0
-        erros = 0
-        questoes_corretas = []
-        questoes_erradas = []
-        desempenho_disciplinas = {}
+        return {
+            "turma": turma,
+            "estatisticas": estatisticas,
+            "ranking": self._gerar_ranking(turma),
+            "metadados": metadados
+        }
+    
+    def _preparar_dados_alunos(self, respostas_df: pd.DataFrame) -> RespostasColunares:
+        """Prepara dados dos alunos em forma colunar"""
+        return self.motor.preparar_respostas(respostas_df)
+    
+    def _preparar_gabarito(self, gabarito_df: pd.DataFrame) -> GabaritoCompilado:
+        """Prepara gabarito compilado por trilha de idioma"""
+        return self.motor.preparar_gabarito(gabarito_df)
+    
+    @cronometrar("correcao")
+    def _processar_correcao(self, entrada: EntradaCompilada) -> CorrecaoTurma:
+        """Processa a correção da turma inteira de forma vetorizada"""
         
-        # Questões únicas (para lidar com Inglês/Espanhol)
-        questoes_unicas = set(gabarito_dict.keys())
+        # Respostas já alinhadas ao gabarito e trilhas já classificadas no upload
+        correcao = self.motor.corrigir(entrada.alunos.respostas, entrada.trilhas, entrada.gabarito)
+        ALUNOS_CORRIGIDOS.incrementar(entrada.alunos.total_alunos)
         
-        for num_questao in questoes_unicas:
-            questoes_gabarito = gabarito_dict[num_questao]
-            
-            # Se há múltiplas opções (Inglês/Espanhol), escolher baseado no idioma do aluno
-            questao_correta = self._escolher_questao_idioma(questoes_gabarito, aluno.idioma_escolhido)
-            
-            if num_questao in aluno.respostas:
-                resposta_aluno = aluno.respostas[num_questao]
-                
-                if resposta_aluno == questao_correta.resposta_correta:
-                    acertos += 1
-                    questoes_corretas.append(num_questao)
-                else:
-                    erros += 1
-                    questoes_erradas.append(num_questao)
-                
-                # Atualizar desempenho por disciplina
-                disciplina = questao_correta.disciplina
-                if disciplina not in desempenho_disciplinas:
-                    desempenho_disciplinas[disciplina] = {
-                        "acertos": 0,
-                        "total": 0,
-                        "questoes_corretas": [],
-                        "questoes_erradas": []
-                    }
-                
-                desempenho_disciplinas[disciplina]["total"] += 1
-                if resposta_aluno == questao_correta.resposta_correta:
-                    desempenho_disciplinas[disciplina]["acertos"] += 1
-                    desempenho_disciplinas[disciplina]["questoes_corretas"].append(num_questao)
-                else:
-                    desempenho_disciplinas[disciplina]["questoes_erradas"].append(num_questao)
-            else:
-                # Questão não respondida
-                erros += 1
-                questoes_erradas.append(num_questao)
-        
-        # Calcular percentuais por disciplina
-        for disciplina in desempenho_disciplinas:
-            stats = desempenho_disciplinas[disciplina]
-            stats["percentual"] = (stats["acertos"] / stats["total"]) * 100 if stats["total"] > 0 else 0
-        
-        total_questoes = len(questoes_unicas)
-        nota_percentual = (acertos / total_questoes) * 100 if total_questoes > 0 else 0
+        return CorrecaoTurma(alunos=entrada.alunos, gabarito=entrada.gabarito, trilhas=entrada.trilhas, correcao=correcao)
+    
+    def montar_resultado(self, turma: CorrecaoTurma, i: int) -> ResultadoCorrecao:
+        """ResultadoCorrecao de um aluno, montado sob demanda a partir das matrizes"""
+        
+        alunos, gabarito, correcao = turma.alunos, turma.gabarito, turma.correcao
+        corretas = correcao.corretas[i]
+        codigos = alunos.respostas[i]
+        
+        aluno = DadosAluno(
+            id=alunos.ids[i],
+            nome=alunos.nomes[i],
+            sede=alunos.sedes[i],
+            respostas={
+                int(alunos.numeros[j]): ALTERNATIVAS[codigos[j] - 1]
+                for j in np.flatnonzero(alternativa_valida(codigos))
+            },
+            idioma_escolhido=alunos.idiomas[i]
+        )
         
         return ResultadoCorrecao(
             aluno=aluno,
-            acertos=acertos,
-            erros=erros,
-            nota_percentual=nota_percentual,
-            questoes_corretas=questoes_corretas,
-            questoes_erradas=questoes_erradas,
-            desempenho_por_disciplina=desempenho_disciplinas
+            acertos=int(correcao.acertos[i]),
+            erros=int(correcao.erros[i]),
+            nota_percentual=float(correcao.nota_percentual[i]),
+            questoes_corretas=gabarito.numeros[corretas].tolist(),
+            questoes_erradas=gabarito.numeros[~corretas].tolist(),
+            desempenho_por_disciplina=self._desempenho_disciplinas(turma, i)
         )
     
-    def _escolher_questao_idioma(self, questoes: List[QuestaoGabarito], idioma_escolhido: Optional[str]) -> QuestaoGabarito:
-        """Escolhe a questão correta baseada no idioma escolhido pelo aluno"""
-        
-        if len(questoes) == 1:
-            return questoes[0]
-        
-        # Se há múltiplas questões (Inglês/Espanhol), escolher baseado no idioma
-        if idioma_escolhido:
-            idioma_lower = idioma_escolhido.lower()
-            for questao in questoes:
-                disciplina_lower = questao.disciplina.lower()
-                if ('inglês' in disciplina_lower or 'ingles' in disciplina_lower) and 'inglês' in idioma_lower:
-                    return questao
-                elif ('espanhol' in disciplina_lower or 'espanol' in disciplina_lower) and 'espanhol' in idioma_lower:
-                    return questao
-        
-        # Default: retornar a primeira questão
-        return questoes[0]
+    def _desempenho_disciplinas(self, turma: CorrecaoTurma, i: int) -> Dict[str, Dict[str, Any]]:
+        """Desempenho de um aluno por disciplina, na ordem da primeira questão respondida"""
+        
+        gabarito, correcao = turma.gabarito, turma.correcao
+        corretas = correcao.corretas[i]
+        respondidas = correcao.respondidas[i]
+        disciplinas_aluno = gabarito.disciplinas[turma.trilhas[i]]
+        
+        desempenho = {}
+        for d in pd.unique(disciplinas_aluno[respondidas]):
+            acertos_d = int(correcao.acertos_disciplina[i, d])
+            total_d = int(correcao.total_disciplina[i, d])
+            da_disciplina = disciplinas_aluno == d
+            desempenho[gabarito.nomes_disciplinas[d]] = {
+                "acertos": acertos_d,
+                "total": total_d,
+                "questoes_corretas": gabarito.numeros[da_disciplina & corretas].tolist(),
+                "questoes_erradas": gabarito.numeros[da_disciplina & respondidas & ~corretas].tolist(),
+                "percentual": (acertos_d / total_d) * 100
+            }
+        return desempenho
     
-    def _calcular_estatisticas(self, resultados: List[ResultadoCorrecao], gabarito: List[QuestaoGabarito]) -> EstatisticasResponse:
+    @cronometrar("estatisticas")
+    def _calcular_estatisticas(self, turma: CorrecaoTurma, ranking: IndiceRanking) -> EstatisticasResponse:
         """Calcula estatísticas gerais"""
         
-        if not resultados:
+        if turma.alunos.total_alunos == 0:
             return EstatisticasResponse(
                 gerais=EstatisticasGerais(
                     total_alunos=0,
@@ -323,24 +359,24 @@ class ProcessadorSimulado:
             )
         
         # Estatísticas gerais
-        notas = [r.nota_percentual for r in resultados]
+        notas = turma.correcao.nota_percentual
         media_geral = np.mean(notas)
         nota_maxima = np.max(notas)
         nota_minima = np.min(notas)
         desvio_padrao = np.std(notas)
         
         # Estatísticas por disciplina
-        disciplinas_stats = self._calcular_estatisticas_disciplinas(resultados, gabarito)
+        disciplinas_stats = self._calcular_estatisticas_disciplinas(turma)
         
         # Distribuição de notas
         distribuicao = self._calcular_distribuicao_notas(notas)
         
         # Top 3
-        top_3 = self._gerar_ranking(resultados)[:3]
+        top_3 = self.listar_ranking(turma, ranking, 0, 3)
         
         gerais = EstatisticasGerais(
-            total_alunos=len(resultados),
-            total_questoes=len(set(q.numero for q in gabarito)),
+            total_alunos=turma.alunos.total_alunos,
+            total_questoes=turma.gabarito.total_questoes,
             media_geral=media_geral,
             nota_maxima=nota_maxima,
             nota_minima=nota_minima,
@@ -354,107 +390,105 @@ class ProcessadorSimulado:
             top_3=top_3
         )
     
-    def _calcular_estatisticas_disciplinas(self, resultados: List[ResultadoCorrecao], gabarito: List[QuestaoGabarito]) -> List[DisciplinaEstatistica]:
+    def _calcular_estatisticas_disciplinas(self, turma: CorrecaoTurma) -> List[DisciplinaEstatistica]:
         """Calcula estatísticas por disciplina"""
-        
-        disciplinas_stats = []
-        disciplinas_unicas = set(q.disciplina for q in gabarito)
-        
-        for disciplina in disciplinas_unicas:
-            # Questões desta disciplina
-            questoes_disciplina = [q.numero for q in gabarito if q.disciplina == disciplina]
-            
-            # Desempenho dos alunos nesta disciplina
-            percentuais = []
-            acertos_por_questao = {q: 0 for q in questoes_disciplina}
-            
-            for resultado in resultados:
-                if disciplina in resultado.desempenho_por_disciplina:
-                    stats = resultado.desempenho_por_disciplina[disciplina]
-                    percentuais.append(stats["percentual"])
-                    
-                    # Contar acertos por questão
-                    for questao in stats["questoes_corretas"]:
-                        if questao in acertos_por_questao:
-                            acertos_por_questao[questao] += 1
-            
-            if percentuais:
-                media_percentual = np.mean(percentuais)
-                
-                # Questão mais difícil (menos acertos)
-                questao_mais_dificil = min(acertos_por_questao.items(), key=lambda x: x[1])[0]
-                
-                # Questão mais fácil (mais acertos)
-                questao_mais_facil = max(acertos_por_questao.items(), key=lambda x: x[1])[0]
-                
-                # Média de acertos
-                acertos_media = np.mean(list(acertos_por_questao.values()))
-                
-                disciplina_stat = DisciplinaEstatistica(
-                    nome=disciplina,
-                    media_percentual=media_percentual,
-                    questoes_total=len(questoes_disciplina),
-                    questao_mais_dificil=questao_mais_dificil,
-                    questao_mais_facil=questao_mais_facil,
-                    acertos_media=acertos_media
-                )
-                disciplinas_stats.append(disciplina_stat)
-        
-        return disciplinas_stats
+        return [DisciplinaEstatistica(**estatistica) for estatistica in estatisticas_disciplinas(turma)]
     
-    def _calcular_distribuicao_notas(self, notas: List[float]) -> Dict[str, int]:
+    def _calcular_distribuicao_notas(self, notas: np.ndarray) -> Dict[str, int]:
         """Calcula distribuição de notas por faixas"""
         
-        distribuicao = {
-            "0-20": 0,
-            "21-40": 0,
-            "41-60": 0,
-            "61-80": 0,
-            "81-100": 0
-        }
+        # Limite superior (inclusivo) de cada faixa
+        faixas = ["0-20", "21-40", "41-60", "61-80", "81-100"]
+        contagem = np.bincount(np.searchsorted([20, 40, 60, 80], notas, side='left'), minlength=len(faixas))
         
-        for nota in notas:
-            if nota <= 20:
-                distribuicao["0-20"] += 1
-            elif nota <= 40:
-                distribuicao["21-40"] += 1
-            elif nota <= 60:
-                distribuicao["41-60"] += 1
-            elif nota <= 80:
-                distribuicao["61-80"] += 1
-            else:
-                distribuicao["81-100"] += 1
-        
-        return distribuicao
+        return dict(zip(faixas, contagem.tolist()))
     
-    def _gerar_ranking(self, resultados: List[ResultadoCorrecao]) -> List[EstudanteResponse]:
-        """Gera ranking dos estudantes"""
-        
-        # Ordenar por nota (decrescente) e depois por nome (crescente)
-        resultados_ordenados = sorted(
-            resultados, 
-            key=lambda x: (-x.nota_percentual, x.aluno.nome)
+    @cronometrar("ranking")
+    def _gerar_ranking(self, turma: CorrecaoTurma) -> IndiceRanking:
+        """Gera o índice do ranking dos estudantes"""
+        
+        return IndiceRanking(
+            ids=turma.alunos.ids,
+            nomes=turma.alunos.nomes,
+            notas=turma.correcao.nota_percentual
         )
-        
-        ranking = []
-        for i, resultado in enumerate(resultados_ordenados):
-            # Determinar status de performance
-            status = self._determinar_status_performance(resultado.nota_percentual)
+    
+    def listar_ranking(self, turma: CorrecaoTurma, ranking: IndiceRanking,
+                       inicio: int = 0, fim: Optional[int] = None, mascara: Optional[np.ndarray] = None,
+                       campos: Optional[Sequence[str]] = None) -> List[Any]:
+        """Monta os EstudanteResponse apenas para a fatia pedida do ranking
+        
+        Com `campos`, devolve dicionários só com esses campos (o desempenho por
+        disciplina, a parte mais cara, só é montado se pedido).
+        """
+        
+        alunos, correcao = turma.alunos, turma.correcao
+        estudantes = []
+        for i in ranking.fatia(inicio, fim, mascara):
+            nota = float(correcao.nota_percentual[i])
+            acertos = int(correcao.acertos[i])
             
-            estudante = EstudanteResponse(
-                id=resultado.aluno.id,
-                nome=resultado.aluno.nome,
-                sede=resultado.aluno.sede,
-                posicao=i + 1,
-                nota_percentual=resultado.nota_percentual,
-                acertos=resultado.acertos,
-                total_questoes=resultado.acertos + resultado.erros,
-                desempenho_disciplinas=resultado.desempenho_por_disciplina,
-                status_performance=status
-            )
-            ranking.append(estudante)
+            estudante = {
+                "id": alunos.ids[i],
+                "nome": alunos.nomes[i],
+                "sede": alunos.sedes[i],
+                "posicao": int(ranking.posicoes[i]),
+                "nota_percentual": nota,
+                "acertos": acertos,
+                "total_questoes": acertos + int(correcao.erros[i]),
+                "status_performance": self._determinar_status_performance(nota)
+            }
+            if campos is None:
+                estudante["desempenho_disciplinas"] = self._desempenho_disciplinas(turma, i)
+                estudantes.append(EstudanteResponse(**estudante))
+                continue
+            
+            if "desempenho_disciplinas" in campos:
+                estudante["desempenho_disciplinas"] = self._desempenho_disciplinas(turma, i)
+            estudantes.append({campo: estudante[campo] for campo in campos})
         
-        return ranking
+        return estudantes
+    
+    def exportar_resultados(self, turma: CorrecaoTurma, ranking: IndiceRanking, formato: str) -> Iterator[bytes]:
+        """Planilha completa de resultados (CSV, Parquet ou XLSX), gerada em blocos e entregue em pedaços"""
+        
+        status = self._status_performance(turma.correcao.nota_percentual)
+        return ExportadorResultados(turma, ranking, status).gerar(formato)
+    
+    def filtrar_ranking(self, turma: CorrecaoTurma, sedes: Optional[Sequence[str]] = None,
+                        status: Optional[Sequence[str]] = None) -> Optional[np.ndarray]:
+        """Máscara dos alunos que atendem aos filtros de sede e status de performance (None = todos)"""
+        
+        mascara = None
+        if sedes:
+            mascara = np.isin(turma.alunos.sedes, list(sedes))
+        if status:
+            dos_status = np.isin(self._status_performance(turma.correcao.nota_percentual), list(status))
+            mascara = dos_status if mascara is None else mascara & dos_status
+        return mascara
+    
+    def ordenar_boletins(self, turma: CorrecaoTurma, ranking: IndiceRanking, sede: Optional[str] = None,
+                         ordem: str = OrdemBoletins.NOME.value) -> np.ndarray:
+        """Índices dos alunos de uma sede (None = todos) na ordem de impressão dos boletins"""
+        
+        mascara = self.filtrar_ranking(turma, [sede]) if sede else None
+        if ordem == OrdemBoletins.RANKING.value:
+            return ranking.fatia(mascara=mascara)
+        
+        # Alfabética sem distinguir acentos e maiúsculas (empate: nome exato)
+        indices = np.arange(turma.alunos.total_alunos) if mascara is None else np.flatnonzero(mascara)
+        nomes = turma.alunos.nomes[indices]
+        chaves = np.array([_chave_alfabetica(nome) for nome in nomes], dtype=object)
+        return indices[np.lexsort((nomes, chaves))]
+    
+    def _status_performance(self, notas: np.ndarray) -> np.ndarray:
+        """_determinar_status_performance aplicado à turma inteira"""
+        
+        resultado = np.full(len(notas), StatusPerformance.PRECISA_MELHORAR.value, dtype=object)
+        # Na ordem inversa, para que a primeira faixa que contém a nota prevaleça
+        for status, (min_nota, max_nota) in reversed(list(self.config.faixas_performance.items())):
+            resultado[(notas >= min_nota) & (notas <= max_nota)] = status.value
+        return resultado
     
     def _determinar_status_performance(self, nota_percentual: float) -> str:
         """Determina o status de performance baseado na nota"""
@@ -464,3 +498,8 @@ class ProcessadorSimulado:
                 return status.value
         
         return StatusPerformance.PRECISA_MELHORAR.value
+
+
+def _chave_alfabetica(nome: str) -> str:
+    sem_acentos = unicodedata.normalize('NFKD', str(nome)).encode('ascii', 'ignore').decode('ascii')
+    return sem_acentos.casefold()
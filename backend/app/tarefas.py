@@ -0,0 +1,241 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Sequence, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from .armazenamento import ArmazenamentoProcessos
+from .models import AlteracaoGabarito, ConfiguracaoSistema, StatusProcesso
+from .services import ProcessadorSimulado
+
+logger = logging.getLogger(__name__)
+
+# Status a partir dos quais cada tarefa pode começar
+STATUS_PERMITE_CORRECAO = (
+    StatusProcesso.VALIDADO.value, StatusProcesso.PROCESSADO.value,
+    StatusProcesso.CONCLUIDO.value, StatusProcesso.ERRO.value
+)
+STATUS_PERMITE_PDFS = (StatusProcesso.PROCESSADO.value, StatusProcesso.CONCLUIDO.value)
+
+
+class FilaTarefas:
+    """Correção e geração de PDFs em segundo plano, com número limitado de tarefas simultâneas"""
+
+    # O andamento fica no registro compartilhado, então qualquer worker responde ao status;
+    # a fila em si é local: cada worker executa as tarefas que recebeu.
+
+    def __init__(self, armazenamento: ArmazenamentoProcessos, max_simultaneas: int,
+                 apos_tarefa: Optional[Callable[[], Any]] = None):
+        self.armazenamento = armazenamento
+        self.max_simultaneas = max(1, max_simultaneas)
+        self.apos_tarefa = apos_tarefa
+        self._semaforo: Optional[asyncio.Semaphore] = None
+        self._tarefas: Dict[str, asyncio.Task] = {}
+        self._em_execucao = 0
+
+    def pendentes(self) -> List[str]:
+        """Processos com tarefa na fila ou em execução neste worker"""
+        return list(self._tarefas)
+
+    def ocupacao(self) -> Dict[str, int]:
+        """Tarefas deste worker executando e aguardando vaga"""
+        total = len(set(self._tarefas.values()))
+        return {"executando": self._em_execucao, "aguardando": max(0, total - self._em_execucao)}
+
+    def agendar_correcao(self, processo_id: str) -> bool:
+        """Enfileira a correção; False se o processo já tem tarefa em andamento"""
+        if not self.armazenamento.iniciar_tarefa(processo_id, StatusProcesso.PROCESSANDO.value, STATUS_PERMITE_CORRECAO):
+            return False
+        self._agendar([processo_id], self._corrigir(processo_id))
+        return True
+
+    def agendar_lote(self, processo_ids: Sequence[str]) -> List[str]:
+        """Enfileira a correção de processos de um mesmo lote
+
+        Os processos são corrigidos em sequência dentro de uma única vaga; devolve os
+        que foram de fato enfileirados (os demais já tinham tarefa em andamento).
+        """
+        agendados = [
+            processo_id for processo_id in processo_ids
+            if self.armazenamento.iniciar_tarefa(processo_id, StatusProcesso.PROCESSANDO.value, STATUS_PERMITE_CORRECAO)
+        ]
+        if agendados:
+            self._agendar(agendados, self._corrigir_lote(agendados))
+        return agendados
+
+    def agendar_pdfs(self, processo_id: str, carregar_resultado: Callable[[Dict[str, Any]], Dict[str, Any]]) -> bool:
+        """Enfileira a geração dos boletins; False se o processo já tem tarefa em andamento"""
+        if not self.armazenamento.iniciar_tarefa(processo_id, StatusProcesso.GERANDO_PDFS.value, STATUS_PERMITE_PDFS):
+            return False
+        self._agendar([processo_id], self._gerar_pdfs(processo_id, carregar_resultado))
+        return True
+
+    async def recorrigir(self, processo_id: str, alteracoes: List[AlteracaoGabarito]) -> Optional[Dict[str, Any]]:
+        """Aplica emendas ao gabarito e recorrige na hora; None se o processo está ocupado ou sem correção"""
+        
+        registro = await run_in_threadpool(self.armazenamento.obter, processo_id)
+        if registro is None or registro["status"] not in STATUS_PERMITE_PDFS:
+            return None
+        if not await run_in_threadpool(
+            self.armazenamento.iniciar_tarefa, processo_id, StatusProcesso.PROCESSANDO.value, (registro["status"],)
+        ):
+            return None
+        
+        try:
+            async with self._vaga():
+                resultado = await run_in_threadpool(self._recorrigir, processo_id, alteracoes)
+        except ValueError:
+            # Emenda inválida: nada foi gravado
+            await run_in_threadpool(self.armazenamento.finalizar_tarefa, processo_id, registro["status"])
+            raise
+        except asyncio.CancelledError:
+            self._falhar(processo_id, "Tarefa interrompida")
+            raise
+        except Exception as e:
+            await run_in_threadpool(self._falhar, processo_id, f"Erro ao recorrigir: {e}")
+            raise
+        await self._apos_tarefa()
+        return resultado
+    
+    def _recorrigir(self, processo_id: str, alteracoes: List[AlteracaoGabarito]) -> Dict[str, Any]:
+        turma = self.armazenamento.carregar_turma(processo_id)
+        # A entrada compilada (se ainda armazenada) recebe as mesmas emendas
+        entrada = self.armazenamento.carregar_entrada(processo_id)
+        resultado = ProcessadorSimulado().recorrigir(turma, alteracoes, entrada)
+        self.armazenamento.salvar_resultado(processo_id, resultado, entrada=resultado["entrada"])
+        self.armazenamento.finalizar_tarefa(processo_id, StatusProcesso.PROCESSADO.value)
+        return resultado
+    
+    async def encerrar(self):
+        """Cancela as tarefas deste worker (ficam registradas como interrompidas)"""
+        tarefas = list(self._tarefas.values())
+        for tarefa in tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*tarefas, return_exceptions=True)
+
+    def _agendar(self, processo_ids: Sequence[str], corrotina: Coroutine):
+        tarefa = asyncio.create_task(corrotina)
+        for processo_id in processo_ids:
+            self._tarefas[processo_id] = tarefa
+
+        def liberar(_):
+            for processo_id in processo_ids:
+                if self._tarefas.get(processo_id) is tarefa:
+                    del self._tarefas[processo_id]
+
+        tarefa.add_done_callback(liberar)
+
+    @asynccontextmanager
+    async def _vaga(self):
+        # Criado sob demanda, dentro do event loop do servidor
+        if self._semaforo is None:
+            self._semaforo = asyncio.Semaphore(self.max_simultaneas)
+        async with self._semaforo:
+            self._em_execucao += 1
+            try:
+                yield
+            finally:
+                self._em_execucao -= 1
+
+    async def _corrigir(self, processo_id: str):
+        try:
+            async with self._vaga():
+                await self._executar_correcao(processo_id)
+        except asyncio.CancelledError:
+            self._falhar(processo_id, "Tarefa interrompida")
+            raise
+        except Exception as e:
+            logger.exception(f"Erro ao processar {processo_id}")
+            await run_in_threadpool(self._falhar, processo_id, f"Erro ao processar: {e}")
+        await self._apos_tarefa()
+
+    async def _corrigir_lote(self, processo_ids: Sequence[str]):
+        pendentes = list(processo_ids)
+        try:
+            async with self._vaga():
+                while pendentes:
+                    processo_id = pendentes[0]
+                    try:
+                        await self._executar_correcao(processo_id)
+                    except Exception as e:
+                        logger.exception(f"Erro ao processar {processo_id}")
+                        await run_in_threadpool(self._falhar, processo_id, f"Erro ao processar: {e}")
+                    pendentes.pop(0)
+        except asyncio.CancelledError:
+            for processo_id in pendentes:
+                self._falhar(processo_id, "Tarefa interrompida")
+            raise
+        await self._apos_tarefa()
+
+    async def _executar_correcao(self, processo_id: str) -> Dict[str, Any]:
+        def progresso(percentual: int, etapa: str):
+            self.armazenamento.atualizar_progresso(processo_id, percentual, etapa)
+
+        await run_in_threadpool(progresso, 5, "carregando")
+        entrada = await run_in_threadpool(self.armazenamento.carregar_entrada, processo_id)
+        if entrada is None:
+            raise RuntimeError("Planilha original descartada por inatividade; envie o arquivo novamente")
+
+        resultado = await run_in_threadpool(ProcessadorSimulado().processar, entrada, progresso)
+
+        await run_in_threadpool(progresso, 90, "gravando")
+        await run_in_threadpool(self.armazenamento.salvar_resultado, processo_id, resultado)
+        await run_in_threadpool(self.armazenamento.finalizar_tarefa, processo_id, StatusProcesso.PROCESSADO.value)
+        return resultado
+
+    def _carregar_para_pdfs(self, processo_id: str, carregar_resultado: Callable[[Dict[str, Any]], Dict[str, Any]]
+                            ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        # Relido aqui: pode haver nova versão desde o agendamento
+        registro = self.armazenamento.obter(processo_id)
+        if registro is None:
+            raise RuntimeError("Processo não encontrado")
+        return registro, carregar_resultado(registro)
+    
+    async def _gerar_pdfs(self, processo_id: str, carregar_resultado: Callable[[Dict[str, Any]], Dict[str, Any]]):
+        # fpdf e boletins carregados só na primeira geração (ou pelo aquecimento no startup)
+        from .utils import GeradorPDF
+        
+        gerados = []
+        try:
+            async with self._vaga():
+                await run_in_threadpool(self.armazenamento.atualizar_progresso, processo_id, 0, "carregando")
+                registro, resultado = await run_in_threadpool(self._carregar_para_pdfs, processo_id, carregar_resultado)
+
+                # Saída determinística: a data do processo no rodapé torna os boletins reaproveitáveis
+                data_emissao = registro["timestamp"] if ConfiguracaoSistema().boletim_deterministico else None
+
+                total = max(resultado["turma"].alunos.total_alunos, 1)
+                async for lote_pdfs in GeradorPDF().gerar_pdfs_stream(resultado, data_emissao):
+                    gerados.extend(lote_pdfs)
+                    await run_in_threadpool(
+                        self.armazenamento.atualizar_progresso, processo_id,
+                        min(99, 100 * len(gerados) // total), "gerando_pdfs"
+                    )
+
+                await run_in_threadpool(self.armazenamento.salvar_pdfs, processo_id, gerados)
+                await run_in_threadpool(self.armazenamento.finalizar_tarefa, processo_id, StatusProcesso.CONCLUIDO.value)
+        except asyncio.CancelledError:
+            self._falhar(processo_id, "Tarefa interrompida")
+            raise
+        except Exception as e:
+            logger.exception(f"Erro ao gerar PDFs de {processo_id}")
+            await run_in_threadpool(self._falhar, processo_id, f"Erro ao gerar PDFs: {e}")
+        await self._apos_tarefa()
+
+    def _falhar(self, processo_id: str, erro: str):
+        # Com uma correção anterior gravada, o processo continua consultável
+        registro = self.armazenamento.obter(processo_id)
+        if registro is None:
+            return
+        status = StatusProcesso.PROCESSADO.value if registro["versao"] > 0 else StatusProcesso.ERRO.value
+        self.armazenamento.finalizar_tarefa(processo_id, status, erro=erro)
+
+    async def _apos_tarefa(self):
+        if self.apos_tarefa is None:
+            return
+        try:
+            await run_in_threadpool(self.apos_tarefa)
+        except Exception:
+            logger.exception("Erro após tarefa")
+
@@ -1,87 +1,332 @@
 import os
+import json
+import time
+import logging
 import zipfile
 import asyncio
-from typing import List, Dict, Any
-from fpdf import FPDF
-import matplotlib.pyplot as plt
-import seaborn as sns
-import pandas as pd
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Dict, Any, AsyncIterator, Iterator, Optional, Tuple
+from fpdf import FPDF, XPos, YPos
 import numpy as np
 from datetime import datetime
 import tempfile
-import requests
-from io import BytesIO
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils.dataframe import dataframe_to_rows
+from io import RawIOBase
+
+from fastapi.encoders import jsonable_encoder
 
 from .models import ResultadoCorrecao, PDFInfo, ConfiguracaoSistema
+from .services import ProcessadorSimulado
+from .correcao import CorrecaoTurma
+from .artefatos import CacheArtefatos, chave_conteudo
+from .recursos import obter_recursos
+from .metricas import DURACAO_ETAPAS, PDFS_GERADOS, cronometrar, registro as registro_metricas
+
+logger = logging.getLogger(__name__)
+
+# Versão do layout do boletim: faz parte da chave do cache, altere ao mudar o desenho
+VERSAO_LAYOUT_BOLETIM = "2.0"
+
+# Pool de processos compartilhado para renderização dos boletins
+_executor_pdf: Optional[Executor] = None
+
+
+def obter_executor_pdf() -> Executor:
+    """Cria (uma única vez) o pool de workers de renderização"""
+    global _executor_pdf
+    
+    if _executor_pdf is None:
+        workers = ConfiguracaoSistema().workers_pdf
+        if workers > 0:
+            _executor_pdf = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_inicializar_worker_pdf
+            )
+        else:
+            # Sem processos extras: renderiza em thread, fora do event loop
+            _executor_pdf = ThreadPoolExecutor(max_workers=1, initializer=_inicializar_worker_pdf)
+    
+    return _executor_pdf
+
+
+def encerrar_executor_pdf():
+    """Encerra o pool de renderização (shutdown da aplicação)"""
+    global _executor_pdf
+    
+    if _executor_pdf is not None:
+        _executor_pdf.shutdown(wait=False, cancel_futures=True)
+        _executor_pdf = None
+
+
+def _inicializar_worker_pdf():
+    """Carrega logos e fontes uma vez por worker"""
+    obter_recursos()
+
+
+def _renderizar_lote(diretorio_cache: str, itens: List[Tuple[ResultadoCorrecao, int]], estatisticas: Any,
+                     impressao_turma: str, data_emissao: datetime) -> Tuple[List[PDFInfo], Optional[Dict[str, Any]]]:
+    """Renderiza um lote de boletins dentro de um worker (com as métricas acumuladas nele)"""
+    
+    gerador = GeradorPDF(diretorio_cache=diretorio_cache)
+    pdfs = [
+        gerador._gerar_pdf_individual(resultado, estatisticas, posicao, impressao_turma, data_emissao)
+        for resultado, posicao in itens
+    ]
+    
+    # Em processo separado as métricas voltam com o lote; em thread já estão no registro principal
+    metricas = registro_metricas.drenar() if multiprocessing.parent_process() is not None else None
+    return pdfs, metricas
+
+
+def _renderizar_consolidado(diretorio_cache: str, chave: str, turma: CorrecaoTurma, indices: np.ndarray,
+                            posicoes: np.ndarray, estatisticas: Any, data_emissao: datetime,
+                            titulo: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """Renderiza e grava (com o índice de páginas como anexo) um PDF consolidado dentro de um worker"""
+    
+    gerador = GeradorPDF(diretorio_cache=diretorio_cache)
+    conteudo, indice = gerador._criar_pdf_consolidado(turma, indices, posicoes, estatisticas, data_emissao, titulo)
+    caminho = gerador.cache.gravar(chave, conteudo, anexo=json.dumps(indice, ensure_ascii=False).encode('utf-8'))
+    
+    metricas = registro_metricas.drenar() if multiprocessing.parent_process() is not None else None
+    return caminho, metricas
+
+
+def _impressao_turma(turma: CorrecaoTurma) -> List[bytes]:
+    """Arrays da turma (alunos, gabarito e correção) como partes de uma chave de conteúdo"""
+    
+    partes = []
+    for nome, array in sorted(turma.para_arrays().items()):
+        partes.append(nome.encode('utf-8'))
+        partes.append(np.ascontiguousarray(array).tobytes())
+    return partes
+
+
+class _SaidaStream(RawIOBase):
+    """Destino não posicionável para o zipfile: acumula o que foi escrito até ser retirado"""
+    
+    def __init__(self):
+        self._partes: List[bytes] = []
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, dados) -> int:
+        self._partes.append(bytes(dados))
+        return len(dados)
+    
+    def retirar(self) -> Iterator[bytes]:
+        if self._partes:
+            dados = b"".join(self._partes)
+            self._partes.clear()
+            yield dados
+
 
 class GeradorPDF:
     """Classe para geração de PDFs dos boletins"""
     
-    def __init__(self):
+    def __init__(self, temp_dir: Optional[str] = None, diretorio_cache: Optional[str] = None):
         self.config = ConfiguracaoSistema()
-        self.temp_dir = tempfile.mkdtemp()
+        self._temp_dir = temp_dir
+        self.cache = CacheArtefatos(diretorio_cache or self.config.diretorio_artefatos)
+    
+    @property
+    def temp_dir(self) -> str:
+        """Diretório dos arquivos gerados (criado só quando algo for escrito)"""
+        if self._temp_dir is None:
+            self._temp_dir = tempfile.mkdtemp()
+        return self._temp_dir
+    
+    async def gerar_todos_pdfs_async(self, resultado_processamento: Dict[str, Any],
+                                     data_emissao: Optional[datetime] = None) -> List[PDFInfo]:
+        """Gera PDFs para todos os alunos no pool de workers"""
         
-        # URLs das logos (do GitHub)
-        self.logo_acafe_url = "https://raw.githubusercontent.com/JulioFloripa/CorretorACAFE/main/logo-acafe.png"
-        self.logo_fleming_url = "https://raw.githubusercontent.com/JulioFloripa/CorretorACAFE/main/logo_fleming.png"
+        pdfs_info = []
+        async for lote_pdfs in self.gerar_pdfs_stream(resultado_processamento, data_emissao):
+            pdfs_info.extend(lote_pdfs)
+        
+        return pdfs_info
     
-    async def gerar_todos_pdfs_async(self, resultado_processamento: Dict[str, Any] ) -> List[PDFInfo]:
-        """Gera PDFs para todos os alunos de forma assíncrona"""
+    async def gerar_pdfs_stream(self, resultado_processamento: Dict[str, Any],
+                                data_emissao: Optional[datetime] = None) -> AsyncIterator[List[PDFInfo]]:
+        """Distribui os boletins entre os workers e entrega cada lote assim que fica pronto"""
         
-        resultados = resultado_processamento["resultados"]
+        turma = resultado_processamento["turma"]
         estatisticas = resultado_processamento["estatisticas"]
         ranking = resultado_processamento["ranking"]
         
-        # Gerar PDFs em lotes
-        lote_size = 10
-        pdfs_info = []
+        # Data impressa no rodapé: fixa (saída determinística) ou a hora atual, ao minuto
+        data_emissao = (data_emissao or datetime.now()).replace(second=0, microsecond=0)
+        impressao_turma = chave_conteudo(json.dumps(jsonable_encoder(estatisticas), sort_keys=True))
         
-        for i in range(0, len(resultados), lote_size):
-            lote = resultados[i:i + lote_size]
-            lote_pdfs = await asyncio.gather(*[
-                self._gerar_pdf_individual_async(resultado, estatisticas, ranking)
-                for resultado in lote
-            ])
-            pdfs_info.extend(lote_pdfs)
+        processador = ProcessadorSimulado()
+        total = turma.alunos.total_alunos
+        lote_size = self.config.lote_pdfs
+        inicios = iter(range(0, total, lote_size))
         
-        return pdfs_info
+        def montar_lote(inicio: int) -> List[Tuple[ResultadoCorrecao, int]]:
+            # Objetos do boletim existem só para os lotes em andamento
+            return [
+                (processador.montar_resultado(turma, i), int(ranking.posicoes[i]))
+                for i in range(inicio, min(inicio + lote_size, total))
+            ]
+        
+        loop = asyncio.get_running_loop()
+        executor = obter_executor_pdf()
+        janela = max(2, 2 * self.config.workers_pdf)
+        pendentes = set()
+        
+        def enviar():
+            for inicio in inicios:
+                pendentes.add(loop.run_in_executor(
+                    executor, _renderizar_lote, self.cache.diretorio, montar_lote(inicio),
+                    estatisticas, impressao_turma, data_emissao
+                ))
+                if len(pendentes) >= janela:
+                    break
+        
+        try:
+            enviar()
+            while pendentes:
+                prontas, _ = await asyncio.wait(pendentes, return_when=asyncio.FIRST_COMPLETED)
+                pendentes.difference_update(prontas)
+                enviar()
+                for tarefa in prontas:
+                    pdfs, metricas = tarefa.result()
+                    registro_metricas.incorporar(metricas)
+                    yield pdfs
+        finally:
+            for tarefa in pendentes:
+                tarefa.cancel()
+    
+    async def gerar_consolidado(self, resultado_processamento: Dict[str, Any], indices: np.ndarray, titulo: str,
+                                data_emissao: Optional[datetime] = None) -> Tuple[str, Dict[str, Any]]:
+        """Boletins dos alunos indicados, na ordem dada, em um único PDF (ou o idêntico já gerado)
+        
+        Devolve o caminho do PDF e o índice de páginas de cada aluno.
+        """
+        
+        turma = resultado_processamento["turma"]
+        estatisticas = resultado_processamento["estatisticas"]
+        posicoes = resultado_processamento["ranking"].posicoes[indices]
+        
+        data_emissao = (data_emissao or datetime.now()).replace(second=0, microsecond=0)
+        chave = chave_conteudo(
+            "consolidado",
+            VERSAO_LAYOUT_BOLETIM,
+            obter_recursos().impressao,
+            json.dumps(jsonable_encoder(estatisticas), sort_keys=True),
+            *_impressao_turma(turma),
+            np.asarray(indices, dtype=np.int64).tobytes(),
+            np.asarray(posicoes, dtype=np.int64).tobytes(),
+            titulo,
+            data_emissao.isoformat()
+        )
+        
+        caminho = self.cache.obter(chave)
+        if caminho is None:
+            # Um documento só não se divide entre workers: ocupa um deles inteiro
+            loop = asyncio.get_running_loop()
+            caminho, metricas = await loop.run_in_executor(
+                obter_executor_pdf(), _renderizar_consolidado, self.cache.diretorio, chave, turma,
+                indices, posicoes, estatisticas, data_emissao, titulo
+            )
+            registro_metricas.incorporar(metricas)
+        
+        with open(self.cache.caminho_anexo(caminho), encoding='utf-8') as f:
+            indice = json.load(f)
+        return caminho, indice
     
-    async def _gerar_pdf_individual_async(self, resultado: ResultadoCorrecao, estatisticas: Any, ranking: List[Any]) -> PDFInfo:
-        """Gera PDF individual para um aluno"""
+    def _gerar_pdf_individual(self, resultado: ResultadoCorrecao, estatisticas: Any, posicao: int,
+                              impressao_turma: str = "", data_emissao: Optional[datetime] = None) -> PDFInfo:
+        """Gera PDF individual para um aluno (ou reaproveita o idêntico já gerado)"""
         
-        # Encontrar posição no ranking
-        posicao = next((i + 1 for i, r in enumerate(ranking) if r.id == resultado.aluno.id), 0)
+        data_emissao = data_emissao or datetime.now().replace(second=0, microsecond=0)
         
         # Nome do arquivo
         nome_arquivo = f"Boletim_{resultado.aluno.nome.replace(' ', '_')}.pdf"
-        caminho_pdf = os.path.join(self.temp_dir, nome_arquivo)
         
-        # Gerar PDF
-        await self._criar_pdf_boletim(resultado, estatisticas, posicao, caminho_pdf)
-        
-        # Obter tamanho do arquivo
-        tamanho_bytes = os.path.getsize(caminho_pdf)
+        # Mesmas entradas (e mesmas logos), mesmo boletim
+        chave = chave_conteudo(
+            VERSAO_LAYOUT_BOLETIM,
+            obter_recursos().impressao,
+            impressao_turma,
+            json.dumps(jsonable_encoder(resultado), sort_keys=True),
+            str(posicao),
+            data_emissao.isoformat()
+        )
+        caminho_pdf = self.cache.obter(chave)
+        if caminho_pdf is None:
+            caminho_pdf = self.cache.gravar(chave, self._criar_pdf_boletim(resultado, estatisticas, posicao, data_emissao))
+            PDFS_GERADOS.incrementar(origem="renderizado")
+        else:
+            PDFS_GERADOS.incrementar(origem="cache")
         
         return PDFInfo(
             aluno_id=resultado.aluno.id,
             nome_aluno=resultado.aluno.nome,
             nome_arquivo=nome_arquivo,
             caminho=caminho_pdf,
-            tamanho_bytes=tamanho_bytes
+            tamanho_bytes=os.path.getsize(caminho_pdf)
         )
     
-    async def _criar_pdf_boletim(self, resultado: ResultadoCorrecao, estatisticas: Any, posicao: int, caminho_pdf: str):
-        """Cria o PDF do boletim individual"""
+    @cronometrar("pdf")
+    def _criar_pdf_boletim(self, resultado: ResultadoCorrecao, estatisticas: Any, posicao: int,
+                           data_emissao: datetime) -> bytes:
+        """Cria o PDF do boletim individual, em memória"""
         
         pdf = FPDF()
+        pdf.set_creation_date(data_emissao)
+        self._desenhar_boletim(pdf, resultado, estatisticas, posicao, data_emissao)
+        
+        return bytes(pdf.output())
+    
+    @cronometrar("consolidado")
+    def _criar_pdf_consolidado(self, turma: CorrecaoTurma, indices: np.ndarray, posicoes: np.ndarray,
+                               estatisticas: Any, data_emissao: datetime, titulo: str) -> Tuple[bytes, Dict[str, Any]]:
+        """Boletins de vários alunos em um só documento: fontes e logos embutidas uma vez, um marcador por aluno"""
+        
+        processador = ProcessadorSimulado()
+        pdf = FPDF()
+        pdf.set_creation_date(data_emissao)
+        pdf.set_title(titulo)
+        pdf.page_mode = "USE_OUTLINES"
+        
+        alunos = []
+        for i, posicao in zip(indices, posicoes):
+            resultado = processador.montar_resultado(turma, int(i))
+            
+            # Cada boletim começa no estado gráfico de um documento novo (o rodapé deixa cores trocadas)
+            pdf.set_draw_color(0, 0, 0)
+            pdf.set_fill_color(0, 0, 0)
+            pdf.set_text_color(0, 0, 0)
+            
+            pagina_inicial = pdf.page + 1
+            marcador = f"{resultado.aluno.nome} ({int(posicao)}º)"
+            self._desenhar_boletim(pdf, resultado, estatisticas, int(posicao), data_emissao, marcador)
+            alunos.append({
+                "aluno_id": resultado.aluno.id,
+                "nome_aluno": resultado.aluno.nome,
+                "sede": resultado.aluno.sede,
+                "posicao": int(posicao),
+                "pagina_inicial": pagina_inicial,
+                "paginas": pdf.page - pagina_inicial + 1
+            })
+        
+        conteudo = bytes(pdf.output())
+        return conteudo, {"titulo": titulo, "total_paginas": pdf.page, "alunos": alunos}
+    
+    def _desenhar_boletim(self, pdf: FPDF, resultado: ResultadoCorrecao, estatisticas: Any, posicao: int,
+                          data_emissao: datetime, marcador: Optional[str] = None):
+        """Desenha o boletim de um aluno a partir de uma página nova"""
+        
         pdf.add_page()
-        pdf.set_font('Arial', 'B', 16)
+        if marcador:
+            pdf.start_section(marcador)
+        pdf.set_font('helvetica', 'B', 16)
         
         # Cabeçalho com logos
-        await self._adicionar_cabecalho(pdf)
+        self._adicionar_cabecalho(pdf)
         
         # Informações do aluno
         self._adicionar_info_aluno(pdf, resultado, posicao)
@@ -92,34 +337,34 @@ class GeradorPDF:
         # Desempenho por disciplina
         self._adicionar_desempenho_disciplinas(pdf, resultado)
         
-        # Gráfico de performance (se possível)
-        grafico_path = await self._gerar_grafico_performance(resultado)
-        if grafico_path:
-            self._adicionar_grafico(pdf, grafico_path)
+        # Gráfico de performance
+        self._adicionar_grafico(pdf, resultado)
         
         # Rodapé
-        self._adicionar_rodape(pdf)
-        
-        # Salvar PDF
-        pdf.output(caminho_pdf)
+        self._adicionar_rodape(pdf, data_emissao)
     
-    async def _adicionar_cabecalho(self, pdf: FPDF):
+    def _adicionar_cabecalho(self, pdf: FPDF):
         """Adiciona cabeçalho com logos"""
         
         # Fundo verde ACAFE
         pdf.set_fill_color(46, 125, 50)  # Verde ACAFE
         pdf.rect(10, 10, 190, 30, 'F')
         
+        # Logos nas laterais da faixa (decodificadas uma vez por worker)
+        recursos = obter_recursos()
+        recursos.imagem(pdf, 'acafe', 13, 13, 30, 24)
+        recursos.imagem(pdf, 'fleming', 167, 13, 30, 24)
+        
         # Título centralizado
         pdf.set_text_color(255, 255, 255)  # Branco
-        pdf.set_font('Arial', 'B', 18)
+        pdf.set_font('helvetica', 'B', 18)
         pdf.set_xy(10, 20)
-        pdf.cell(190, 10, 'SIMULADO ACAFE - COLEGIO FLEMING', 0, 1, 'C')
+        pdf.cell(190, 10, 'SIMULADO ACAFE - COLEGIO FLEMING', 0, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
         
         pdf.set_text_color(255, 255, 255)
-        pdf.set_font('Arial', '', 12)
+        pdf.set_font('helvetica', '', 12)
         pdf.set_xy(10, 30)
-        pdf.cell(190, 8, 'Sistema Inteligente de Correcao de Simulados', 0, 1, 'C')
+        pdf.cell(190, 8, 'Sistema Inteligente de Correcao de Simulados', 0, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
         
         # Reset cor do texto
         pdf.set_text_color(0, 0, 0)
@@ -128,35 +373,35 @@ class GeradorPDF:
     def _adicionar_info_aluno(self, pdf: FPDF, resultado: ResultadoCorrecao, posicao: int):
         """Adiciona informações básicas do aluno"""
         
-        pdf.set_font('Arial', 'B', 14)
-        pdf.cell(0, 10, 'INFORMACOES DO ALUNO', 0, 1, 'L')
+        pdf.set_font('helvetica', 'B', 14)
+        pdf.cell(0, 10, 'INFORMACOES DO ALUNO', 0, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
         pdf.ln(5)
         
         # Caixa com informações
         pdf.set_fill_color(240, 248, 255)  # Azul claro
         pdf.rect(10, pdf.get_y(), 190, 25, 'F')
         
-        pdf.set_font('Arial', '', 12)
+        pdf.set_font('helvetica', '', 12)
         y_start = pdf.get_y() + 5
         
         pdf.set_xy(15, y_start)
-        pdf.cell(0, 6, f'Nome: {resultado.aluno.nome}', 0, 1, 'L')
+        pdf.cell(0, 6, f'Nome: {resultado.aluno.nome}', 0, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
         
         pdf.set_xy(15, y_start + 8)
-        pdf.cell(90, 6, f'ID: {resultado.aluno.id}', 0, 0, 'L')
-        pdf.cell(90, 6, f'Posicao no Ranking: {posicao}', 0, 1, 'L')
+        pdf.cell(90, 6, f'ID: {resultado.aluno.id}', 0, align='L')
+        pdf.cell(90, 6, f'Posicao no Ranking: {posicao}', 0, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
         
         if resultado.aluno.sede:
             pdf.set_xy(15, y_start + 16)
-            pdf.cell(0, 6, f'Sede: {resultado.aluno.sede}', 0, 1, 'L')
+            pdf.cell(0, 6, f'Sede: {resultado.aluno.sede}', 0, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
         
         pdf.ln(15)
     
     def _adicionar_resumo_performance(self, pdf: FPDF, resultado: ResultadoCorrecao, estatisticas: Any):
         """Adiciona resumo de performance"""
         
-        pdf.set_font('Arial', 'B', 14)
-        pdf.cell(0, 10, 'RESUMO DE PERFORMANCE', 0, 1, 'L')
+        pdf.set_font('helvetica', 'B', 14)
+        pdf.cell(0, 10, 'RESUMO DE PERFORMANCE', 0, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
         pdf.ln(5)
         
         # Determinar cor baseada na performance
@@ -179,15 +424,15 @@ class GeradorPDF:
         pdf.rect(10, pdf.get_y(), 190, 20, 'F')
         
         pdf.set_text_color(255, 255, 255)
-        pdf.set_font('Arial', 'B', 16)
+        pdf.set_font('helvetica', 'B', 16)
         pdf.set_xy(15, pdf.get_y() + 6)
-        pdf.cell(0, 8, f'NOTA: {nota:.1f}% - {status}', 0, 1, 'C')
+        pdf.cell(0, 8, f'NOTA: {nota:.1f}% - {status}', 0, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
         
         pdf.set_text_color(0, 0, 0)
         pdf.ln(10)
         
         # Detalhes
-        pdf.set_font('Arial', '', 11)
+        pdf.set_font('helvetica', '', 11)
         total_questoes = resultado.acertos + resultado.erros
         
         detalhes = [
@@ -198,19 +443,19 @@ class GeradorPDF:
         ]
         
         for detalhe in detalhes:
-            pdf.cell(0, 6, detalhe, 0, 1, 'L')
+            pdf.cell(0, 6, detalhe, 0, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
         
         pdf.ln(10)
     
     def _adicionar_desempenho_disciplinas(self, pdf: FPDF, resultado: ResultadoCorrecao):
         """Adiciona tabela de desempenho por disciplina"""
         
-        pdf.set_font('Arial', 'B', 14)
-        pdf.cell(0, 10, 'DESEMPENHO POR DISCIPLINA', 0, 1, 'L')
+        pdf.set_font('helvetica', 'B', 14)
+        pdf.cell(0, 10, 'DESEMPENHO POR DISCIPLINA', 0, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
         pdf.ln(5)
         
         # Cabeçalho da tabela
-        pdf.set_font('Arial', 'B', 10)
+        pdf.set_font('helvetica', 'B', 10)
         pdf.set_fill_color(46, 125, 50)  # Verde ACAFE
         pdf.set_text_color(255, 255, 255)
         
@@ -220,11 +465,11 @@ class GeradorPDF:
         x_start = 10
         for i, header in enumerate(headers):
             pdf.set_xy(x_start + sum(col_widths[:i]), pdf.get_y())
-            pdf.cell(col_widths[i], 8, header, 1, 0, 'C', True)
+            pdf.cell(col_widths[i], 8, header, 1, align='C', fill=True)
         
         pdf.ln(8)
         pdf.set_text_color(0, 0, 0)
-        pdf.set_font('Arial', '', 9)
+        pdf.set_font('helvetica', '', 9)
         
         # Dados das disciplinas
         for disciplina, stats in resultado.desempenho_por_disciplina.items():
@@ -253,92 +498,130 @@ class GeradorPDF:
             
             for i, dado in enumerate(dados):
                 pdf.set_xy(x_start + sum(col_widths[:i]), pdf.get_y())
-                pdf.cell(col_widths[i], 6, dado, 1, 0, 'C', True)
+                pdf.cell(col_widths[i], 6, dado, 1, align='C', fill=True)
             
             pdf.ln(6)
         
         pdf.set_text_color(0, 0, 0)
         pdf.ln(10)
     
-    async def _gerar_grafico_performance(self, resultado: ResultadoCorrecao) -> str:
-        """Gera gráfico de performance por disciplina"""
+    @cronometrar("grafico")
+    def _adicionar_grafico(self, pdf: FPDF, resultado: ResultadoCorrecao):
+        """Desenha o gráfico de desempenho por disciplina com primitivas vetoriais"""
+        
+        altura = 85  # Área total do gráfico (mm)
         
         try:
-            # Configurar estilo
-            plt.style.use('default')
-            fig, ax = plt.subplots(figsize=(8, 5))
-            
-            # Dados para o gráfico
-            disciplinas = []
-            percentuais = []
-            cores = []
-            
-            for disciplina, stats in resultado.desempenho_por_disciplina.items():
-                disciplinas.append(disciplina[:15])  # Limitar nome
-                percentual = stats['percentual']
-                percentuais.append(percentual)
-                
-                # Cor baseada na performance
-                if percentual >= 70:
-                    cores.append('#2E7D32')  # Verde ACAFE
-                elif percentual >= 50:
-                    cores.append('#FF9800')  # Laranja
-                else:
-                    cores.append('#F44336')  # Vermelho
-            
-            # Criar gráfico de barras
-            bars = ax.bar(disciplinas, percentuais, color=cores, alpha=0.8)
-            
-            # Personalizar gráfico
-            ax.set_ylabel('Percentual de Acertos (%)', fontsize=12)
-            ax.set_title(f'Desempenho por Disciplina - {resultado.aluno.nome}', fontsize=14, fontweight='bold')
-            ax.set_ylim(0, 100)
-            
-            # Adicionar valores nas barras
-            for bar, percentual in zip(bars, percentuais):
-                height = bar.get_height()
-                ax.text(bar.get_x() + bar.get_width()/2., height + 1,
-                       f'{percentual:.1f}%', ha='center', va='bottom', fontsize=10)
-            
-            # Linha da média (70%)
-            ax.axhline(y=70, color='red', linestyle='--', alpha=0.7, label='Meta (70%)')
-            ax.legend()
-            
-            # Rotacionar labels do eixo x
-            plt.xticks(rotation=45, ha='right')
-            plt.tight_layout()
+            # Verificar se há espaço suficiente
+            if pdf.get_y() + 15 + altura > pdf.h - 35:
+                pdf.add_page()
             
-            # Salvar gráfico
-            grafico_path = os.path.join(self.temp_dir, f'grafico_{resultado.aluno.id}.png')
-            plt.savefig(grafico_path, dpi=150, bbox_inches='tight')
-            plt.close()
+            pdf.set_font('helvetica', 'B', 14)
+            pdf.cell(0, 10, 'GRAFICO DE DESEMPENHO', 0, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
+            pdf.ln(5)
             
-            return grafico_path
+            self._desenhar_barras(pdf, resultado, 10, pdf.get_y(), 190, altura)
+            pdf.set_y(pdf.get_y() + altura + 5)  # Espaço após o gráfico
             
         except Exception as e:
-            print(f"Erro ao gerar gráfico: {e}")
-            return None
+            logger.warning(f"Erro ao adicionar gráfico ao PDF: {e}")
     
-    def _adicionar_grafico(self, pdf: FPDF, grafico_path: str):
-        """Adiciona gráfico ao PDF"""
+    def _desenhar_barras(self, pdf: FPDF, resultado: ResultadoCorrecao, x: float, y: float, largura: float, altura: float):
+        """Gráfico de barras (percentual por disciplina) com meta de 70%"""
         
-        try:
-            # Verificar se há espaço suficiente
-            if pdf.get_y() > 200:
-                pdf.add_page()
+        # Dados para o gráfico
+        disciplinas = []
+        percentuais = []
+        cores = []
+        
+        for disciplina, stats in resultado.desempenho_por_disciplina.items():
+            disciplinas.append(disciplina[:15])  # Limitar nome
+            percentual = stats['percentual']
+            percentuais.append(percentual)
             
-            pdf.set_font('Arial', 'B', 14)
-            pdf.cell(0, 10, 'GRAFICO DE DESEMPENHO', 0, 1, 'L')
-            pdf.ln(5)
+            # Cor baseada na performance
+            if percentual >= 70:
+                cores.append((46, 125, 50))  # Verde ACAFE
+            elif percentual >= 50:
+                cores.append((255, 152, 0))  # Laranja
+            else:
+                cores.append((244, 67, 54))  # Vermelho
+        
+        # Área de plotagem (espaço para título, eixo Y e rótulos inclinados)
+        esquerda = x + 20
+        direita = x + largura - 5
+        topo = y + 10
+        base = y + altura - 22
+        escala = (base - topo) / 100
+        
+        # Título
+        pdf.set_text_color(0, 0, 0)
+        pdf.set_font('helvetica', 'B', 11)
+        pdf.set_xy(x, y)
+        pdf.cell(largura, 6, f'Desempenho por Disciplina - {resultado.aluno.nome}', 0, align='C')
+        
+        # Eixo Y: marcas de 0 a 100 e rótulo
+        pdf.set_draw_color(0, 0, 0)
+        pdf.set_line_width(0.2)
+        pdf.set_font('helvetica', '', 7)
+        for marca in range(0, 101, 20):
+            y_marca = base - marca * escala
+            pdf.line(esquerda - 1.5, y_marca, esquerda, y_marca)
+            texto = str(marca)
+            pdf.text(esquerda - 2.5 - pdf.get_string_width(texto), y_marca + 1, texto)
+        
+        rotulo_y = 'Percentual de Acertos (%)'
+        pdf.set_font('helvetica', '', 8)
+        centro_y = (topo + base) / 2
+        with pdf.rotation(90, x + 8, centro_y):
+            pdf.text(x + 8 - pdf.get_string_width(rotulo_y) / 2, centro_y, rotulo_y)
+        
+        # Moldura da área de plotagem
+        pdf.rect(esquerda, topo, direita - esquerda, base - topo)
+        
+        # Barras (largura de 80% da faixa de cada disciplina)
+        if disciplinas:
+            faixa = (direita - esquerda) / len(disciplinas)
+            largura_barra = faixa * 0.8
             
-            # Adicionar imagem
-            pdf.image(grafico_path, x=10, y=pdf.get_y(), w=190)
-            pdf.ln(100)  # Espaço após o gráfico
+            for i, (disciplina, percentual, cor) in enumerate(zip(disciplinas, percentuais, cores)):
+                centro = esquerda + faixa * (i + 0.5)
+                altura_barra = percentual * escala
+                
+                with pdf.local_context(fill_opacity=0.8):
+                    pdf.set_fill_color(*cor)
+                    pdf.rect(centro - largura_barra / 2, base - altura_barra, largura_barra, altura_barra, 'F')
+                
+                # Valor acima da barra
+                pdf.set_font('helvetica', '', 7)
+                valor = f'{percentual:.1f}%'
+                pdf.text(centro - pdf.get_string_width(valor) / 2, base - altura_barra - 1, valor)
+                
+                # Rótulo do eixo X, inclinado 45 graus e alinhado à direita
+                pdf.line(centro, base, centro, base + 1.5)
+                pdf.set_font('helvetica', '', 7)
+                with pdf.rotation(45, centro, base + 3):
+                    pdf.text(centro - pdf.get_string_width(disciplina), base + 3, disciplina)
+        
+        # Linha da meta (70%)
+        y_meta = base - 70 * escala
+        with pdf.local_context(stroke_opacity=0.7):
+            pdf.set_draw_color(255, 0, 0)
+            pdf.set_line_width(0.4)
+            pdf.set_dash_pattern(dash=2, gap=1.2)
+            pdf.line(esquerda, y_meta, direita, y_meta)
             
-        except Exception as e:
-            print(f"Erro ao adicionar gráfico ao PDF: {e}")
+            # Legenda
+            pdf.line(direita - 27, topo + 4, direita - 20, topo + 4)
+            pdf.set_dash_pattern()
+        
+        pdf.set_font('helvetica', '', 7)
+        pdf.text(direita - 18, topo + 5, 'Meta (70%)')
+        
+        pdf.set_draw_color(0, 0, 0)
+        pdf.set_line_width(0.2)
     
-    def _adicionar_rodape(self, pdf: FPDF):
+    def _adicionar_rodape(self, pdf: FPDF, data_emissao: datetime):
         """Adiciona rodapé ao PDF"""
         
         # Posicionar no final da página
@@ -350,29 +633,47 @@ class GeradorPDF:
         pdf.ln(5)
         
         # Texto do rodapé
-        pdf.set_font('Arial', 'I', 8)
+        pdf.set_font('helvetica', 'I', 8)
         pdf.set_text_color(128, 128, 128)  # Cinza
         
-        data_geracao = datetime.now().strftime("%d/%m/%Y às %H:%M")
+        data_geracao = data_emissao.strftime("%d/%m/%Y às %H:%M")
         rodape_texto = f'Boletim gerado em {data_geracao} | Corretor ACAFE Fleming v2.0 | Logos Oficiais'
         
-        pdf.cell(0, 5, rodape_texto, 0, 1, 'C')
+        pdf.cell(0, 5, rodape_texto, 0, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
     
-    async def criar_zip_pdfs(self, pdfs_info: List[PDFInfo]) -> str:
-        """Cria arquivo ZIP com todos os PDFs"""
-        
-        zip_path = os.path.join(self.temp_dir, 'boletins_simulado.zip')
-        
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+    def stream_zip_pdfs(self, pdfs_info: List[PDFInfo], compressao: int = zipfile.ZIP_STORED,
+                        tamanho_bloco: int = 64 * 1024) -> Iterator[bytes]:
+        """Monta o ZIP com todos os PDFs em pedaços, à medida que lê cada arquivo"""
+        
+        # PDFs já são comprimidos: por padrão as entradas são só armazenadas
+        # (a duração medida inclui a espera pelo cliente que consome o stream)
+        inicio = time.perf_counter()
+        saida = _SaidaStream()
+        with zipfile.ZipFile(saida, 'w', compressao) as zipf:
             for pdf_info in pdfs_info:
-                if os.path.exists(pdf_info.caminho):
-                    zipf.write(pdf_info.caminho, pdf_info.nome_arquivo)
-        
-        return zip_path
+                if not os.path.exists(pdf_info.caminho):
+                    continue
+                
+                info = zipfile.ZipInfo.from_file(pdf_info.caminho, pdf_info.nome_arquivo)
+                info.compress_type = compressao
+                with open(pdf_info.caminho, 'rb') as origem, zipf.open(info, 'w') as destino:
+                    while True:
+                        bloco = origem.read(tamanho_bloco)
+                        if not bloco:
+                            break
+                        destino.write(bloco)
+                        yield from saida.retirar()
+                yield from saida.retirar()
+        
+        # Diretório central do ZIP
+        yield from saida.retirar()
+        DURACAO_ETAPAS.observar(time.perf_counter() - inicio, etapa="zip")
     
     def criar_template_excel(self) -> str:
         """Cria template Excel para download"""
         
+        import openpyxl
+        
         template_path = os.path.join(self.temp_dir, 'template_simulado_acafe.xlsx')
         
         # Criar workbook
@@ -401,6 +702,8 @@ class GeradorPDF:
     def _criar_aba_respostas(self, ws):
         """Cria aba RESPOSTAS do template"""
         
+        from openpyxl.styles import Font, PatternFill, Alignment
+        
         # Cabeçalhos
         headers = ['ID', 'Nome', 'Sede', 'Idioma escolhido']
         
@@ -439,6 +742,8 @@ class GeradorPDF:
     def _criar_aba_gabarito(self, ws):
         """Cria aba GABARITO do template"""
         
+        from openpyxl.styles import Font, PatternFill, Alignment
+        
         # Cabeçalhos
         headers = ['Questão', 'Disciplina', 'Resposta']
         
@@ -490,6 +795,8 @@ class GeradorPDF:
     def _criar_aba_instrucoes(self, ws):
         """Cria aba INSTRUÇÕES do template"""
         
+        from openpyxl.styles import Font, PatternFill
+        
         instrucoes = [
             "INSTRUÇÕES PARA USO DO TEMPLATE SIMULADO ACAFE",
             "",
@@ -535,20 +842,3 @@ class GeradorPDF:
         
         # Ajustar largura
         ws.column_dimensions['A'].width = 80
-    
-    async def limpar_arquivos_temporarios(self, pdfs_info: List[PDFInfo]):
-        """Limpa arquivos temporários"""
-        
-        try:
-            # Remover PDFs individuais
-            for pdf_info in pdfs_info:
-                if os.path.exists(pdf_info.caminho):
-                    os.remove(pdf_info.caminho)
-            
-            # Remover gráficos
-            for arquivo in os.listdir(self.temp_dir):
-                if arquivo.startswith('grafico_') and arquivo.endswith('.png'):
-                    os.remove(os.path.join(self.temp_dir, arquivo))
-            
-        except Exception as e:
-            print(f"Erro ao limpar arquivos temporários: {e}")
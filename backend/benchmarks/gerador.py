@@ -0,0 +1,116 @@
+"""Gerador de planilhas sintéticas de simulado ACAFE (mesmo layout do template)
+
+    python -m benchmarks.gerador 10000 simulado_10k.xlsx
+"""
+
+import io
+import sys
+from typing import BinaryIO, List, Optional, Union
+
+import numpy as np
+from openpyxl import Workbook
+
+DISCIPLINAS = [
+    'Biologia', 'Química', 'Física', 'Matemática',
+    'História', 'Geografia', 'Língua Portuguesa e Literatura'
+]
+SEDES = ['Unidade Centro', 'Unidade Norte', 'Unidade Sul', 'Unidade Continente', 'Unidade Joinville', 'Unidade Blumenau']
+ALTERNATIVAS = np.array(list('ABCDE'), dtype=object)
+
+TOTAL_QUESTOES = 70
+# Questões de língua estrangeira: uma versão em Inglês e outra em Espanhol
+QUESTOES_LINGUA = range(57, 64)
+
+# Proporções de marcações fora do padrão
+FRACAO_BRANCO = 0.03
+FRACAO_INVALIDA = 0.01
+FRACAO_MINUSCULA = 0.02
+MARCAS_INVALIDAS = np.array(['AB', 'X', '*', 'F'], dtype=object)
+
+
+def gerar_gabarito(rng: np.random.Generator) -> List[List]:
+    """Linhas da aba GABARITO: 70 questões mais as versões em Espanhol das questões de língua"""
+
+    linhas = []
+    for questao in range(1, TOTAL_QUESTOES + 1):
+        if questao in QUESTOES_LINGUA:
+            disciplina = 'Inglês'
+        elif questao > QUESTOES_LINGUA[-1]:
+            disciplina = 'Espanhol'
+        else:
+            disciplina = DISCIPLINAS[(questao - 1) % len(DISCIPLINAS)]
+        linhas.append([questao, disciplina, str(rng.choice(ALTERNATIVAS))])
+
+    for questao in QUESTOES_LINGUA:
+        linhas.append([questao, 'Espanhol', str(rng.choice(ALTERNATIVAS))])
+
+    return linhas
+
+
+def gerar_respostas(total_alunos: int, gabarito: List[List], rng: np.random.Generator) -> List[List]:
+    """Linhas da aba RESPOSTAS com proficiência e dificuldade variáveis (modelo logístico)"""
+
+    idiomas = rng.choice(np.array(['Inglês', 'Espanhol', 'inglês', 'Ingles', None], dtype=object),
+                         size=total_alunos, p=[0.55, 0.38, 0.03, 0.02, 0.02])
+    espanhol = np.array([idioma == 'Espanhol' for idioma in idiomas])
+
+    # Chave de cada aluno por questão (trilha de Espanhol nas questões de língua), como índice em A-E
+    indice = {alternativa: i for i, alternativa in enumerate(ALTERNATIVAS)}
+    chaves_ingles = {q: indice[r] for q, d, r in gabarito if d != 'Espanhol' or q not in QUESTOES_LINGUA}
+    chaves_espanhol = {q: indice[r] for q, d, r in gabarito if d == 'Espanhol'}
+    chaves = np.tile([chaves_ingles[q] for q in range(1, TOTAL_QUESTOES + 1)], (total_alunos, 1))
+    for q in QUESTOES_LINGUA:
+        chaves[espanhol, q - 1] = chaves_espanhol[q]
+
+    # Probabilidade de acerto: proficiência do aluno contra dificuldade do item
+    proficiencia = rng.normal(0.0, 1.0, size=(total_alunos, 1))
+    dificuldade = rng.normal(0.3, 0.8, size=(1, TOTAL_QUESTOES))
+    acertou = rng.random((total_alunos, TOTAL_QUESTOES)) < 1 / (1 + np.exp(dificuldade - 1.2 * proficiencia))
+    erradas = (chaves + rng.integers(1, len(ALTERNATIVAS), size=chaves.shape)) % len(ALTERNATIVAS)
+    respostas = ALTERNATIVAS[np.where(acertou, chaves, erradas)]
+
+    sorteio = rng.random((total_alunos, TOTAL_QUESTOES))
+    minusculas = sorteio < FRACAO_MINUSCULA
+    respostas[minusculas] = [r.lower() for r in respostas[minusculas]]
+    invalidas = (sorteio >= FRACAO_MINUSCULA) & (sorteio < FRACAO_MINUSCULA + FRACAO_INVALIDA)
+    respostas[invalidas] = rng.choice(MARCAS_INVALIDAS, size=int(invalidas.sum()))
+    respostas[sorteio >= 1 - FRACAO_BRANCO] = None
+
+    sedes = rng.choice(np.array(SEDES, dtype=object), size=total_alunos)
+    linhas = []
+    for i in range(total_alunos):
+        linhas.append([2024000000 + i, f'Aluno {i:06d}', sedes[i], idiomas[i]] + respostas[i].tolist())
+    return linhas
+
+
+def gerar_planilha(total_alunos: int, destino: Optional[Union[str, BinaryIO]] = None, semente: int = 2024) -> bytes:
+    """Planilha completa (RESPOSTAS, GABARITO, INSTRUÇÕES); devolve os bytes se não houver destino"""
+
+    rng = np.random.default_rng(semente)
+    gabarito = gerar_gabarito(rng)
+
+    # Modo write-only: memória constante mesmo com dezenas de milhares de linhas
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('RESPOSTAS')
+    ws.append(['ID', 'Nome', 'Sede', 'Idioma escolhido'] + [f'Questão {q:02d}' for q in range(1, TOTAL_QUESTOES + 1)])
+    for linha in gerar_respostas(total_alunos, gabarito, rng):
+        ws.append(linha)
+
+    ws = wb.create_sheet('GABARITO')
+    ws.append(['Questão', 'Disciplina', 'Resposta'])
+    for linha in gabarito:
+        ws.append(linha)
+
+    ws = wb.create_sheet('INSTRUÇÕES')
+    ws.append(['Planilha sintética gerada para benchmark'])
+
+    saida = destino if destino is not None else io.BytesIO()
+    wb.save(saida)
+    return saida.getvalue() if destino is None else b''
+
+
+if __name__ == '__main__':
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    caminho = sys.argv[2] if len(sys.argv) > 2 else f'simulado_{total}.xlsx'
+    gerar_planilha(total, caminho)
+    print(f'{caminho}: {total} alunos')
@@ -0,0 +1,139 @@
+"""Tempo de cold start da API: importação de app.main e startup até a primeira resposta
+
+    python -m benchmarks.inicializacao                  # mede e imprime o JSON
+    python -m benchmarks.inicializacao --gravar         # atualiza benchmarks/baselines/inicializacao.json
+    python -m benchmarks.inicializacao --comparar       # falha se a inicialização regrediu
+
+Cada repetição roda em um interpretador novo (nada já importado); a mediana vai
+para o JSON. Falha também, com ou sem baseline, se a importação de app.main
+carregar algum módulo que só os relatórios usam (fpdf, openpyxl...).
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .pipeline import DIRETORIO_BASELINES, ambiente
+
+# Cold start mais lento que baseline * tolerância conta como regressão
+TOLERANCIA_PADRAO = 1.25
+# Diferenças menores que isso são ruído de medição (o startup leva poucos ms)
+MINIMO_DIFERENCA_SEGUNDOS = 0.05
+
+# Carregados sob demanda (ou pelo aquecimento em segundo plano), nunca ao importar app.main
+MODULOS_SOB_DEMANDA = ("app.utils", "app.recursos", "fpdf", "openpyxl", "matplotlib", "seaborn")
+
+DIRETORIO_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Executado em um processo novo; imprime as medidas como JSON
+SCRIPT_MEDICAO = """
+import json, sys, time
+inicio = time.perf_counter()
+import app.main
+importacao = time.perf_counter() - inicio
+carregados = [m for m in {modulos!r} if m in sys.modules]
+
+from fastapi.testclient import TestClient
+inicio = time.perf_counter()
+with TestClient(app.main.app) as cliente:
+    cliente.get("/health").raise_for_status()
+    startup = time.perf_counter() - inicio
+print(json.dumps({{"importacao": importacao, "startup": startup, "carregados": carregados}}))
+"""
+
+
+def medir_processo(diretorio: str) -> Dict[str, Any]:
+    """Uma inicialização completa em um interpretador novo"""
+
+    # Banco e cache descartáveis: app.main cria os dois ao ser importado
+    env = dict(os.environ, CORRETOR_BANCO=os.path.join(diretorio, "corretor.db"),
+               CORRETOR_ARTEFATOS=os.path.join(diretorio, "artefatos"))
+    saida = subprocess.run(
+        [sys.executable, "-c", SCRIPT_MEDICAO.format(modulos=MODULOS_SOB_DEMANDA)],
+        cwd=DIRETORIO_BACKEND, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+def executar(repeticoes: int = 7) -> Dict[str, Any]:
+    """Mede `repeticoes` inicializações e resume cada etapa pela mediana"""
+
+    medidas = []
+    with tempfile.TemporaryDirectory() as diretorio:
+        for _ in range(repeticoes):
+            medidas.append(medir_processo(tempfile.mkdtemp(dir=diretorio)))
+
+    etapas = {}
+    for nome in ("importacao", "startup"):
+        tempos = [medida[nome] for medida in medidas]
+        etapas[nome] = {
+            "segundos": round(statistics.median(tempos), 6),
+            "segundos_min": round(min(tempos), 6),
+            "repeticoes": repeticoes
+        }
+        print(f"  {nome:<14} {etapas[nome]['segundos'] * 1000:10.1f} ms", file=sys.stderr)
+
+    return {
+        "gerado_em": datetime.now().isoformat(timespec='seconds'),
+        "ambiente": ambiente(),
+        "modulos_carregados": sorted({m for medida in medidas for m in medida["carregados"]}),
+        "etapas": etapas
+    }
+
+
+def comparar(atual: Dict[str, Any], baseline: Dict[str, Any], tolerancia: float) -> List[str]:
+    """Etapas da inicialização mais lentas que baseline * tolerância"""
+
+    regressoes = []
+    for nome, medida in atual["etapas"].items():
+        referencia = baseline["etapas"].get(nome)
+        if referencia is None:
+            continue
+        antes, depois = referencia["segundos"], medida["segundos"]
+        if depois > antes * tolerancia and depois - antes > MINIMO_DIFERENCA_SEGUNDOS:
+            regressoes.append(f"inicialização, {nome}: {antes * 1000:.1f} ms -> {depois * 1000:.1f} ms")
+    return regressoes
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticoes', type=int, default=7)
+    parser.add_argument('--gravar', action='store_true', help='grava o resultado como baseline')
+    parser.add_argument('--comparar', action='store_true', help='compara com a baseline gravada')
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_PADRAO)
+    parser.add_argument('--baselines', default=DIRETORIO_BASELINES)
+    args = parser.parse_args(argv)
+
+    resultado = executar(args.repeticoes)
+
+    regressoes = [
+        f"app.main importa {modulo} (deveria ser carregado sob demanda)"
+        for modulo in resultado["modulos_carregados"]
+    ]
+
+    caminho = os.path.join(args.baselines, 'inicializacao.json')
+    if args.comparar and os.path.exists(caminho):
+        with open(caminho, encoding='utf-8') as f:
+            regressoes.extend(comparar(resultado, json.load(f), args.tolerancia))
+
+    if args.gravar:
+        os.makedirs(args.baselines, exist_ok=True)
+        with open(caminho, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+    else:
+        print(json.dumps(resultado, ensure_ascii=False))
+
+    for regressao in regressoes:
+        print(f"REGRESSÃO {regressao}", file=sys.stderr)
+    return 1 if regressoes else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""Tempo de cada etapa do pipeline, do Excel ao ZIP de boletins
+
+    python -m benchmarks.pipeline                          # 100, 1k, 10k e 50k alunos
+    python -m benchmarks.pipeline -n 1000 --sem-pdfs       # só as etapas rápidas
+    python -m benchmarks.pipeline --gravar                 # atualiza benchmarks/baselines
+    python -m benchmarks.pipeline --comparar               # falha se alguma etapa regrediu
+
+Cada etapa roda isolada, sobre a saída da anterior; a mediana de `--repeticoes`
+execuções vai para o JSON. O lote de PDFs usa um cache de boletins vazio a cada
+execução (senão mediria só o reaproveitamento).
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import statistics
+import tempfile
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.leitura import LeitorPlanilha
+from app.services import ProcessadorSimulado
+from app.utils import GeradorPDF, encerrar_executor_pdf
+
+from .gerador import gerar_planilha
+
+TAMANHOS_PADRAO = [100, 1000, 10000, 50000]
+DIRETORIO_BASELINES = os.path.join(os.path.dirname(__file__), 'baselines')
+
+# Etapas mais lentas que baseline * tolerância contam como regressão
+TOLERANCIA_PADRAO = 1.5
+# Abaixo disso a variação é ruído de medição
+MINIMO_SEGUNDOS_COMPARACAO = 0.005
+
+DATA_EMISSAO = datetime(2024, 1, 1, 12, 0)
+
+
+def medir(funcao: Callable[[], Any], repeticoes: int) -> Dict[str, Any]:
+    """Executa `repeticoes` vezes; devolve os tempos e o resultado da última"""
+
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return {"tempos": tempos, "resultado": resultado}
+
+
+def executar(total_alunos: int, repeticoes: int = 3, pdfs: bool = True) -> Dict[str, Any]:
+    """Mede todas as etapas para uma turma sintética de `total_alunos`"""
+
+    planilha = gerar_planilha(total_alunos)
+    processador = ProcessadorSimulado()
+    leitor = LeitorPlanilha()
+    etapas: Dict[str, Dict[str, Any]] = {}
+
+    def etapa(nome: str, funcao: Callable[[], Any], vezes: int = repeticoes, itens: int = total_alunos):
+        medida = medir(funcao, vezes)
+        tempos = medida["tempos"]
+        mediana = statistics.median(tempos)
+        etapas[nome] = {
+            "segundos": round(mediana, 6),
+            "segundos_min": round(min(tempos), 6),
+            "repeticoes": vezes,
+            "itens": itens,
+            "itens_por_segundo": round(itens / mediana, 1) if mediana > 0 else None
+        }
+        print(f"  {nome:<14} {mediana * 1000:10.1f} ms  ({itens} itens)", file=sys.stderr)
+        return medida["resultado"]
+
+    dados = etapa("leitura", lambda: leitor.ler(io.BytesIO(planilha), 'benchmark.xlsx'))
+    etapa("validacao", lambda: processador.validar_estrutura(dados))
+
+    entrada = etapa("preparacao", lambda: processador.compilar_entrada(dados))
+    turma = etapa("correcao", lambda: processador._processar_correcao(entrada))
+    ranking = etapa("ranking", lambda: processador._gerar_ranking(turma))
+    estatisticas = etapa("estatisticas", lambda: processador._calcular_estatisticas(turma, ranking))
+
+    gerador = GeradorPDF()
+    primeiro = int(ranking.ordem[0])
+    etapa("boletim", lambda: gerador._criar_pdf_boletim(
+        processador.montar_resultado(turma, primeiro), estatisticas, int(ranking.posicoes[primeiro]), DATA_EMISSAO
+    ), itens=1)
+
+    if pdfs:
+        resultado = {"turma": turma, "estatisticas": estatisticas, "ranking": ranking}
+
+        with tempfile.TemporaryDirectory() as diretorio:
+            def lote_pdfs():
+                # Cache novo a cada execução: mede a renderização, não o reaproveitamento
+                cache = tempfile.mkdtemp(dir=diretorio)
+                return asyncio.run(
+                    GeradorPDF(temp_dir=diretorio, diretorio_cache=cache)
+                    .gerar_todos_pdfs_async(resultado, DATA_EMISSAO)
+                )
+
+            pdfs_info = etapa("pdfs", lote_pdfs, vezes=1)
+            bytes_pdfs = sum(info.tamanho_bytes for info in pdfs_info)
+
+            def montar_zip():
+                return sum(len(bloco) for bloco in gerador.stream_zip_pdfs(pdfs_info))
+
+            bytes_zip = etapa("zip", montar_zip, itens=len(pdfs_info))
+        etapas["pdfs"]["bytes"] = bytes_pdfs
+        etapas["zip"]["bytes"] = bytes_zip
+
+    return {
+        "alunos": total_alunos,
+        "bytes_planilha": len(planilha),
+        "gerado_em": datetime.now().isoformat(timespec='seconds'),
+        "ambiente": ambiente(),
+        "etapas": etapas
+    }
+
+
+def ambiente() -> Dict[str, Any]:
+    """Máquina e versões usadas na medição (tempos só são comparáveis no mesmo ambiente)"""
+
+    return {
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "workers_pdf": GeradorPDF().config.workers_pdf
+    }
+
+
+def caminho_baseline(total_alunos: int, diretorio: str = DIRETORIO_BASELINES) -> str:
+    return os.path.join(diretorio, f'alunos_{total_alunos}.json')
+
+
+def comparar(atual: Dict[str, Any], baseline: Dict[str, Any], tolerancia: float) -> List[str]:
+    """Etapas que ficaram mais lentas que baseline * tolerância"""
+
+    regressoes = []
+    for nome, medida in atual["etapas"].items():
+        referencia = baseline["etapas"].get(nome)
+        if referencia is None:
+            continue
+        antes, depois = referencia["segundos"], medida["segundos"]
+        if depois > MINIMO_SEGUNDOS_COMPARACAO and depois > antes * tolerancia:
+            regressoes.append(f"{atual['alunos']} alunos, {nome}: {antes * 1000:.1f} ms -> {depois * 1000:.1f} ms")
+    return regressoes
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--alunos', type=int, nargs='+', default=TAMANHOS_PADRAO)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--sem-pdfs', action='store_true', help='não mede o lote de PDFs nem o ZIP')
+    parser.add_argument('--gravar', action='store_true', help='grava os resultados como baseline')
+    parser.add_argument('--comparar', action='store_true', help='compara com as baselines gravadas')
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_PADRAO)
+    parser.add_argument('--baselines', default=DIRETORIO_BASELINES)
+    args = parser.parse_args(argv)
+
+    regressoes = []
+    try:
+        for total in args.alunos:
+            print(f"{total} alunos", file=sys.stderr)
+            resultado = executar(total, args.repeticoes, pdfs=not args.sem_pdfs)
+
+            caminho = caminho_baseline(total, args.baselines)
+            if args.comparar and os.path.exists(caminho):
+                with open(caminho, encoding='utf-8') as f:
+                    regressoes.extend(comparar(resultado, json.load(f), args.tolerancia))
+
+            if args.gravar:
+                os.makedirs(args.baselines, exist_ok=True)
+                with open(caminho, 'w', encoding='utf-8') as f:
+                    json.dump(resultado, f, indent=2, ensure_ascii=False)
+                    f.write('\n')
+            else:
+                print(json.dumps(resultado, ensure_ascii=False))
+    finally:
+        encerrar_executor_pdf()
+
+    for regressao in regressoes:
+        print(f"REGRESSÃO {regressao}", file=sys.stderr)
+    return 1 if regressoes else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -74,7 +74,9 @@ const UploadPage = () => {
     onDrop: handleFileSelect,
     accept: {
       'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': ['.xlsx'],
-      'application/vnd.ms-excel': ['.xls']
+      'application/vnd.ms-excel': ['.xls'],
+      'text/csv': ['.csv'],
+      'application/zip': ['.zip']
     },
     maxFiles: 1,
     maxSize: 200 * 1024 * 1024, // 200MB
@@ -234,11 +236,11 @@ const UploadPage = () => {
                   <h3 className="text-xl font-semibold text-gray-900 mb-2">
                     {isDragActive
                       ? 'Solte o arquivo aqui'
-                      : 'Arraste o arquivo Excel ou clique para selecionar'
+                      : 'Arraste a planilha ou clique para selecionar'
                     }
                   </h3>
                   <p className="text-gray-600">
-                    Formatos aceitos: .xlsx, .xls (máximo 200MB)
+                    Formatos aceitos: .xlsx, .xls, .csv ou .zip com um arquivo por aba (máximo 200MB)
                   </p>
                 </div>
                 
@@ -83,14 +83,45 @@ export const uploadFile = async (file, onProgress = null) => {
   }
 };
 
-// Processar simulado
-export const processSimulado = async (processId) => {
+// Status da tarefa em segundo plano (correção / geração de PDFs)
+export const getProcessStatus = async (processId) => {
   try {
-    const { data } = await api.post(`/processar/${processId}`);
+    const { data } = await api.get(`/status/${processId}`);
     return data;
   } catch (error) {
     if (error.response?.data?.detail) throw new Error(error.response.data.detail);
-    throw new Error('Erro ao processar simulado');
+    throw new Error('Erro ao consultar status do processo');
+  }
+};
+
+const TASK_STATUSES = ['processando', 'gerando_pdfs'];
+
+// Consulta o status até a tarefa terminar
+export const waitForProcess = async (processId, { onProgress, interval = 1000 } = {}) => {
+  for (;;) {
+    const status = await getProcessStatus(processId);
+    if (onProgress) onProgress(status.progresso ?? 0, status.etapa);
+    if (!TASK_STATUSES.includes(status.status)) {
+      if (status.erro) throw new Error(status.erro);
+      return status;
+    }
+    await new Promise(r => setTimeout(r, interval));
+  }
+};
+
+// Processar simulado (enfileira e aguarda a correção)
+export const processSimulado = async (processId, onProgress = null) => {
+  try {
+    await api.post(`/processar/${processId}`);
+    const status = await waitForProcess(processId, { onProgress });
+    const [estatisticas, { ranking }] = await Promise.all([
+      getStatistics(processId),
+      getRanking(processId, { limit: 10 }),
+    ]);
+    return { processo_id: processId, status: status.status, estatisticas, ranking };
+  } catch (error) {
+    if (error.response?.data?.detail) throw new Error(error.response.data.detail);
+    throw new Error(error.message || 'Erro ao processar simulado');
   }
 };
 
@@ -105,10 +136,14 @@ export const getStatistics = async (processId) => {
   }
 };
 
-// Ranking
-export const getRanking = async (processId) => {
+// Ranking (paginado; resposta comprimida pelo servidor)
+// params: { offset, limit, campos: 'posicao,nome,nota_percentual', sede: [...], status_performance: [...] }
+export const getRanking = async (processId, params = {}) => {
   try {
-    const { data } = await api.get(`/ranking/${processId}`);
+    const { data } = await api.get(`/ranking/${processId}`, {
+      params,
+      paramsSerializer: { indexes: null }, // sede=A&sede=B
+    });
     return data;
   } catch (error) {
     if (error.response?.data?.detail) throw new Error(error.response.data.detail);
@@ -116,14 +151,16 @@ export const getRanking = async (processId) => {
   }
 };
 
-// Gerar PDFs
-export const generatePdfs = async (processId) => {
+// Gerar PDFs (enfileira e aguarda a geração)
+export const generatePdfs = async (processId, onProgress = null) => {
   try {
-    const { data } = await api.post(`/gerar-pdfs/${processId}`);
+    await api.post(`/gerar-pdfs/${processId}`);
+    await waitForProcess(processId, { onProgress });
+    const { data } = await api.get(`/pdfs/${processId}`);
     return data;
   } catch (error) {
     if (error.response?.data?.detail) throw new Error(error.response.data.detail);
-    throw new Error('Erro ao gerar PDFs');
+    throw new Error(error.message || 'Erro ao gerar PDFs');
   }
 };
 
@@ -206,8 +243,10 @@ export const processCompleteFlow = async (file, callbacks = {}) => {
     onUploadProgress,
     onUploadComplete,
     onProcessingStart,
+    onProcessingProgress,
     onProcessingComplete,
     onPdfGenerationStart,
+    onPdfGenerationProgress,
     onPdfGenerationComplete,
     onError,
   } = callbacks;
@@ -220,11 +259,11 @@ export const processCompleteFlow = async (file, callbacks = {}) => {
     const processId = uploadResult.processo_id;
 
     if (onProcessingStart) onProcessingStart();
-    const processingResult = await processSimulado(processId);
+    const processingResult = await processSimulado(processId, onProcessingProgress);
     if (onProcessingComplete) onProcessingComplete(processingResult);
 
     if (onPdfGenerationStart) onPdfGenerationStart();
-    const pdfsResult = await generatePdfs(processId);
+    const pdfsResult = await generatePdfs(processId, onPdfGenerationProgress);
     if (onPdfGenerationComplete) onPdfGenerationComplete(pdfsResult);
 
     return { processId, uploadResult, processingResult, pdfsResult };
@@ -239,17 +278,14 @@ export const validateFile = (file) => {
   const errors = [];
   const warnings = [];
 
-  const allowedTypes = [
-    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-    'application/vnd.ms-excel',
-  ];
-  if (!allowedTypes.includes(file.type)) errors.push('Arquivo deve ser Excel (.xlsx ou .xls)');
+  // O tipo MIME de CSV e .zip varia entre navegadores e sistemas: vale a extensão
+  if (!file.name.match(/\.(xlsx|xls|csv|zip)$/i)) {
+    errors.push('Arquivo deve ser Excel (.xlsx ou .xls), CSV ou .zip com um arquivo por aba');
+  }
 
   const maxSize = 200 * 1024 * 1024;
   if (file.size > maxSize) errors.push('Arquivo muito grande (máximo 200MB)');
 
-  if (!file.name.match(/\.(xlsx|xls)$/i)) warnings.push('Extensão do arquivo pode não ser reconhecida');
-
   return { isValid: errors.length === 0, errors, warnings };
 };
 
@@ -259,6 +295,8 @@ export const formatApiError = (error) => {
     switch (status) {
       case 400: return data?.detail || 'Dados inválidos';
       case 404: return 'Recurso não encontrado';
+      case 409: return data?.detail || 'Processo já possui uma tarefa em andamento';
+      case 410: return data?.detail || 'Arquivo expirou; envie novamente';
       case 413: return 'Arquivo muito grande';
       case 422: return 'Dados não processáveis';
       case 500: return 'Erro interno do servidor';